@@ -0,0 +1,345 @@
+"""
+Archival of old quiz attempts.
+
+    python archive.py                        # attempts older than ARCHIVE_AFTER_DAYS
+    python archive.py --after-days 90 --hot-limit 200 --dry-run
+
+Run it periodically (e.g. daily from cron). For each user, completed
+attempts older than ARCHIVE_AFTER_DAYS, or beyond their newest
+ARCHIVE_HOT_LIMIT, are moved out of `quiz_attempts`, oldest first, in chunks:
+
+    1. the attempts are written to `attempt_archive` as one document per
+       chunk (zlib-compressed BSON, plus the attempt ids for lookups)
+    2. they are folded into the user's document in `attempt_summaries`:
+       quiz/question/correct totals, per topic and per difficulty counts,
+       the ids of all questions seen, the last few results, and
+       `archived_through`, the newest completed_at folded in
+    3. they are deleted from `quiz_attempts`
+
+Readers combine the summary with the attempts completed after
+archived_through (hot_filter()), so analytics and the checklist stay exact
+while their scans only cover recent attempts. Attempts left behind by an
+interrupted run are already counted and are ignored until the next run
+deletes them. The summary is replaced conditionally on archived_through, so
+two concurrent runs cannot count a chunk twice. Attempts that were started
+but never submitted are archived after the same age without entering the
+summary. Topics and difficulties are counted with the question documents
+as they are at archival time.
+
+Only schema 2 attempts (a BSON date in completed_at) are archived; run
+`python attempts.py --migrate` first. Completed attempts in the archive
+stay readable through /api/quiz/{id}/results (find_attempt()), and a user's
+first adaptive progress build reads them back (archived_attempts()).
+
+export_attempts.py only reads quiz_attempts, so completed attempts are only
+archived once they have been exported: up to the checkpoint it saves in
+`export_checkpoints`. Until the exporter has run, only unfinished attempts
+are archived; ARCHIVE_AFTER_EXPORT=0 (or --ignore-export) archives without
+waiting, for deployments that do not export.
+
+    ARCHIVE_AFTER_DAYS     age at which attempts are archived (default 180)
+    ARCHIVE_HOT_LIMIT      completed attempts kept per user (default 1000)
+    ARCHIVE_BATCH          attempts per archive document (default 500)
+    ARCHIVE_AFTER_EXPORT   wait for export_attempts.py (default 1)
+"""
+
+import argparse
+import asyncio
+import os
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import bson
+from bson.binary import Binary
+from pymongo.errors import DuplicateKeyError
+
+import ids
+from attempts import decode_attempt
+
+ARCHIVE_AFTER_DAYS = float(os.environ.get("ARCHIVE_AFTER_DAYS", 180))
+ARCHIVE_HOT_LIMIT = int(os.environ.get("ARCHIVE_HOT_LIMIT", 1000))
+ARCHIVE_BATCH = int(os.environ.get("ARCHIVE_BATCH", 500))
+ARCHIVE_AFTER_EXPORT = os.environ.get("ARCHIVE_AFTER_EXPORT", "1") != "0"
+
+# _id of the attempts exporter's document in export_checkpoints
+EXPORT_CHECKPOINT = "attempts"
+
+# Archived results kept in the summary for recent_activity
+RECENT = 10
+
+
+# ============= READING =============
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def load_summary(collection, user_id: str) -> Optional[dict]:
+    """A user's archive summary, with question ids decoded into a set"""
+    doc = await collection.find_one({"user_id": ids.match(user_id)}, {"_id": 0})
+    if doc is None:
+        return None
+    doc["question_ids"] = {ids.decode(q_id) for q_id in doc.get("question_ids", [])}
+    doc["archived_through"] = _as_utc(doc["archived_through"])
+    return doc
+
+
+def hot_filter(summary: Optional[dict]) -> dict:
+    """completed_at condition for the attempts not folded into summary"""
+    if summary is None:
+        return {}
+    # $not also keeps unfinished attempts and schema 1 (string) dates
+    return {"$not": {"$lte": summary["archived_through"]}}
+
+
+def stats_of(summary: Optional[dict], kind: str) -> Dict[str, Dict[str, int]]:
+    """Archived attempted/correct counts per topic or difficulty"""
+    rows = summary.get(kind, []) if summary else []
+    return {name: {"attempted": attempted, "correct": correct} for name, attempted, correct in rows}
+
+
+def _unpack(doc: dict) -> List[dict]:
+    return bson.decode(zlib.decompress(doc["data"]))["attempts"]
+
+
+async def archived_attempts(collection, user_id: str, summary: dict) -> List[dict]:
+    """A user's archived completed attempts as stored, oldest first; only those in summary"""
+    through = summary["archived_through"]
+    attempts = []
+    async for doc in collection.find({"user_id": ids.match(user_id), "kind": "completed"}):
+        # Chunks of an interrupted run past archived_through are still hot
+        attempts += [a for a in _unpack(doc) if _as_utc(a["completed_at"]) <= through]
+    return sorted(attempts, key=lambda a: a["completed_at"])
+
+
+async def find_attempt(collection, quiz_id: str) -> Optional[dict]:
+    """An archived attempt as stored in quiz_attempts, or None"""
+    doc = await collection.find_one({"attempt_ids": ids.to_binary(quiz_id)})
+    if doc is None:
+        return None
+    for attempt in _unpack(doc):
+        if ids.decode(attempt.get("id")) == quiz_id:
+            return attempt
+    return None
+
+
+# ============= ARCHIVING =============
+
+async def export_bound(db) -> Optional[datetime]:
+    """Newest completed_at that export_attempts.py has exported entirely, or None"""
+    doc = await db.export_checkpoints.find_one({"_id": EXPORT_CHECKPOINT})
+    if doc is None:
+        return None
+    # Attempts completed in the checkpoint's own millisecond may not all be exported yet
+    return _as_utc(doc["completed_at"]) - timedelta(milliseconds=1)
+
+
+def summarize(summary: Optional[dict], user_id: str, attempts: List[dict], questions: Dict[str, dict]) -> dict:
+    """summary (as stored) with the completed attempts folded in"""
+    summary = summary or {"user_id": ids.encode(user_id), "quizzes": 0, "questions": 0, "correct": 0}
+    topics = {row[0]: row[1:] for row in summary.get("topics", [])}
+    difficulties = {row[0]: row[1:] for row in summary.get("difficulties", [])}
+    seen = {ids.decode(q_id) for q_id in summary.get("question_ids", [])}
+    recent = list(summary.get("recent", []))
+    for stored in attempts:
+        attempt = decode_attempt(stored)
+        summary["quizzes"] += 1
+        summary["questions"] += attempt["total_questions"]
+        summary["correct"] += attempt["correct_answers"]
+        seen.update(attempt["questions"])
+        recent.append({
+            "date": attempt["completed_at"],
+            "total": attempt["total_questions"],
+            "correct": attempt["correct_answers"],
+        })
+        # As analytics counts them: every question of the quiz that still exists
+        for q_id in attempt["questions"]:
+            question = questions.get(q_id)
+            if question is None:
+                continue
+            is_correct = int(attempt["scores"].get(q_id, False))
+            for counts, name in (
+                (topics, question.get("topic", "Unknown")),
+                (difficulties, question.get("difficulty", "Unknown")),
+            ):
+                attempted, correct = counts.get(name, (0, 0))
+                counts[name] = (attempted + 1, correct + is_correct)
+    summary["topics"] = [[name, *counts] for name, counts in topics.items()]
+    summary["difficulties"] = [[name, *counts] for name, counts in difficulties.items()]
+    summary["question_ids"] = [ids.to_binary(q_id) for q_id in sorted(seen)]
+    summary["recent"] = sorted(recent, key=lambda r: r["date"], reverse=True)[:RECENT]
+    summary["archived_through"] = max(a["completed_at"] for a in attempts)
+    return summary
+
+
+class Archiver:
+    def __init__(
+        self,
+        db,
+        after_days: float = ARCHIVE_AFTER_DAYS,
+        hot_limit: int = ARCHIVE_HOT_LIMIT,
+        batch_size: int = ARCHIVE_BATCH,
+        dry_run: bool = False,
+        after_export: bool = ARCHIVE_AFTER_EXPORT,
+    ):
+        self.db = db
+        self.cutoff = datetime.now(timezone.utc) - timedelta(days=after_days)
+        self.hot_limit = hot_limit
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.after_export = after_export
+        # Newest completed_at that may be archived, set by run() when waiting for the exporter
+        self.exported_through: Optional[datetime] = None
+        self.stats = {"users": 0, "archived": 0, "abandoned": 0, "bytes_before": 0, "bytes_after": 0}
+
+    async def candidates(self) -> List[str]:
+        """Users with attempts past the age cutoff or over the hot limit"""
+        pipeline = [
+            {"$group": {
+                "_id": "$user_id",
+                "count": {"$sum": 1},
+                "oldest": {"$min": {"$ifNull": ["$completed_at", "$started_at"]}},
+            }},
+            {"$match": {"$or": [{"oldest": {"$lte": self.cutoff}}, {"count": {"$gt": self.hot_limit}}]}},
+        ]
+        users = [ids.decode(doc["_id"]) async for doc in self.db.quiz_attempts.aggregate(pipeline)]
+        return sorted(set(users))
+
+    async def _user_cutoff(self, user_id: str) -> datetime:
+        # Keep at most hot_limit completed attempts hot, whatever their age
+        beyond = await self.db.quiz_attempts.find(
+            {"user_id": ids.match(user_id), "completed_at": {"$type": "date"}}, {"_id": 0, "completed_at": 1}
+        ).sort("completed_at", -1).skip(self.hot_limit).limit(1).to_list(1)
+        if beyond:
+            return max(self.cutoff, _as_utc(beyond[0]["completed_at"]))
+        return self.cutoff
+
+    async def _next_chunk(self, user_id: str, cutoff: datetime, through: Optional[datetime]) -> List[dict]:
+        completed_at = {"$lte": cutoff}
+        if through is not None:
+            completed_at["$gt"] = through
+        chunk = await self.db.quiz_attempts.find(
+            {"user_id": ids.match(user_id), "completed_at": completed_at}
+        ).sort("completed_at", 1).limit(self.batch_size).to_list(None)
+        if len(chunk) == self.batch_size:
+            # Whole timestamps only, so archived_through splits hot from archived exactly
+            last = chunk[-1]["completed_at"]
+            whole = [a for a in chunk if a["completed_at"] < last]
+            chunk = whole or await self.db.quiz_attempts.find(
+                {"user_id": ids.match(user_id), "completed_at": last}
+            ).to_list(None)
+        return chunk
+
+    async def _store(self, user_id: str, kind: str, attempts: List[dict]):
+        attempts = [{k: v for k, v in a.items() if k != "_id"} for a in attempts]
+        data = zlib.compress(bson.encode({"attempts": attempts}))
+        self.stats["bytes_before"] += sum(len(bson.encode(a)) for a in attempts)
+        self.stats["bytes_after"] += len(data)
+        if self.dry_run:
+            return
+        dates = [a.get("completed_at") or a.get("started_at") for a in attempts]
+        # Named after its contents, so a chunk re-run after a crash replaces itself
+        doc_id = f"{user_id}:{kind}:{ids.decode(attempts[0]['id'])}"
+        await self.db.attempt_archive.replace_one({"_id": doc_id}, {
+            "user_id": ids.encode(user_id),
+            "kind": kind,
+            "from": min(dates),
+            "to": max(dates),
+            "attempt_ids": [ids.to_binary(ids.decode(a["id"])) for a in attempts],
+            "data": Binary(data),
+        }, upsert=True)
+
+    async def _question_docs(self, attempts: List[dict]) -> Dict[str, dict]:
+        q_ids = {q_id for a in attempts for q_id in decode_attempt(a)["questions"]}
+        docs = await self.db.questions.find(
+            {"id": {"$in": ids.forms(q_ids)}}, {"_id": 0, "id": 1, "topic": 1, "difficulty": 1}
+        ).to_list(None)
+        return {ids.decode(d["id"]): d for d in docs}
+
+    async def archive_user(self, user_id: str):
+        summary = await self.db.attempt_summaries.find_one({"user_id": ids.match(user_id)}, {"_id": 0})
+        through = _as_utc(summary["archived_through"]) if summary else None
+        if through is not None and not self.dry_run:
+            # Left behind by an interrupted run; already in the summary
+            await self.db.quiz_attempts.delete_many({"user_id": ids.match(user_id), "completed_at": {"$lte": through}})
+
+        cutoff = await self._user_cutoff(user_id)
+        if self.after_export:
+            # None until something is exported: unfinished attempts only, which are never exported
+            cutoff = min(cutoff, self.exported_through) if self.exported_through else None
+        while cutoff is not None:
+            chunk = await self._next_chunk(user_id, cutoff, through)
+            if not chunk:
+                break
+            await self._store(user_id, "completed", chunk)
+            updated = summarize(summary, user_id, chunk, await self._question_docs(chunk))
+            self.stats["archived"] += len(chunk)
+            if self.dry_run:
+                summary, through = updated, _as_utc(updated["archived_through"])
+                continue
+            try:
+                result = await self.db.attempt_summaries.replace_one(
+                    {"user_id": ids.match(user_id), "archived_through": through}, updated, upsert=True
+                )
+            except DuplicateKeyError:
+                result = None
+            if result is None or (result.matched_count == 0 and result.upserted_id is None):
+                raise RuntimeError(f"Summary of user {user_id} changed during archival; is another run active?")
+            summary, through = updated, _as_utc(updated["archived_through"])
+            await self.db.quiz_attempts.delete_many({"user_id": ids.match(user_id), "completed_at": {"$lte": through}})
+
+        # Started and never submitted: archived, not counted
+        while True:
+            query = {"user_id": ids.match(user_id), "completed_at": None, "started_at": {"$lte": self.cutoff}}
+            abandoned = await self.db.quiz_attempts.find(query).limit(self.batch_size).to_list(None)
+            if not abandoned:
+                break
+            await self._store(user_id, "abandoned", abandoned)
+            self.stats["abandoned"] += len(abandoned)
+            if self.dry_run:
+                break
+            await self.db.quiz_attempts.delete_many({"_id": {"$in": [a["_id"] for a in abandoned]}, **query})
+
+    async def run(self) -> Dict[str, int]:
+        if self.after_export:
+            self.exported_through = await export_bound(self.db)
+        for user_id in await self.candidates():
+            self.stats["users"] += 1
+            await self.archive_user(user_id)
+        return self.stats
+
+
+async def main(args):
+    from dotenv import load_dotenv
+    from pathlib import Path
+    from database import create_client
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = create_client(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    archiver = Archiver(
+        db, args.after_days, args.hot_limit, args.batch_size, args.dry_run, not args.ignore_export
+    )
+    stats = await archiver.run()
+    if archiver.after_export and archiver.exported_through is None:
+        print("No export checkpoint yet: completed attempts stay until export_attempts.py has run")
+    prefix = "Dry run: would archive" if args.dry_run else "Archived"
+    print(
+        f"{prefix} {stats['archived']} completed and {stats['abandoned']} unfinished attempt(s) "
+        f"of {stats['users']} user(s): {stats['bytes_before']} -> {stats['bytes_after']} bytes"
+    )
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old quiz attempts into per-user summaries and archive documents")
+    parser.add_argument("--after-days", type=float, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--hot-limit", type=int, default=ARCHIVE_HOT_LIMIT)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH)
+    parser.add_argument("--dry-run", action="store_true", help="report what would be archived without writing")
+    parser.add_argument(
+        "--ignore-export", action="store_true", default=not ARCHIVE_AFTER_EXPORT,
+        help="archive completed attempts that export_attempts.py has not exported yet",
+    )
+    asyncio.run(main(parser.parse_args()))
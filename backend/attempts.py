@@ -0,0 +1,198 @@
+"""
+Storage layout of quiz attempt documents.
+
+Schema 1 (legacy, no `v` field) stores the QuizAttempt model as is: question
+ids as strings, repeated again as keys of `user_answers` and `scores`, and
+completed_at as an ISO string.
+
+Schema 2 (`"v": 2`) stores the same information compactly:
+    questions     question ids, UUIDs as 16-byte BSON binary (subtype 4)
+                  whatever ID_FORMAT is (see ids.py); others stay strings
+    answers       answers aligned with `questions` (null = unanswered),
+                  only once the attempt is submitted
+    correct       bitmask of correct answers (bit i = questions[i]) as bytes
+    completed_at  a BSON date
+total_questions and correct_answers are derived from the arrays.
+
+Every read goes through decode_attempt(), which returns the schema 1 shape
+for either layout, so the API is unchanged. New attempts are written in
+ATTEMPT_SCHEMA (default 2; set ATTEMPT_SCHEMA=1 while older API workers
+that cannot read schema 2 are still running). Existing documents are
+rewritten online by:
+
+    python attempts.py --migrate [--batch-size N] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import bson
+
+import ids
+
+ATTEMPT_SCHEMA = int(os.environ.get("ATTEMPT_SCHEMA", 2))
+
+# Fields replaced by the schema 2 arrays
+LEGACY_FIELDS = ("user_answers", "scores", "total_questions", "correct_answers")
+
+
+def _pack_bits(flags: List[bool]) -> bytes:
+    mask = 0
+    for i, flag in enumerate(flags):
+        if flag:
+            mask |= 1 << i
+    return mask.to_bytes((len(flags) + 7) // 8, "little")
+
+
+def _unpack_bits(data: bytes, count: int) -> List[bool]:
+    mask = int.from_bytes(bytes(data or b""), "little")
+    return [bool(mask >> i & 1) for i in range(count)]
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _result_fields(question_ids: List[str], user_answers: Dict[str, str], scores: Dict[str, bool]) -> Dict[str, Any]:
+    return {
+        "answers": [user_answers.get(q_id) for q_id in question_ids],
+        "correct": _pack_bits([bool(scores.get(q_id)) for q_id in question_ids]),
+    }
+
+
+def encode_attempt(attempt: dict, schema: int = None) -> dict:
+    """Storage document for a QuizAttempt dict (schema 1 shape)"""
+    schema = schema or ATTEMPT_SCHEMA
+    if schema == 1:
+        return ids.encode_doc(attempt, "id", "user_id")
+    doc = ids.encode_doc({k: v for k, v in attempt.items() if k not in LEGACY_FIELDS}, "id", "user_id")
+    doc["v"] = 2
+    doc["questions"] = [ids.to_binary(q_id) for q_id in attempt["questions"]]
+    doc["completed_at"] = _as_datetime(attempt.get("completed_at"))
+    if doc["completed_at"] is not None or attempt.get("user_answers") or attempt.get("scores"):
+        doc.update(_result_fields(attempt["questions"], attempt.get("user_answers") or {}, attempt.get("scores") or {}))
+    return doc
+
+
+def encode_submission(
+    attempt: dict,
+    user_answers: Dict[str, str],
+    scores: Dict[str, bool],
+    time_taken: int,
+    completed_at: datetime,
+    schema: int = None,
+) -> Dict[str, Any]:
+    """Fields to $set when an attempt (decoded) is submitted"""
+    schema = schema or ATTEMPT_SCHEMA
+    if schema == 1:
+        return {
+            "user_answers": user_answers,
+            "scores": scores,
+            "correct_answers": sum(1 for v in scores.values() if v),
+            "time_taken": time_taken,
+            "completed_at": completed_at.isoformat(),
+        }
+    # Written in full, so a schema 1 attempt started before an upgrade becomes schema 2
+    return {
+        "v": 2,
+        "questions": [ids.to_binary(q_id) for q_id in attempt["questions"]],
+        **_result_fields(attempt["questions"], user_answers, scores),
+        "time_taken": time_taken,
+        "completed_at": completed_at,
+    }
+
+
+def decode_attempt(doc: Optional[dict]) -> Optional[dict]:
+    """Schema 1 view of a stored attempt of either schema"""
+    if doc is None or doc.get("v") != 2:
+        return ids.decode_doc(doc, "id", "user_id")
+    attempt = ids.decode_doc({k: v for k, v in doc.items() if k not in ("v", "answers", "correct")}, "id", "user_id")
+    question_ids = [ids.decode(q) for q in doc.get("questions", [])]
+    attempt["questions"] = question_ids
+    attempt["user_answers"] = {}
+    attempt["scores"] = {}
+    if "answers" in doc:
+        correct = _unpack_bits(doc.get("correct"), len(question_ids))
+        for q_id, answer, is_correct in zip(question_ids, doc["answers"], correct):
+            if answer is not None:
+                attempt["user_answers"][q_id] = answer
+                attempt["scores"][q_id] = is_correct
+    attempt["total_questions"] = len(question_ids)
+    attempt["correct_answers"] = sum(1 for v in attempt["scores"].values() if v)
+    completed_at = _as_datetime(doc.get("completed_at"))
+    attempt["completed_at"] = completed_at.isoformat() if completed_at else None
+    return attempt
+
+
+# ============= MIGRATION =============
+
+async def migrate(db, batch_size: int = 500, dry_run: bool = False) -> Dict[str, int]:
+    """Rewrite schema 1 attempts as schema 2, safely alongside live traffic"""
+    from pymongo import ReplaceOne
+
+    stats = {"migrated": 0, "bytes_before": 0, "bytes_after": 0}
+    ops = []
+
+    async def write():
+        if ops and not dry_run:
+            # An attempt submitted or claimed meanwhile is left alone, for the next run
+            result = await db.quiz_attempts.bulk_write(ops, ordered=False)
+            stats["migrated"] -= len(ops) - result.modified_count
+        ops.clear()
+
+    async for doc in db.quiz_attempts.find({"v": {"$exists": False}}, batch_size=batch_size):
+        encoded = encode_attempt(doc, schema=2)
+        stats["bytes_before"] += len(bson.encode(doc))
+        stats["bytes_after"] += len(bson.encode(encoded))
+        stats["migrated"] += 1
+        # The fields a submission changes must still be as read, or its claim would be overwritten
+        query = {"_id": doc["_id"], "v": {"$exists": False}}
+        query.update({field: doc.get(field) for field in ("status", "grading_token", "completed_at")})
+        ops.append(ReplaceOne(query, encoded))
+        if len(ops) >= batch_size:
+            await write()
+    await write()
+
+    # Submitted after an upgrade but started before it: drop the leftover fields
+    if not dry_run:
+        await db.quiz_attempts.update_many(
+            {"v": 2, "user_answers": {"$exists": True}},
+            {"$unset": {field: "" for field in LEGACY_FIELDS}},
+        )
+    return stats
+
+
+async def main(args):
+    from dotenv import load_dotenv
+    from pathlib import Path
+    from database import create_client
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = create_client(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    stats = await migrate(db, args.batch_size, args.dry_run)
+    saved = stats["bytes_before"] - stats["bytes_after"]
+    prefix = "Dry run: would migrate" if args.dry_run else "Migrated"
+    print(
+        f"{prefix} {stats['migrated']} attempt(s): {stats['bytes_before']} -> "
+        f"{stats['bytes_after']} bytes ({saved} saved)"
+    )
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quiz attempt schema maintenance")
+    parser.add_argument("--migrate", action="store_true", help="rewrite schema 1 attempts as schema 2")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="report sizes without writing")
+    args = parser.parse_args()
+    if not args.migrate:
+        parser.error("nothing to do (use --migrate)")
+    asyncio.run(main(args))
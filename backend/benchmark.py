@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Load-test harness for the Interview Prep API.
+
+Runs the register -> start quiz -> submit -> results -> analytics flow with
+many concurrent virtual users against the FastAPI app in-process (ASGI
+transport, no sockets). MongoDB is replaced by mongomock-motor unless
+--mongo-url points at a real mongod, and Gemini is replaced by the fake LLM
+provider from llm.py with configurable latency so runs are repeatable and
+offline.
+
+Usage (from backend/):
+    python benchmark.py --users 50 --quizzes 3
+    python benchmark.py --save-baseline bench_baseline.json
+    python benchmark.py --baseline bench_baseline.json --tolerance 0.25
+    python benchmark.py --compare-compression      # identity vs gzip/br bytes and latency
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT_DIR = Path(__file__).parent
+DEFAULT_DB_NAME = "interprep_bench"
+
+
+# ============= APP SETUP =============
+
+def load_app(args):
+    """Import server.py against the benchmark database and fake LLM provider"""
+    os.environ["MONGO_URL"] = args.mongo_url or "mongodb://localhost:27017"
+    os.environ["DB_NAME"] = args.db_name
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["FAKE_LLM_JITTER_MS"] = str(args.llm_jitter_ms)
+    os.environ["FAKE_LLM_DISTRIBUTION"] = args.llm_distribution
+    os.environ["FAKE_LLM_ERROR_RATE"] = str(args.llm_error_rate)
+    os.environ["FAKE_LLM_VERDICT"] = args.llm_verdict
+    os.environ["FAKE_LLM_SEED"] = str(args.seed)
+    os.environ["WRITE_BEHIND"] = "1" if args.write_behind else "0"
+
+    sys.path.insert(0, str(ROOT_DIR))
+    import server
+
+    if not args.mongo_url:
+        from mongomock_motor import AsyncMongoMockClient
+
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[args.db_name]
+        server.reporting_db = server.db
+    return server
+
+
+async def seed_bank(db, size: int) -> List[str]:
+    """Fill the question bank with copies of the sample questions"""
+    from seed_questions import sample_questions
+
+    await db.questions.delete_many({})
+    await db.quiz_attempts.delete_many({})
+    await db.users.delete_many({"email": {"$regex": "@bench.local$"}})
+
+    docs = []
+    for i in range(size):
+        q = dict(sample_questions[i % len(sample_questions)])
+        q["id"] = str(uuid.uuid4())
+        q["text"] = f"{q['text']} (variant {i})"
+        q["created_at"] = datetime.now(timezone.utc)
+        docs.append(q)
+    if docs:
+        await db.questions.insert_many(docs)
+    return sorted({q["topic"] for q in sample_questions})
+
+
+# ============= MEASUREMENT =============
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.wire_bytes: Dict[str, int] = {}
+
+    async def call(self, client, label: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.latencies.setdefault(label, []).append(elapsed)
+        # Body bytes as sent, i.e. after any content-encoding
+        self.wire_bytes[label] = self.wire_bytes.get(label, 0) + response.num_bytes_downloaded
+        if response.status_code >= 400:
+            self.errors[label] = self.errors.get(label, 0) + 1
+        return response
+
+    def summary(self, wall_seconds: float) -> Dict[str, Dict[str, float]]:
+        report = {}
+        for label, values in self.latencies.items():
+            values = sorted(values)
+            report[label] = {
+                "count": len(values),
+                "errors": self.errors.get(label, 0),
+                "mean_ms": round(sum(values) / len(values), 3),
+                "p50_ms": round(percentile(values, 50), 3),
+                "p95_ms": round(percentile(values, 95), 3),
+                "p99_ms": round(percentile(values, 99), 3),
+                "rps": round(len(values) / wall_seconds, 2) if wall_seconds else 0.0,
+                "bytes_mean": round(self.wire_bytes.get(label, 0) / len(values), 1),
+            }
+        return report
+
+
+# ============= VIRTUAL USERS =============
+
+async def virtual_user(client, recorder: Recorder, topics: List[str], args, semaphore):
+    async with semaphore:
+        email = f"{uuid.uuid4().hex[:12]}@bench.local"
+        response = await recorder.call(client, "POST /users/register", "POST", "/api/users/register", json={
+            "username": email.split("@")[0],
+            "email": email,
+            "password": "benchmark",
+            "selected_topics": topics,
+        })
+        if response.status_code >= 400:
+            return
+        user_id = response.json()["id"]
+        response = await recorder.call(client, "POST /users/login", "POST", "/api/users/login", json={
+            "email": email,
+            "password": "benchmark",
+        })
+        session = {"Authorization": f"Bearer {response.json()['token']}"} if response.status_code < 400 else {}
+
+        for _ in range(args.quizzes):
+            chosen = random.sample(topics, k=min(len(topics), args.topics_per_quiz))
+            await recorder.call(client, "GET /questions?topic", "GET", "/api/questions", params={"topic": chosen[0]})
+            response = await recorder.call(client, "POST /quiz/start", "POST", "/api/quiz/start", json={
+                "user_id": user_id,
+                "topics": chosen,
+                "num_questions": args.questions_per_quiz,
+            })
+            if response.status_code >= 400:
+                continue
+            quiz = response.json()
+
+            answers = {}
+            for q in quiz["questions"]:
+                options = q.get("options") or []
+                answers[q["id"]] = random.choice(options) if options else "benchmark answer"
+            await recorder.call(client, "POST /quiz/submit", "POST", "/api/quiz/submit", json={
+                "quiz_id": quiz["quiz_id"],
+                "user_answers": answers,
+                "time_taken": random.randint(30, 600),
+            })
+            await recorder.call(client, "GET /quiz/{id}/results", "GET", f"/api/quiz/{quiz['quiz_id']}/results")
+
+        await recorder.call(client, "GET /analytics/{id}", "GET", f"/api/analytics/{user_id}", headers=session)
+        await recorder.call(client, "GET /checklist/{id}", "GET", f"/api/checklist/{user_id}", headers=session)
+        await recorder.call(client, "GET /users/{id}", "GET", f"/api/users/{user_id}", headers=session)
+
+
+async def run_benchmark(args) -> Dict[str, Dict[str, float]]:
+    import httpx
+
+    server = load_app(args)
+    topics = await seed_bank(server.db, args.bank_size)
+    for cache in server.caches.caches.values():
+        cache.clear()  # left over from a previous run in this process
+
+    await server.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        headers = {"Accept-Encoding": args.accept_encoding}
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark", timeout=None, headers=headers
+        ) as client:
+            recorder = Recorder()
+            semaphore = asyncio.Semaphore(args.concurrency)
+            start = time.perf_counter()
+            await asyncio.gather(*[
+                virtual_user(client, recorder, topics, args, semaphore)
+                for _ in range(args.users)
+            ])
+            wall = time.perf_counter() - start
+    finally:
+        await server.app.router.shutdown()
+
+    report = recorder.summary(wall)
+    report["_total"] = {
+        "count": sum(r["count"] for r in report.values()),
+        "errors": sum(r["errors"] for r in report.values()),
+        "wall_seconds": round(wall, 3),
+    }
+    report["_total"]["rps"] = round(report["_total"]["count"] / wall, 2) if wall else 0.0
+    return report
+
+
+# ============= REPORTING =============
+
+def print_report(report: Dict[str, Dict[str, float]]):
+    header = (
+        f"{'endpoint':<26}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'req/s':>10}{'bytes':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+    for label, stats in report.items():
+        if label.startswith("_"):
+            continue
+        print(
+            f"{label:<26}{stats['count']:>8}{stats['errors']:>8}"
+            f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['rps']:>10.1f}"
+            f"{stats['bytes_mean']:>10.0f}"
+        )
+    total = report["_total"]
+    print("-" * len(header))
+    print(f"{total['count']} requests, {total['errors']} errors in {total['wall_seconds']}s ({total['rps']} req/s)")
+
+
+def print_compression(identity, compressed, accept_encoding: str):
+    header = f"{'endpoint':<26}{'identity B':>12}{'encoded B':>12}{'ratio':>8}{'p50 id ms':>11}{'p50 enc ms':>11}"
+    print(f"\nCompression impact (Accept-Encoding: {accept_encoding})")
+    print(header)
+    print("-" * len(header))
+    for label, plain in identity.items():
+        encoded = compressed.get(label)
+        if label.startswith("_") or not encoded:
+            continue
+        ratio = encoded["bytes_mean"] / plain["bytes_mean"] if plain["bytes_mean"] else 1.0
+        print(
+            f"{label:<26}{plain['bytes_mean']:>12.0f}{encoded['bytes_mean']:>12.0f}{ratio:>8.2f}"
+            f"{plain['p50_ms']:>11.2f}{encoded['p50_ms']:>11.2f}"
+        )
+
+
+def compare_with_baseline(report, baseline, tolerance: float) -> List[str]:
+    """Return a list of regressions against a saved baseline"""
+    regressions = []
+    for label, base in baseline.get("endpoints", {}).items():
+        current = report.get(label)
+        if not current:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if base.get(key) and current[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{label} {key}: {current[key]:.2f} > {base[key]:.2f}")
+        if base.get("rps") and current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{label} rps: {current['rps']:.1f} < {base['rps']:.1f}")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the Interview Prep API flows in-process")
+    parser.add_argument("--users", type=int, default=50, help="number of virtual users")
+    parser.add_argument("--concurrency", type=int, default=25, help="virtual users running at once")
+    parser.add_argument("--quizzes", type=int, default=2, help="quizzes taken by each user")
+    parser.add_argument("--questions-per-quiz", type=int, default=5)
+    parser.add_argument("--topics-per-quiz", type=int, default=2)
+    parser.add_argument("--bank-size", type=int, default=200, help="questions seeded before the run")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="mean fake Gemini latency")
+    parser.add_argument("--llm-jitter-ms", type=float, default=10.0, help="spread of fake Gemini latency")
+    parser.add_argument("--llm-distribution", default="normal", choices=["fixed", "normal", "uniform", "exponential"])
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="fraction of LLM calls that return 429")
+    parser.add_argument("--llm-verdict", default="MATCH", choices=["CORRECT", "INCORRECT", "MATCH"])
+    parser.add_argument("--write-behind", action="store_true", help="batch quiz attempt writes (WRITE_BEHIND=1)")
+    parser.add_argument("--accept-encoding", default="gzip, deflate, br", help="Accept-Encoding sent by virtual users")
+    parser.add_argument("--compare-compression", action="store_true",
+                        help="run once with identity encoding and once with --accept-encoding, and compare")
+    parser.add_argument("--mongo-url", help="use a real MongoDB instead of mongomock-motor")
+    parser.add_argument("--db-name", default=DEFAULT_DB_NAME)
+    parser.add_argument("--seed", type=int, default=1234, help="random seed for repeatable runs")
+    parser.add_argument("--json", dest="json_output", help="write the full report to this file")
+    parser.add_argument("--save-baseline", help="save this run as the baseline file")
+    parser.add_argument("--baseline", help="compare against a saved baseline and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    random.seed(args.seed)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.compare_compression:
+        encoding = args.accept_encoding
+        args.accept_encoding = "identity"
+        identity = asyncio.run(run_benchmark(args))
+        args.accept_encoding = encoding
+        random.seed(args.seed)
+    report = asyncio.run(run_benchmark(args))
+    print_report(report)
+    if args.compare_compression:
+        print_compression(identity, report, args.accept_encoding)
+
+    endpoints = {k: v for k, v in report.items() if not k.startswith("_")}
+    if args.json_output:
+        Path(args.json_output).write_text(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        baseline = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("save_baseline", "baseline", "json_output")},
+            "endpoints": endpoints,
+        }
+        Path(args.save_baseline).write_text(json.dumps(baseline, indent=2))
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"   • {line}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
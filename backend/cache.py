@@ -0,0 +1,156 @@
+"""
+Per-process caches with cross-worker invalidation through MongoDB.
+
+Every worker keeps its own copy of each cache. Invalidating a cache bumps a
+version counter in the `cache_versions` collection; every worker polls those
+counters every CACHE_SYNC_INTERVAL seconds and reloads caches whose version
+moved, so a write in one worker reaches the others within one interval.
+
+Like the other per-worker helpers (write_buffer.py, selection.py, ...), the
+registry is given its collection as a callable (`lambda: db.cache_versions`)
+rather than a handle, so tests and benchmarks can swap server.db after import.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pymongo import ReturnDocument
+
+CACHE_SYNC_INTERVAL = float(os.environ.get("CACHE_SYNC_INTERVAL", 2))
+
+logger = logging.getLogger(__name__)
+
+
+class SharedCache:
+    """A lazily loaded value that can be dropped and reloaded"""
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[], Awaitable[Any]],
+        refresh: Optional[Callable[[Any], Awaitable[None]]] = None,
+        reconcile: Optional[Callable[[Any], Awaitable[bool]]] = None,
+    ):
+        self.name = name
+        self.loader = loader
+        # Optional incremental update, run on every sync while the version is unchanged
+        self.refresh = refresh
+        # Optional in-place update after a version bump; False asks for a reload
+        self.reconcile = reconcile
+        self.value: Any = None
+        self.version = 0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> Any:
+        if self.value is None:
+            async with self._lock:
+                if self.value is None:
+                    generation = self._generation
+                    value = await self.loader()
+                    # Drop results of a load that raced with an invalidation
+                    if generation != self._generation:
+                        return value
+                    self.value = value
+        return self.value
+
+    def peek(self) -> Any:
+        return self.value
+
+    async def reload(self):
+        """Load a new value while the current one keeps being served, then swap"""
+        if self.value is None:
+            await self.get()
+            return
+        generation = self._generation
+        value = await self.loader()
+        if generation == self._generation:
+            self.value = value
+
+    def clear(self):
+        self._generation += 1
+        self.value = None
+
+
+class CacheRegistry:
+    def __init__(self, versions: Callable[[], Any], interval: float = CACHE_SYNC_INTERVAL):
+        # versions returns the cache_versions collection
+        self.versions = versions
+        self.interval = interval
+        self.caches: Dict[str, SharedCache] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[], Awaitable[Any]],
+        refresh: Optional[Callable[[Any], Awaitable[None]]] = None,
+        reconcile: Optional[Callable[[Any], Awaitable[bool]]] = None,
+    ) -> SharedCache:
+        cache = SharedCache(name, loader, refresh, reconcile)
+        self.caches[name] = cache
+        return cache
+
+    async def _remote_versions(self) -> Dict[str, int]:
+        docs = await self.versions().find({"_id": {"$in": list(self.caches)}}).to_list(None)
+        return {d["_id"]: d.get("version", 0) for d in docs}
+
+    async def warm(self):
+        """Load every registered cache; run once per worker at startup"""
+        remote = await self._remote_versions()
+        for name, cache in self.caches.items():
+            start = time.perf_counter()
+            cache.version = remote.get(name, 0)
+            await cache.get()
+            logger.info(f"Cache '{name}' warmed in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    async def invalidate(self, *names: str):
+        """Drop caches locally and tell the other workers to do the same"""
+        for name in names:
+            doc = await self.versions().find_one_and_update(
+                {"_id": name},
+                {"$inc": {"version": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            cache = self.caches.get(name)
+            if cache:
+                cache.clear()
+                cache.version = doc["version"] if doc else cache.version + 1
+
+    async def sync(self):
+        """Reload caches whose version was bumped by another worker, refresh the rest"""
+        remote = await self._remote_versions()
+        for name, cache in self.caches.items():
+            version = remote.get(name, 0)
+            if version != cache.version:
+                logger.info(f"Cache '{name}' invalidated (version {cache.version} -> {version})")
+                cache.version = version
+                if cache.value is None or not cache.reconcile or not await cache.reconcile(cache.value):
+                    await cache.reload()
+            elif cache.refresh and cache.value is not None:
+                await cache.refresh(cache.value)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Cache sync error: {str(e)}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
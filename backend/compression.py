@@ -0,0 +1,160 @@
+"""
+Response compression with gzip/brotli negotiation.
+
+Picks the best encoding the client accepts (brotli when the `brotli` module
+is installed, then gzip) and compresses compressible responses of at least
+COMPRESSION_MIN_SIZE bytes. Smaller bodies, already encoded responses,
+304/204s and Server-Sent Events (text/event-stream, e.g. /api/ai/chat) pass
+through untouched, so SSE chunks still reach the client as they are
+produced. Other streamed responses are compressed chunk by chunk with a
+flush after every chunk.
+
+Compressed responses get `Vary: Accept-Encoding`, and a strong ETag is
+weakened (W/"...") because the bytes differ from the identity encoding;
+If-None-Match compares weakly, so revalidation still works.
+
+    COMPRESSION=0                 disable
+    COMPRESSION_MIN_SIZE          bytes (default 1024)
+    COMPRESSION_GZIP_LEVEL        1-9 (default 6)
+    COMPRESSION_BROTLI_QUALITY    0-11 (default 4)
+"""
+
+import os
+import zlib
+from typing import List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+COMPRESSION_ENABLED = os.environ.get("COMPRESSION", "1") != "0"
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+EXEMPT_TYPES = ("text/event-stream",)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported coding from an Accept-Encoding header, honouring q=0"""
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    supported = (["br"] if brotli is not None else []) + ["gzip"]
+    best = None
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (encoding, q)
+    return best[0] if best else None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # 31 = gzip container
+
+    def chunk(self, data: bytes, final: bool) -> bytes:
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        gzip_level: int = GZIP_LEVEL,
+        brotli_quality: int = BROTLI_QUALITY,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = _header(scope.get("headers", []), b"accept-encoding")
+        encoding = choose_encoding(accept.decode("latin-1")) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = list(start.get("headers", []))
+                content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+                if (
+                    start["status"] in (204, 304)
+                    or _header(headers, b"content-encoding") is not None
+                    or content_type.startswith(EXEMPT_TYPES)
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                data = compressor.chunk(body, final=not more_body)
+                headers = [(k, v) for k, v in headers if k.lower() not in (b"content-length", b"etag", b"vary")]
+                headers.append((b"content-encoding", encoding.encode()))
+                vary = _header(start.get("headers", []), b"vary")
+                headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+                etag = _header(start.get("headers", []), b"etag")
+                if etag is not None:
+                    headers.append((b"etag", etag if etag.startswith(b"W/") else b"W/" + etag))
+                if not more_body:
+                    headers.append((b"content-length", str(len(data)).encode()))
+                await send({**start, "headers": headers})
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            await send({
+                "type": "http.response.body",
+                "body": compressor.chunk(body, final=not more_body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,178 @@
+"""
+MongoDB client construction for the Interview Prep API.
+
+Pool sizing, timeouts and wire compression come from the environment, offline
+scans (quiz pool seeding, the attempt export, the dedup job) can be routed to
+secondaries with bounded staleness, and connection pool checkout waits are recorded so
+they can be exposed on /api/metrics.
+"""
+
+import importlib.util
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+
+# Upper bounds (ms) of the checkout wait histogram buckets
+WAIT_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def available_compressors() -> List[str]:
+    """Wire compressors whose Python modules are installed, best first"""
+    compressors = []
+    if importlib.util.find_spec("zstandard"):
+        compressors.append("zstd")
+    if importlib.util.find_spec("snappy"):
+        compressors.append("snappy")
+    return compressors
+
+
+def client_options() -> Dict[str, Any]:
+    """Motor/PyMongo client keyword arguments built from MONGO_* variables"""
+    compressors = os.environ.get("MONGO_COMPRESSORS")
+    if compressors is None:
+        compressors = ",".join(available_compressors())
+
+    options = {
+        "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE", 100),
+        "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": _env_int("MONGO_MAX_IDLE_TIME_MS", None),
+        "waitQueueTimeoutMS": _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", None),
+        "serverSelectionTimeoutMS": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "connectTimeoutMS": _env_int("MONGO_CONNECT_TIMEOUT_MS", 10000),
+        "socketTimeoutMS": _env_int("MONGO_SOCKET_TIMEOUT_MS", None),
+    }
+    if compressors:
+        options["compressors"] = compressors
+        if "zlib" in compressors:
+            options["zlibCompressionLevel"] = _env_int("MONGO_ZLIB_LEVEL", 1)
+    return {k: v for k, v in options.items() if v is not None}
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Collects connection pool checkout wait times and pool occupancy"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.failures = 0
+            self.wait_total_ms = 0.0
+            self.wait_max_ms = 0.0
+            self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+            self.checked_out = 0
+            self.open_connections = 0
+
+    def _record_wait(self, duration: Optional[float]):
+        if duration is None:
+            return
+        wait_ms = duration * 1000
+        self.wait_total_ms += wait_ms
+        self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+        for i, bound in enumerate(WAIT_BUCKETS_MS):
+            if wait_ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self._record_wait(getattr(event, "duration", None))
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.failures += 1
+            self._record_wait(getattr(event, "duration", None))
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    # Remaining CMAP events are not needed for these metrics
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = self.checkouts + self.failures
+            labels = [f"le_{b}ms" for b in WAIT_BUCKETS_MS] + ["inf"]
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failures": self.failures,
+                "checked_out": self.checked_out,
+                "open_connections": self.open_connections,
+                "wait_avg_ms": round(self.wait_total_ms / waits, 3) if waits else 0.0,
+                "wait_max_ms": round(self.wait_max_ms, 3),
+                "wait_histogram": dict(zip(labels, self.buckets)),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+def create_client(mongo_url: str) -> AsyncIOMotorClient:
+    # connect=False defers sockets and monitor threads to first use, so the
+    # client is safe to create before gunicorn forks workers (preload_app)
+    return AsyncIOMotorClient(
+        mongo_url,
+        connect=False,
+        event_listeners=[pool_metrics],
+        **client_options(),
+    )
+
+
+def reporting_database(client: AsyncIOMotorClient, name: str):
+    """Database handle for offline scans that tolerate stale data.
+
+    MONGO_REPORTING_READ_PREFERENCE defaults to secondaryPreferred, so these
+    scans leave the primary to quiz writes when a replica set is available.
+    Reads that must see earlier writes (caches, a user's attempts) use the
+    primary.
+    MONGO_MAX_STALENESS_SECONDS bounds how far behind a secondary may be
+    (MongoDB requires at least 90; -1 disables the bound).
+    """
+    mode = read_pref_mode_from_name(os.environ.get("MONGO_REPORTING_READ_PREFERENCE", "secondaryPreferred"))
+    max_staleness = _env_int("MONGO_MAX_STALENESS_SECONDS", 90)
+    if mode == 0:
+        # primary does not accept max_staleness
+        read_preference = make_read_preference(mode, None)
+    else:
+        read_preference = make_read_preference(mode, None, max_staleness=max_staleness)
+    return client.get_database(name, read_preference=read_preference)
@@ -0,0 +1,226 @@
+"""
+Near-duplicate question detection with MinHash signatures and LSH banding.
+
+Every question stores `minhash` (MINHASH_PERM ints over character 5-gram
+shingles of its text, normalised to content words without stopwords or
+plural s) and `lsh_bands` (one int per band of LSH_ROWS signature rows). Two questions sharing any band are candidates; a
+candidate is a duplicate when the estimated Jaccard similarity of their
+signatures reaches DEDUP_THRESHOLD. With a multikey index on `lsh_bands`
+the check on insert reads only the candidates instead of the whole bank.
+
+Batch job (from backend/):
+    python dedup.py --backfill         # add signatures to existing questions
+    python dedup.py --cluster          # report duplicate clusters
+    python dedup.py --cluster --apply  # move duplicates to question_duplicates
+"""
+
+import argparse
+import asyncio
+import os
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import ids
+from search import tokenize
+
+MINHASH_PERM = 64
+LSH_ROWS = 4  # 16 bands of 4 rows: candidates from roughly 0.5 Jaccard upwards
+SHINGLE_SIZE = 5
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", 0.7))
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(1729)
+_A = _rng.integers(1, _PRIME, MINHASH_PERM, dtype=np.int64)
+_B = _rng.integers(0, _PRIME, MINHASH_PERM, dtype=np.int64)
+
+
+def normalize(text: str) -> str:
+    """Lowercase content words with stopwords and plural s removed"""
+    words = []
+    for token in tokenize(text):
+        if len(token) < 2:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        words.append(token)
+    return " ".join(words)
+
+
+def shingles(text: str) -> List[int]:
+    text = normalize(text)
+    if len(text) <= SHINGLE_SIZE:
+        return [zlib.crc32(text.encode())] if text else []
+    return list({
+        zlib.crc32(text[i:i + SHINGLE_SIZE].encode())
+        for i in range(len(text) - SHINGLE_SIZE + 1)
+    })
+
+
+def minhash(text: str) -> List[int]:
+    values = np.array(shingles(text), dtype=np.int64) & _PRIME
+    if not len(values):
+        return [_PRIME] * MINHASH_PERM
+    hashed = (_A[:, None] * values[None, :] + _B[:, None]) % _PRIME
+    return hashed.min(axis=1).tolist()
+
+
+def lsh_bands(signature: List[int]) -> List[int]:
+    bands = []
+    for band, start in enumerate(range(0, len(signature), LSH_ROWS)):
+        rows = np.array(signature[start:start + LSH_ROWS], dtype=np.int64).tobytes()
+        bands.append((band << 32) | zlib.crc32(rows))
+    return bands
+
+
+def jaccard(a: List[int], b: List[int]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures"""
+    return float(np.mean(np.array(a) == np.array(b)))
+
+
+def signature_fields(text: str) -> Dict[str, List[int]]:
+    """Fields to store on a question document"""
+    signature = minhash(text)
+    return {"minhash": signature, "lsh_bands": lsh_bands(signature)}
+
+
+async def find_duplicate(collection, fields: Dict[str, List[int]], exclude_id: Optional[str] = None) -> Optional[Tuple[dict, float]]:
+    """Best matching existing question at or above DEDUP_THRESHOLD, if any"""
+    query = {"lsh_bands": {"$in": fields["lsh_bands"]}}
+    if exclude_id:
+        query["id"] = {"$nin": ids.forms([exclude_id])}
+    best = None
+    async for doc in collection.find(query, {"_id": 0, "id": 1, "text": 1, "minhash": 1}):
+        score = jaccard(fields["minhash"], doc["minhash"])
+        if score >= DEDUP_THRESHOLD and (best is None or score > best[1]):
+            best = (doc, score)
+    return best
+
+
+async def load_candidates(collection, signatures: Iterable[Dict[str, List[int]]]) -> "LSHIndex":
+    """Stored questions sharing a band with any of the signatures, in one query"""
+    bands = sorted({band for fields in signatures for band in fields["lsh_bands"]})
+    index = LSHIndex()
+    if bands:
+        async for doc in collection.find(
+            {"lsh_bands": {"$in": bands}}, {"_id": 0, "id": 1, "minhash": 1, "lsh_bands": 1}
+        ):
+            index.add(ids.decode(doc["id"]), doc)
+    return index
+
+
+class LSHIndex:
+    """In-memory LSH buckets, for deduplicating a batch before it is written"""
+
+    def __init__(self):
+        self.buckets: Dict[int, List[str]] = {}
+        self.signatures: Dict[str, List[int]] = {}
+
+    def add(self, doc_id: str, fields: Dict[str, List[int]]):
+        self.signatures[doc_id] = fields["minhash"]
+        for band in fields["lsh_bands"]:
+            self.buckets.setdefault(band, []).append(doc_id)
+
+    def duplicates(self, fields: Dict[str, List[int]]) -> List[Tuple[str, float]]:
+        candidates = {c for band in fields["lsh_bands"] for c in self.buckets.get(band, ())}
+        matches = [(c, jaccard(fields["minhash"], self.signatures[c])) for c in candidates]
+        return sorted([m for m in matches if m[1] >= DEDUP_THRESHOLD], key=lambda m: -m[1])
+
+
+def cluster(docs: Iterable[dict]) -> List[List[str]]:
+    """Group question ids into near-duplicate clusters (union-find over LSH candidates)"""
+    parent: Dict[str, str] = {}
+
+    def find(x: str) -> str:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    index = LSHIndex()
+    for doc in docs:
+        doc_id = doc["id"]
+        parent[doc_id] = doc_id
+        fields = {"minhash": doc["minhash"], "lsh_bands": doc["lsh_bands"]}
+        for other, _ in index.duplicates(fields):
+            parent[find(doc_id)] = find(other)
+        index.add(doc_id, fields)
+
+    groups: Dict[str, List[str]] = {}
+    for doc_id in parent:
+        groups.setdefault(find(doc_id), []).append(doc_id)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+# ============= BATCH JOB =============
+
+async def backfill(db, batch_size: int = 1000) -> int:
+    from pymongo import UpdateOne
+
+    updated = 0
+    ops = []
+    async for doc in db.questions.find({"minhash": {"$exists": False}}, {"_id": 0, "id": 1, "text": 1}):
+        ops.append(UpdateOne({"id": doc["id"]}, {"$set": signature_fields(doc["text"])}))
+        if len(ops) >= batch_size:
+            await db.questions.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+    if ops:
+        await db.questions.bulk_write(ops, ordered=False)
+        updated += len(ops)
+    return updated
+
+
+async def run_cluster(db, apply: bool, scan_db=None) -> List[List[str]]:
+    # Oldest first, so the first member of a cluster is the one that is kept.
+    # The full scan may come from a secondary (scan_db); moves go to db.
+    cursor = (scan_db or db).questions.find(
+        {"minhash": {"$exists": True}},
+        {"_id": 0, "id": 1, "minhash": 1, "lsh_bands": 1},
+    ).sort("created_at", 1)
+    clusters = cluster([doc async for doc in cursor])
+    for members in clusters:
+        keep, duplicates = members[0], members[1:]
+        print(f"{ids.decode(keep)}: {len(duplicates)} duplicate(s) {[ids.decode(d) for d in duplicates]}")
+        if apply:
+            docs = await db.questions.find({"id": {"$in": duplicates}}).to_list(None)
+            for doc in docs:
+                doc.pop("_id", None)
+                doc["duplicate_of"] = keep
+            if docs:
+                # Keep the documents so old quiz attempts can still show them
+                await db.question_duplicates.insert_many(docs)
+                await db.questions.delete_many({"id": {"$in": duplicates}})
+    if apply and clusters:
+        for cache_name in ("questions", "catalog"):
+            await db.cache_versions.update_one({"_id": cache_name}, {"$inc": {"version": 1}}, upsert=True)
+    return clusters
+
+
+async def main(args):
+    from dotenv import load_dotenv
+    from pathlib import Path
+    from database import create_client, reporting_database
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = create_client(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    await db.questions.create_index("lsh_bands")
+
+    if args.backfill:
+        print(f"Added signatures to {await backfill(db)} question(s)")
+    if args.cluster:
+        clusters = await run_cluster(db, args.apply, reporting_database(client, os.environ['DB_NAME']))
+        removed = sum(len(members) - 1 for members in clusters)
+        action = "Moved" if args.apply else "Found"
+        print(f"{action} {removed} duplicate(s) in {len(clusters)} cluster(s)")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Near-duplicate question maintenance")
+    parser.add_argument("--backfill", action="store_true", help="compute missing signatures")
+    parser.add_argument("--cluster", action="store_true", help="report duplicate clusters")
+    parser.add_argument("--apply", action="store_true", help="move duplicates to question_duplicates")
+    asyncio.run(main(parser.parse_args()))
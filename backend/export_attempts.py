@@ -0,0 +1,254 @@
+"""
+Columnar export of completed quiz attempts for offline reporting.
+
+    python export_attempts.py                         # Parquet into exports/attempts
+    python export_attempts.py --format arrow --out /data/attempts
+    python export_attempts.py --full                  # ignore saved progress
+
+Each answered question becomes one row: the attempt (id, user, completion
+time, totals) joined with the question's topic, difficulty, company and type.
+Rows are written per batch of attempts into Hive-style date partitions
+(`date=YYYY-MM-DD/part-....parquet`), so reports can prune by date.
+
+Attempts are read from the reporting database in (completed_at, id) order and
+progress is saved in `_state.json` after every batch; the next run resumes
+after the last exported attempt. Part file names are derived from the first
+attempt in the batch, so a batch re-run after a crash overwrites its own
+partial output instead of duplicating it. Both attempt schemas are read
+(see attempts.py); schema 1 attempts written after schema 2 ones have been
+exported are picked up once `attempts.py --migrate` has converted them.
+
+The position is also saved in the `export_checkpoints` collection:
+archive.py only archives attempts the export has passed, since archived
+attempts are no longer in quiz_attempts. --full clears it, so archival
+waits until the new export has caught up.
+
+Needs pyarrow (listed in requirements.txt); the API process never imports it.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+import ids
+from archive import EXPORT_CHECKPOINT
+from attempts import decode_attempt
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional, only this job needs it
+    pa = pq = None
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+QUESTION_FIELDS = ("topic", "difficulty", "company", "question_type")
+
+
+def _schema():
+    return pa.schema([
+        ("attempt_id", pa.string()),
+        ("user_id", pa.string()),
+        ("completed_at", pa.timestamp("ms", tz="UTC")),
+        ("position", pa.int16()),
+        ("question_id", pa.string()),
+        ("topic", pa.string()),
+        ("difficulty", pa.string()),
+        ("company", pa.string()),
+        ("question_type", pa.string()),
+        ("answer", pa.string()),
+        ("correct", pa.bool_()),
+        ("attempt_total_questions", pa.int32()),
+        ("attempt_correct_answers", pa.int32()),
+        ("attempt_time_taken", pa.int32()),
+    ])
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class QuestionMeta:
+    """Question metadata lookups, fetched per batch and kept for the run"""
+
+    def __init__(self, db):
+        self.db = db
+        self.meta: Dict[str, dict] = {}
+
+    async def load(self, question_ids: Iterable[str]):
+        missing = list({i for i in question_ids if i not in self.meta})
+        if not missing:
+            return
+        projection = {"_id": 0, "id": 1, **{f: 1 for f in QUESTION_FIELDS}}
+        # Questions moved out by the dedup job are still needed for history
+        for collection in (self.db.questions, self.db.question_duplicates):
+            async for doc in collection.find({"id": {"$in": ids.forms(missing)}}, projection):
+                self.meta[ids.decode(doc["id"])] = doc
+            missing = [i for i in missing if i not in self.meta]
+            if not missing:
+                break
+        for question_id in missing:
+            self.meta[question_id] = {}
+
+    def get(self, question_id: str) -> dict:
+        return self.meta.get(question_id, {})
+
+
+def flatten(attempt: dict, questions: QuestionMeta) -> List[dict]:
+    completed_at = _as_datetime(attempt.get("completed_at"))
+    answers = attempt.get("user_answers") or {}
+    scores = attempt.get("scores") or {}
+    rows = []
+    for position, question_id in enumerate(attempt.get("questions", [])):
+        meta = questions.get(question_id)
+        rows.append({
+            "attempt_id": attempt["id"],
+            "user_id": attempt.get("user_id"),
+            "completed_at": completed_at,
+            "position": position,
+            "question_id": question_id,
+            **{f: meta.get(f) for f in QUESTION_FIELDS},
+            "answer": answers.get(question_id),
+            "correct": bool(scores.get(question_id, False)),
+            "attempt_total_questions": attempt.get("total_questions"),
+            "attempt_correct_answers": attempt.get("correct_answers"),
+            "attempt_time_taken": attempt.get("time_taken"),
+        })
+    return rows
+
+
+class ExportState:
+    """Position after the last exported attempt, in stored (BSON) sort order"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.last_completed_at = None
+        self.last_is_date = False
+        self.last_id = None
+        self.attempts = 0
+        if path.exists():
+            data = json.loads(path.read_text())
+            self.last_completed_at = data.get("last_completed_at")
+            self.last_is_date = data.get("last_is_date", False)
+            self.last_id = data.get("last_id")
+            self.attempts = data.get("attempts", 0)
+
+    def query(self) -> dict:
+        query = {"completed_at": {"$ne": None}}
+        if self.last_completed_at is None:
+            return query
+        # Schema 1 attempts store completed_at as an ISO string, schema 2 as a
+        # date; BSON sorts every string before every date.
+        last = _as_datetime(self.last_completed_at) if self.last_is_date else self.last_completed_at
+        query["$or"] = [
+            {"completed_at": {"$gt": last}},
+            {"completed_at": last, "id": {"$gt": ids.encode(self.last_id)}},
+        ]
+        if not self.last_is_date:
+            query["$or"].append({"completed_at": {"$type": "date"}})
+        return query
+
+    def advance(self, attempt: dict, count: int):
+        completed_at = attempt["completed_at"]
+        self.last_is_date = isinstance(completed_at, datetime)
+        self.last_completed_at = completed_at.isoformat() if self.last_is_date else completed_at
+        self.last_id = ids.decode(attempt["id"])
+        self.attempts += count
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "last_completed_at": self.last_completed_at,
+            "last_is_date": self.last_is_date,
+            "last_id": self.last_id,
+            "attempts": self.attempts,
+        }))
+        os.replace(tmp, self.path)
+
+
+def write_partitions(out: Path, rows: List[dict], fmt: str, part_name: str) -> int:
+    schema = _schema()
+    by_date = defaultdict(list)
+    for row in rows:
+        day = row["completed_at"].date().isoformat() if row["completed_at"] else "unknown"
+        by_date[day].append(row)
+    for day, day_rows in by_date.items():
+        directory = out / f"date={day}"
+        directory.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pylist(day_rows, schema=schema)
+        if fmt == "parquet":
+            pq.write_table(table, directory / f"{part_name}.parquet", compression="zstd")
+        else:
+            with pa.OSFile(str(directory / f"{part_name}.arrow"), "wb") as sink:
+                with pa.ipc.new_file(sink, schema) as writer:
+                    writer.write_table(table)
+    return len(by_date)
+
+
+async def export(db, out: Path, fmt: str = "parquet", batch_size: int = 2000, full: bool = False) -> int:
+    if pa is None:
+        raise SystemExit("export_attempts.py needs pyarrow: pip install pyarrow")
+    out.mkdir(parents=True, exist_ok=True)
+    state_path = out / "_state.json"
+    if full and state_path.exists():
+        state_path.unlink()
+    state = ExportState(state_path)
+    if full:
+        await db.export_checkpoints.delete_one({"_id": EXPORT_CHECKPOINT})
+    questions = QuestionMeta(db)
+
+    exported = 0
+    while True:
+        stored = await db.quiz_attempts.find(state.query(), {"_id": 0}).sort(
+            [("completed_at", 1), ("id", 1)]
+        ).limit(batch_size).to_list(batch_size)
+        if not stored:
+            break
+        batch = [decode_attempt(doc) for doc in stored]
+        await questions.load(q for attempt in batch for q in attempt.get("questions", []))
+        rows = [row for attempt in batch for row in flatten(attempt, questions)]
+        first = batch[0]
+        stamp = _as_datetime(first["completed_at"]).strftime("%Y%m%dT%H%M%S%f")
+        write_partitions(out, rows, fmt, f"part-{stamp}-{first['id'][:8]}")
+        state.advance(stored[-1], len(batch))
+        last = stored[-1]
+        if isinstance(last["completed_at"], datetime):
+            # archive.py only moves attempts out of quiz_attempts once they are exported
+            await db.export_checkpoints.replace_one(
+                {"_id": EXPORT_CHECKPOINT},
+                {"completed_at": last["completed_at"], "id": last["id"]},
+                upsert=True,
+            )
+        exported += len(batch)
+        print(f"Exported {exported} attempt(s), {len(rows)} row(s) in last batch")
+    return exported
+
+
+async def main(args):
+    from database import create_client, reporting_database
+
+    client = create_client(os.environ['MONGO_URL'])
+    db = reporting_database(client, os.environ['DB_NAME'])
+    await db.quiz_attempts.create_index([("completed_at", 1), ("id", 1)])
+    total = await export(db, Path(args.out), args.format, args.batch_size, args.full)
+    print(f"✅ Exported {total} new attempt(s) to {args.out}")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export quiz attempts to Parquet/Arrow")
+    parser.add_argument("--out", default=str(ROOT_DIR / "exports" / "attempts"))
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--batch-size", type=int, default=2000, help="attempts per batch")
+    parser.add_argument("--full", action="store_true", help="start over instead of resuming")
+    asyncio.run(main(parser.parse_args()))
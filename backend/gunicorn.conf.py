@@ -0,0 +1,28 @@
+"""
+Gunicorn settings for running the API on every core.
+
+    cd backend && gunicorn server:app -c gunicorn.conf.py
+
+server.py is imported once in the master (preload_app) and then forked. The
+Mongo client is created with connect=False and the LLM model, question cache
+and catalog cache are resolved in each worker's startup hook, so nothing
+holding sockets or threads crosses the fork. Cache invalidations reach every
+worker through the cache_versions collection (see cache.py).
+"""
+
+import multiprocessing
+import os
+
+bind = f"{os.environ.get('BACKEND_HOST', '0.0.0.0')}:{os.environ.get('BACKEND_PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# Read by the app too (sessions.py checks SESSION_SECRET is set for several workers)
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
+
+
+def post_fork(server, worker):
+    server.log.info(f"Worker {worker.pid} forked; warm-up runs in its startup hook")
@@ -0,0 +1,57 @@
+"""
+Conditional GET support for cacheable reads.
+
+Routes derive a strong ETag from data they already hold in memory (question
+content hashes, the catalog cache, a completed attempt's id and completion
+time) before building a response. When it matches If-None-Match the route
+returns a bodyless 304, so neither the pydantic models nor the JSON body are
+built. Every response carries the ETag and a per-route Cache-Control.
+"""
+
+import hashlib
+import inspect
+import json
+from typing import Any, Callable, Optional
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+# Cache-Control per kind of resource
+# Questions are edited in place by the seeder: cached copies revalidate with their ETag
+QUESTION = "public, no-cache"
+CATALOG = "public, max-age=60"
+PRIVATE = "private, max-age=300"
+
+
+def make_etag(*parts: Any) -> str:
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return '"%s"' % hashlib.blake2b(encoded.encode(), digest_size=12).hexdigest()
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+async def conditional_response(
+    request: Request, etag: str, cache_control: str, build: Callable[[], Any]
+) -> Response:
+    """304 if the client's copy is current, otherwise the JSON body from build()"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    body = build()
+    if inspect.isawaitable(body):
+        body = await body
+    return JSONResponse(jsonable_encoder(body), headers=headers)
@@ -0,0 +1,165 @@
+"""
+Identifier encoding for users, questions and quiz attempts.
+
+The API always exposes ids as UUID strings. With ID_FORMAT=binary they are
+stored as 16-byte BSON binary (subtype 4) instead of 36-byte strings, which
+makes the `id` indexes smaller and id comparisons cheaper. Ids that are not
+canonical UUIDs (e.g. seeded questions like "q1") are stored as strings in
+either format.
+
+All conversion goes through this module:
+    encode(value)       API id -> stored value (depends on ID_FORMAT)
+    decode(value)       stored value of either format -> API id
+    match(value)        filter value for one id, matching both formats
+                        while ID_FORMAT=binary (until migrated)
+    forms(values)       every stored form of a list of ids, for $in / $nin
+
+Switching to binary: set ID_FORMAT=binary on every API worker, then run
+`python ids.py --migrate`. Switching back: run `python ids.py --migrate
+--to string` while ID_FORMAT=binary is still set, then unset it. Question
+ids inside schema 2 quiz attempts are binary either way (see attempts.py).
+"""
+
+import argparse
+import asyncio
+import os
+import uuid
+from typing import Iterable, List, Optional
+
+from bson.binary import Binary, UuidRepresentation
+
+BINARY_IDS = os.environ.get("ID_FORMAT", "string") == "binary"
+
+# Id fields per collection, converted by the migration
+ID_FIELDS = {
+    "users": ("id",),
+    "questions": ("id",),
+    "question_duplicates": ("id", "duplicate_of"),
+    "quiz_attempts": ("id", "user_id"),
+    "attempt_summaries": ("user_id",),
+    "attempt_archive": ("user_id",),
+    "user_progress": ("user_id",),
+    "quiz_daily": ("user_id",),
+    "notification_outbox": ("user_id",),
+}
+
+
+def new_id() -> str:
+    return str(uuid.uuid4())
+
+
+def to_binary(value):
+    """Binary form of a canonical UUID string; anything else is returned as is"""
+    if not isinstance(value, str):
+        return value
+    try:
+        parsed = uuid.UUID(value)
+    except ValueError:
+        return value
+    if str(parsed) != value:
+        return value
+    return Binary.from_uuid(parsed, UuidRepresentation.STANDARD)
+
+
+def encode(value):
+    return to_binary(value) if BINARY_IDS else value
+
+
+def decode(value) -> Optional[str]:
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Binary) and value.subtype == 4:
+        return str(value.as_uuid(UuidRepresentation.STANDARD))
+    return value
+
+
+def forms(values: Iterable) -> List:
+    result = []
+    for value in values:
+        value = decode(value)
+        result.append(value)
+        if BINARY_IDS:
+            binary = to_binary(value)
+            if binary is not value:
+                result.append(binary)
+    return result
+
+
+def match(value):
+    both = forms([value])
+    return both[0] if len(both) == 1 else {"$in": both}
+
+
+def decode_doc(doc: Optional[dict], *fields: str) -> Optional[dict]:
+    """Copy of a stored document with its id fields decoded ("id" by default)"""
+    if doc is not None:
+        doc = dict(doc)
+        for field in fields or ("id",):
+            if field in doc:
+                doc[field] = decode(doc[field])
+    return doc
+
+
+def encode_doc(doc: dict, *fields: str) -> dict:
+    """Copy of a document with its id fields in the stored format"""
+    doc = dict(doc)
+    for field in fields or ("id",):
+        if field in doc:
+            doc[field] = encode(doc[field])
+    return doc
+
+
+# ============= MIGRATION =============
+
+async def migrate(db, to_binary_ids: bool = True, batch_size: int = 1000) -> dict:
+    from pymongo import UpdateOne
+
+    convert = to_binary if to_binary_ids else decode
+    source_type = "string" if to_binary_ids else "binData"
+    counts = {}
+    for name, fields in ID_FIELDS.items():
+        collection = db[name]
+        counts[name] = 0
+        ops = []
+        query = {"$or": [{field: {"$type": source_type}} for field in fields]}
+        async for doc in collection.find(query, {field: 1 for field in fields}, batch_size=batch_size):
+            changes = {}
+            for field in fields:
+                if field in doc:
+                    converted = convert(doc[field])
+                    if converted is not doc[field]:
+                        changes[field] = converted
+            if changes:
+                # Conditional on the old values, so concurrent writers win
+                ops.append(UpdateOne({"_id": doc["_id"], **{f: doc[f] for f in changes}}, {"$set": changes}))
+            if len(ops) >= batch_size:
+                counts[name] += (await collection.bulk_write(ops, ordered=False)).modified_count
+                ops = []
+        if ops:
+            counts[name] += (await collection.bulk_write(ops, ordered=False)).modified_count
+    return counts
+
+
+async def main(args):
+    from dotenv import load_dotenv
+    from pathlib import Path
+    from database import create_client
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = create_client(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    counts = await migrate(db, args.to == "binary", args.batch_size)
+    for name, count in counts.items():
+        print(f"{name}: {count} document(s) converted to {args.to} ids")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert stored ids between string and binary UUIDs")
+    parser.add_argument("--migrate", action="store_true", help="convert existing documents")
+    parser.add_argument("--to", choices=["binary", "string"], default="binary")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    if not args.migrate:
+        parser.error("nothing to do (use --migrate)")
+    asyncio.run(main(args))
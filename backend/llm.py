@@ -0,0 +1,231 @@
+"""
+Pluggable LLM providers for the Interview Prep API.
+
+server.py talks to a provider instead of calling google.generativeai directly.
+Set LLM_PROVIDER=fake to use the deterministic local fake (no network), which
+can simulate latency, streaming cadence, 429 quota errors and fixed grading
+verdicts for benchmarks and offline testing.
+
+google.generativeai (and with it grpc and protobuf) is only imported when the
+Gemini provider is first used, normally by warmup(), always in a worker
+thread, so importing this module or server.py stays cheap and a request
+that arrives before the warm-up does not block the event loop.
+"""
+
+import asyncio
+import importlib
+from abc import ABC, abstractmethod
+import logging
+import os
+import random
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+DEFAULT_CHAT_MODEL = "gemini-2.5-pro"
+DEFAULT_FAST_MODEL = "gemini-2.0-flash"
+
+
+class LLMQuotaError(Exception):
+    """Raised when the provider rejects a call with HTTP 429 / quota exceeded"""
+
+    def __init__(self, retry_after: float = 60):
+        self.retry_after = retry_after
+        super().__init__(f"429 Quota exceeded. Please retry in {retry_after}s.")
+
+
+class LLMProvider(ABC):
+    """Interface every LLM backend implements"""
+
+    name = "base"
+
+    async def warmup(self) -> Optional[str]:
+        """Resolve models / open connections; returns the chat model name"""
+        return None
+
+    @abstractmethod
+    async def generate(self, prompt: str, model: Optional[str] = None, **kwargs) -> str:
+        """Complete prompt in one response"""
+
+    @abstractmethod
+    def stream(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        generation_config: Optional[Dict[str, Any]] = None,
+        safety_settings: Optional[List[Dict[str, str]]] = None,
+    ) -> AsyncIterator[str]:
+        """Complete prompt as an async iterator of text chunks"""
+
+
+# ============= GEMINI =============
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, api_key: str, preferred_model: str = DEFAULT_CHAT_MODEL):
+        self.api_key = api_key
+        self.preferred_model = preferred_model
+        self.chat_model: Optional[str] = None
+        self._genai = None
+
+    def _load_sdk(self):
+        """The SDK, imported and configured on first use; blocks, so call it in a thread"""
+        if self._genai is None:
+            genai = importlib.import_module("google.generativeai")
+            genai.configure(api_key=self.api_key)
+            self._genai = genai
+        return self._genai
+
+    async def _sdk(self):
+        if self._genai is not None:
+            return self._genai
+        return await asyncio.to_thread(self._load_sdk)
+
+    def _resolve_model(self) -> str:
+        models = [m.name for m in self._load_sdk().list_models()]
+        logging.debug(f"Available models: {models}")
+        model_name = next((m for m in models if self.preferred_model in m), None)
+        if not model_name:
+            model_name = next((m for m in models if "gemini" in m.lower()), None)
+        if not model_name:
+            raise Exception("No Gemini model available")
+        return model_name
+
+    async def warmup(self) -> str:
+        # The SDK import and list_models block; keep them off the event loop
+        self.chat_model = await asyncio.to_thread(self._resolve_model)
+        return self.chat_model
+
+    async def _model(self, model: Optional[str]):
+        genai = await self._sdk()
+        return genai.GenerativeModel(model or self.chat_model or f"models/{self.preferred_model}")
+
+    async def generate(self, prompt: str, model: Optional[str] = None, **kwargs) -> str:
+        response = await (await self._model(model)).generate_content_async(prompt, **kwargs)
+        return response.text
+
+    async def stream(self, prompt, model=None, generation_config=None, safety_settings=None):
+        response = await (await self._model(model)).generate_content_async(
+            prompt,
+            generation_config=generation_config,
+            safety_settings=safety_settings,
+            stream=True,
+        )
+        async for chunk in response:
+            if hasattr(chunk, "text"):
+                yield chunk.text
+
+
+# ============= FAKE =============
+
+class FakeLLMProvider(LLMProvider):
+    """Deterministic local stand-in for Gemini.
+
+    latency_ms / jitter_ms / distribution control time-to-first-token
+    ("fixed", "normal", "uniform" or "exponential"); chunk_delay_ms and
+    chunk_words control the streaming cadence; error_rate injects 429s;
+    verdict is "CORRECT", "INCORRECT" or "MATCH" (exact answer comparison).
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        distribution: str = "fixed",
+        chunk_delay_ms: float = 0.0,
+        chunk_words: int = 4,
+        error_rate: float = 0.0,
+        retry_after: float = 30,
+        verdict: str = "CORRECT",
+        reply: str = "This is a canned answer from the local fake LLM provider. "
+                     "Practice the fundamentals, explain your reasoning out loud and review your mistakes.",
+        seed: Optional[int] = None,
+    ):
+        if distribution not in ("fixed", "normal", "uniform", "exponential"):
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.distribution = distribution
+        self.chunk_delay_ms = chunk_delay_ms
+        self.chunk_words = max(1, chunk_words)
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.verdict = verdict.upper()
+        self.reply = reply
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeLLMProvider":
+        seed = os.environ.get("FAKE_LLM_SEED")
+        return cls(
+            latency_ms=float(os.environ.get("FAKE_LLM_LATENCY_MS", 0)),
+            jitter_ms=float(os.environ.get("FAKE_LLM_JITTER_MS", 0)),
+            distribution=os.environ.get("FAKE_LLM_DISTRIBUTION", "fixed"),
+            chunk_delay_ms=float(os.environ.get("FAKE_LLM_CHUNK_DELAY_MS", 0)),
+            chunk_words=int(os.environ.get("FAKE_LLM_CHUNK_WORDS", 4)),
+            error_rate=float(os.environ.get("FAKE_LLM_ERROR_RATE", 0)),
+            retry_after=float(os.environ.get("FAKE_LLM_RETRY_AFTER", 30)),
+            verdict=os.environ.get("FAKE_LLM_VERDICT", "CORRECT"),
+            seed=int(seed) if seed is not None else None,
+        )
+
+    def _latency(self) -> float:
+        if self.distribution == "normal":
+            ms = self.rng.gauss(self.latency_ms, self.jitter_ms)
+        elif self.distribution == "uniform":
+            ms = self.rng.uniform(self.latency_ms - self.jitter_ms, self.latency_ms + self.jitter_ms)
+        elif self.distribution == "exponential":
+            ms = self.rng.expovariate(1 / self.latency_ms) if self.latency_ms > 0 else 0
+        else:
+            ms = self.latency_ms
+        return max(0.0, ms) / 1000
+
+    async def _call(self):
+        self.calls += 1
+        await asyncio.sleep(self._latency())
+        if self.error_rate and self.rng.random() < self.error_rate:
+            raise LLMQuotaError(self.retry_after)
+
+    def _answer(self, prompt: str) -> str:
+        if "Respond with only 'CORRECT' or 'INCORRECT'" not in prompt:
+            return self.reply
+        if self.verdict != "MATCH":
+            return self.verdict
+        fields = dict(
+            line.split(": ", 1) for line in prompt.splitlines() if ": " in line
+        )
+        expected = fields.get("Correct Answer", "").strip().lower()
+        given = fields.get("User's Answer", "").strip().lower()
+        return "CORRECT" if expected and expected == given else "INCORRECT"
+
+    async def warmup(self) -> str:
+        return f"models/{DEFAULT_CHAT_MODEL}"
+
+    async def generate(self, prompt: str, model: Optional[str] = None, **kwargs) -> str:
+        await self._call()
+        return self._answer(prompt)
+
+    async def stream(self, prompt, model=None, generation_config=None, safety_settings=None):
+        await self._call()
+        words = self._answer(prompt).split(" ")
+        for i in range(0, len(words), self.chunk_words):
+            if i and self.chunk_delay_ms:
+                await asyncio.sleep(self.chunk_delay_ms / 1000)
+            chunk = " ".join(words[i:i + self.chunk_words])
+            yield chunk if i + self.chunk_words >= len(words) else chunk + " "
+
+
+def get_provider(name: Optional[str] = None) -> LLMProvider:
+    """Build the provider selected by LLM_PROVIDER (default: gemini)"""
+    name = (name or os.environ.get("LLM_PROVIDER", "gemini")).lower()
+    if name == "fake":
+        logging.info("Using fake LLM provider")
+        return FakeLLMProvider.from_env()
+    if name == "gemini":
+        api_key = os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY environment variable is not set")
+        return GeminiProvider(api_key)
+    raise ValueError(f"Unknown LLM_PROVIDER: {name}")
@@ -0,0 +1,328 @@
+"""
+Quiz goal reminders driven by notification_frequency and quiz_goal.
+
+Users are split into 16 shards by the first hex digit of their UUID, so a
+shard is a range scan on the `id` index. API workers claim shards through
+leases in `notification_shards` (renewed every tick, taken over when they
+expire), so each user is scheduled by exactly one worker however many run.
+
+A claimed shard is loaded once, streamed in batches, into compact arrays
+(16-byte id, frequency, goal per user) and a timing wheel of one slot per
+minute of the day holding array indexes. A user with frequency f fires every
+1440 / f minutes from a phase derived from their id; each time, the user is
+checked against today's quiz counter and put back in the wheel at their next
+slot. This keeps a million users on one worker at a few tens of MB, and a
+tick only touches the users due in the elapsed minutes. Users registered
+after the load are picked up by polling created_at.
+
+Daily counters (`quiz_daily`, one document per user and UTC day, expired by
+a TTL index) are incremented on every submit and read in batches when a
+slot fires. Reminders for users whose goal is not met are delivered in
+batches through a sink; the default OutboxSink inserts them into
+`notification_outbox` for a sender process to pick up. Reminders that no
+sender picks up expire through a TTL index on expires_at.
+
+    NOTIFICATIONS=1           enable (off by default: nothing sends the
+                              outbox yet, so only turn it on with a sender)
+    NOTIFY_TICK_SECONDS       seconds between ticks (default 5)
+    NOTIFY_LEASE_SECONDS      shard lease (default 60)
+    NOTIFY_MAX_SHARDS         shards one worker may own (default 16)
+    NOTIFY_BATCH              users per counter lookup / delivery (default 1000)
+    NOTIFY_OUTBOX_TTL_DAYS    days a reminder waits in the outbox (default 2)
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from bson.binary import Binary
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+import ids
+
+NOTIFICATIONS_ENABLED = os.environ.get("NOTIFICATIONS", "0") == "1"
+NOTIFY_TICK_SECONDS = float(os.environ.get("NOTIFY_TICK_SECONDS", 5))
+NOTIFY_LEASE_SECONDS = float(os.environ.get("NOTIFY_LEASE_SECONDS", 60))
+NOTIFY_MAX_SHARDS = int(os.environ.get("NOTIFY_MAX_SHARDS", 16))
+NOTIFY_BATCH = int(os.environ.get("NOTIFY_BATCH", 1000))
+NOTIFY_OUTBOX_TTL_DAYS = float(os.environ.get("NOTIFY_OUTBOX_TTL_DAYS", 2))
+
+SHARDS = 16
+SLOTS = 24 * 60
+NEW_USER_POLL = 60.0
+# Slots replayed after a pause (e.g. a restart) before skipping ahead
+MAX_CATCH_UP = 30
+
+logger = logging.getLogger(__name__)
+
+
+def shard_filter(shard: int) -> dict:
+    """Users of a shard, whichever id format they are stored in
+
+    Both ranges are always queried: ids stay binary after ID_FORMAT=binary is
+    turned off until `ids.py --migrate --to string` has run.
+    """
+    string = {"$gte": "%x" % shard, "$lt": "%x" % (shard + 1) if shard < 15 else "g"}
+    # Binary ids compare by their bytes, so the shard is the top nibble of the first byte
+    binary = {"$gte": Binary(bytes([shard << 4]) + bytes(15), 4)}
+    if shard < 15:
+        binary["$lt"] = Binary(bytes([(shard + 1) << 4]) + bytes(15), 4)
+    return {"$or": [{"id": string}, {"id": binary}]}
+
+
+def day_key(now: datetime) -> str:
+    return now.strftime("%Y-%m-%d")
+
+
+class OutboxSink:
+    """Default sink: notifications wait in a collection for a sender"""
+
+    def __init__(self, collection: Callable[[], Any], ttl_days: float = NOTIFY_OUTBOX_TTL_DAYS):
+        self.collection = collection
+        self.ttl = timedelta(days=ttl_days)
+
+    async def deliver(self, notifications: List[dict]):
+        expires_at = datetime.now(timezone.utc) + self.ttl
+        await self.collection().insert_many(
+            [{**notification, "expires_at": expires_at} for notification in notifications], ordered=False
+        )
+
+
+class _Shard:
+    __slots__ = ("number", "user_ids", "frequency", "goal", "wheel", "watermark", "polled_at")
+
+    def __init__(self, number: int):
+        self.number = number
+        self.user_ids = bytearray()  # 16 bytes per user
+        self.frequency = array("H")
+        self.goal = array("B")
+        self.wheel: List[array] = [array("I") for _ in range(SLOTS)]
+        self.watermark: Optional[datetime] = None
+        self.polled_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.frequency)
+
+    def user_id(self, index: int) -> str:
+        return str(uuid.UUID(bytes=bytes(self.user_ids[index * 16 : index * 16 + 16])))
+
+    def interval(self, index: int) -> int:
+        return max(1, SLOTS // self.frequency[index])
+
+    def phase(self, index: int) -> int:
+        return int.from_bytes(self.user_ids[index * 16 + 12 : index * 16 + 16], "big") % self.interval(index)
+
+    def next_slot(self, index: int, minute: int) -> int:
+        """First slot after minute; wraps to the phase for the next day"""
+        interval, phase = self.interval(index), self.phase(index)
+        following = phase + ((minute - phase) // interval + 1) * interval
+        return following if following < SLOTS else phase
+
+    def add(self, user: dict, minute: int):
+        try:
+            raw = uuid.UUID(ids.decode(user["id"])).bytes
+        except (ValueError, TypeError, AttributeError):
+            return
+        frequency = int(user.get("notification_frequency") or 0)
+        goal = int(user.get("quiz_goal") or 0)
+        if frequency <= 0 or goal <= 0:
+            return
+        index = len(self.frequency)
+        self.user_ids += raw
+        self.frequency.append(min(frequency, SLOTS))
+        self.goal.append(min(goal, 255))
+        self.wheel[self.next_slot(index, minute - 1)].append(index)
+
+
+class NotificationScheduler:
+    def __init__(
+        self,
+        db: Callable[[], Any],
+        sink=None,
+        tick: float = NOTIFY_TICK_SECONDS,
+        lease: float = NOTIFY_LEASE_SECONDS,
+        max_shards: int = NOTIFY_MAX_SHARDS,
+        batch_size: int = NOTIFY_BATCH,
+        enabled: bool = NOTIFICATIONS_ENABLED,
+    ):
+        # db returns the database
+        self.db = db
+        self.sink = sink or OutboxSink(lambda: self.db().notification_outbox)
+        self.tick = tick
+        self.lease = lease
+        self.max_shards = max_shards
+        self.batch_size = batch_size
+        self.enabled = enabled
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.shards: Dict[int, _Shard] = {}
+        self.last_minute: Optional[int] = None
+        self.last_day: Optional[str] = None
+        self.sent = 0
+        self.checked = 0
+        self._task: Optional[asyncio.Task] = None
+
+    # ----- counters -----
+
+    async def record_quiz(self, user_id: str, now: Optional[datetime] = None):
+        """Count a completed quiz towards today's goal"""
+        if not self.enabled:
+            return
+        now = now or datetime.now(timezone.utc)
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        await self.db().quiz_daily.update_one(
+            {"user_id": ids.encode(user_id), "day": day_key(now)},
+            {"$inc": {"quizzes": 1}, "$setOnInsert": {"expires_at": start + timedelta(days=2)}},
+            upsert=True,
+        )
+
+    async def _counts(self, user_ids: List[str], day: str) -> Dict[str, int]:
+        docs = await self.db().quiz_daily.find(
+            {"user_id": {"$in": ids.forms(user_ids)}, "day": day}, {"_id": 0, "user_id": 1, "quizzes": 1}
+        ).to_list(None)
+        return {ids.decode(d["user_id"]): d.get("quizzes", 0) for d in docs}
+
+    # ----- shard ownership -----
+
+    async def _claim(self, shard: int, now: datetime) -> bool:
+        shards = self.db().notification_shards
+        try:
+            await shards.update_one({"_id": shard}, {"$setOnInsert": {"owner": None, "expires": now}}, upsert=True)
+        except DuplicateKeyError:
+            pass  # created concurrently
+        doc = await shards.find_one_and_update(
+            {"_id": shard, "$or": [{"owner": self.owner}, {"expires": {"$lte": now}}]},
+            {"$set": {"owner": self.owner, "expires": now + timedelta(seconds=self.lease)}},
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc is not None
+
+    async def _manage_shards(self, now: datetime):
+        for number in list(self.shards):
+            if not await self._claim(number, now):
+                logger.info(f"Notification shard {number} taken over by another worker")
+                del self.shards[number]
+        if len(self.shards) >= self.max_shards:
+            return
+        # At most one new shard per tick, so workers that start together share them
+        for number in range(SHARDS):
+            if number not in self.shards and await self._claim(number, now):
+                self.shards[number] = await self._load(number, now)
+                return
+
+    async def _load(self, number: int, now: datetime) -> _Shard:
+        shard = _Shard(number)
+        minute = now.hour * 60 + now.minute
+        shard.watermark = now
+        cursor = self.db().users.find(
+            shard_filter(number),
+            {"_id": 0, "id": 1, "notification_frequency": 1, "quiz_goal": 1},
+            batch_size=self.batch_size,
+        )
+        async for user in cursor:
+            shard.add(user, minute)
+        logger.info(f"Notification shard {number}: {len(shard)} users scheduled")
+        return shard
+
+    async def _poll_new_users(self, shard: _Shard, now: datetime):
+        if now.timestamp() - shard.polled_at < NEW_USER_POLL:
+            return
+        shard.polled_at = now.timestamp()
+        minute = now.hour * 60 + now.minute
+        query = {**shard_filter(shard.number), "created_at": {"$gt": shard.watermark}}
+        async for user in self.db().users.find(
+            query, {"_id": 0, "id": 1, "notification_frequency": 1, "quiz_goal": 1, "created_at": 1}
+        ):
+            shard.add(user, minute)
+            created_at = user.get("created_at")
+            if isinstance(created_at, datetime):
+                created_at = created_at if created_at.tzinfo else created_at.replace(tzinfo=timezone.utc)
+                shard.watermark = max(shard.watermark, created_at)
+
+    # ----- firing -----
+
+    async def _fire(self, shard: _Shard, minute: int, day: str, now: datetime):
+        due = shard.wheel[minute]
+        if not due:
+            return
+        shard.wheel[minute] = array("I")
+        for start in range(0, len(due), self.batch_size):
+            chunk = due[start : start + self.batch_size]
+            user_ids = [shard.user_id(i) for i in chunk]
+            counts = await self._counts(user_ids, day)
+            notifications = []
+            for index, user_id in zip(chunk, user_ids):
+                shard.wheel[shard.next_slot(index, minute)].append(index)
+                done, goal = counts.get(user_id, 0), shard.goal[index]
+                if done < goal:
+                    notifications.append({
+                        "user_id": user_id,
+                        "kind": "quiz_goal",
+                        "message": f"Quiz goal not met today: {done}/{goal} quizzes completed",
+                        "day": day,
+                        "created_at": now,
+                    })
+            self.checked += len(chunk)
+            if notifications:
+                await self.sink.deliver(notifications)
+                self.sent += len(notifications)
+
+    async def run_once(self, now: Optional[datetime] = None):
+        now = now or datetime.now(timezone.utc)
+        await self._manage_shards(now)
+        minute = now.hour * 60 + now.minute
+        day = day_key(now)
+        if self.last_minute is None or self.last_day is None:
+            first = minute
+        elif self.last_day != day:
+            first = 0  # after midnight: the rest of yesterday is dropped
+        else:
+            first = self.last_minute + 1
+        first = max(first, minute - MAX_CATCH_UP + 1)
+        for shard in list(self.shards.values()):
+            await self._poll_new_users(shard, now)
+            for slot in range(first, minute + 1):
+                await self._fire(shard, slot, day, now)
+        self.last_minute, self.last_day = minute, day
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Notification tick failed: {str(e)}")
+            await asyncio.sleep(self.tick)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.shards:
+            # Release leases so another worker takes over right away
+            await self.db().notification_shards.update_many(
+                {"_id": {"$in": list(self.shards)}, "owner": self.owner},
+                {"$set": {"owner": None, "expires": datetime.now(timezone.utc)}},
+            )
+            self.shards.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "shards": sorted(self.shards),
+            "users": sum(len(s) for s in self.shards.values()),
+            "checked": self.checked,
+            "sent": self.sent,
+        }
@@ -0,0 +1,123 @@
+"""
+Password hashing off the event loop.
+
+Passwords are stored as scrypt hashes (hashlib, no extra dependency):
+
+    scrypt$<log2 N>$<r>$<p>$<salt b64>$<hash b64>
+
+Hashing costs tens of milliseconds of CPU by design, so hash_password() and
+verify_password() run in a bounded executor instead of the async handler;
+the loop keeps serving other requests while logins are being checked, and
+login throughput scales with PASSWORD_HASH_WORKERS. OpenSSL's scrypt runs
+without the GIL, so the default thread pool already uses several cores;
+PASSWORD_HASH_POOL=process moves the work into separate processes
+(spawned, not forked, and started lazily in each API worker).
+
+verify_password() also tells the caller when a stored hash should be
+replaced: hashes made with other cost parameters and legacy plaintext
+passwords are re-hashed transparently on the next successful login.
+
+    PASSWORD_SCRYPT_LOG_N     CPU/memory cost as log2 N (default 15)
+    PASSWORD_SCRYPT_R         block size (default 8)
+    PASSWORD_SCRYPT_P         parallelism (default 1)
+    PASSWORD_HASH_WORKERS     pool size (default: CPU count, at most 8)
+    PASSWORD_HASH_POOL        thread | process (default thread)
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+SCRYPT_LOG_N = int(os.environ.get("PASSWORD_SCRYPT_LOG_N", 15))
+SCRYPT_R = int(os.environ.get("PASSWORD_SCRYPT_R", 8))
+SCRYPT_P = int(os.environ.get("PASSWORD_SCRYPT_P", 1))
+HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", min(os.cpu_count() or 1, 8)))
+HASH_POOL = os.environ.get("PASSWORD_HASH_POOL", "thread")
+
+PREFIX = "scrypt"
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+_executor: Optional[Executor] = None
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _derive(password: str, salt: bytes, log_n: int, r: int, p: int) -> bytes:
+    n = 1 << log_n
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=256 * n * r * p, dklen=KEY_BYTES,
+    )
+
+
+# Module-level so they can be sent to a process pool
+
+def _hash(password: str, log_n: int, r: int, p: int) -> str:
+    salt = os.urandom(SALT_BYTES)
+    key = _derive(password, salt, log_n, r, p)
+    return f"{PREFIX}${log_n}${r}${p}${_b64(salt)}${_b64(key)}"
+
+
+def _verify(password: str, stored: str) -> bool:
+    try:
+        _, log_n, r, p, salt, key = stored.split("$")
+        expected = _unb64(key)
+        actual = _derive(password, _unb64(salt), int(log_n), int(r), int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def is_hashed(stored: str) -> bool:
+    return isinstance(stored, str) and stored.startswith(PREFIX + "$")
+
+
+def needs_rehash(stored: str) -> bool:
+    return not is_hashed(stored) or stored.split("$")[1:4] != [str(SCRYPT_LOG_N), str(SCRYPT_R), str(SCRYPT_P)]
+
+
+def executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if HASH_POOL == "process":
+            _executor = ProcessPoolExecutor(HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            _executor = ThreadPoolExecutor(HASH_WORKERS, thread_name_prefix="password-hash")
+    return _executor
+
+
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor(), _hash, password, SCRYPT_LOG_N, SCRYPT_R, SCRYPT_P)
+
+
+async def verify_password(password: str, stored: str) -> Tuple[bool, Optional[str]]:
+    """(matches, replacement hash to store or None)"""
+    if not is_hashed(stored):
+        # Legacy plaintext password
+        if not isinstance(stored, str) or not hmac.compare_digest(password.encode(), stored.encode()):
+            return False, None
+        return True, await hash_password(password)
+    loop = asyncio.get_running_loop()
+    if not await loop.run_in_executor(executor(), _verify, password, stored):
+        return False, None
+    return True, (await hash_password(password) if needs_rehash(stored) else None)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,134 @@
+"""
+Per-process copy of the question bank and the indexes derived from it.
+
+The bank is loaded once per worker (see the "questions" cache in server.py)
+and then kept current incrementally: questions created in this worker are
+added directly, questions created elsewhere are picked up by catch_up(),
+which reads everything newer than the bank's created_at watermark.
+
+Bulk changes (the seeder, dedup.py --apply) bump the cache version instead.
+Workers then compare every stored id and content_hash with the bank
+(changes()) and apply the difference in place (remove() / add_many()). Only
+a change to more than RECONCILE_LIMIT questions rebuilds the bank, off the
+event loop, and swaps the new one in (see server.py).
+"""
+
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from search import BM25Index
+from vectors import VectorIndex
+
+# Tolerated clock skew between API workers when catching up on new questions
+WATERMARK_SKEW = timedelta(seconds=30)
+# Changed questions applied in place on a version bump; more rebuild the bank
+RECONCILE_LIMIT = 2000
+
+
+def _as_utc(value) -> Optional[datetime]:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def content_version(doc: dict) -> str:
+    """Hash identifying a question's content (the seeder's content_hash when set)"""
+    if doc.get("content_hash"):
+        return doc["content_hash"]
+    encoded = json.dumps(doc, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest()
+
+
+class QuestionBank:
+    def __init__(self, loaded_at: Optional[datetime] = None):
+        self.by_id: Dict[str, dict] = {}
+        self.by_topic: Dict[str, List[str]] = {}
+        self._versions: Dict[str, str] = {}
+        self.search = BM25Index()
+        self.vectors = VectorIndex()
+        self.watermark = loaded_at or datetime.now(timezone.utc)
+        # Bumped on every change, for consumers that derive data from the bank
+        self.revision = 0
+
+    def __contains__(self, question_id: str) -> bool:
+        return question_id in self.by_id
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def get(self, question_id: str) -> Optional[dict]:
+        return self.by_id.get(question_id)
+
+    def values(self) -> Iterable[dict]:
+        return self.by_id.values()
+
+    def topic_ids(self, topic: str) -> List[str]:
+        return self.by_topic.get(topic, [])
+
+    def version(self, question_id: str) -> Optional[str]:
+        """content_version() of a question in the bank, computed once"""
+        version = self._versions.get(question_id)
+        if version is None and question_id in self.by_id:
+            version = self._versions[question_id] = content_version(self.by_id[question_id])
+        return version
+
+    def _track(self, doc: dict):
+        previous = self.by_id.get(doc["id"])
+        if previous is not None and previous.get("topic") != doc.get("topic"):
+            self.by_topic[previous.get("topic")].remove(doc["id"])
+            previous = None
+        if previous is None:
+            self.by_topic.setdefault(doc.get("topic"), []).append(doc["id"])
+        self.by_id[doc["id"]] = doc
+        self.revision += 1
+        self._versions.pop(doc["id"], None)
+        self.search.add(doc)
+        created_at = _as_utc(doc.get("created_at"))
+        if created_at and created_at > self.watermark:
+            self.watermark = created_at
+
+    def add(self, doc: dict):
+        self._track(doc)
+        self.vectors.add(doc)
+
+    def add_many(self, docs: Iterable[dict]):
+        docs = list(docs)
+        for doc in docs:
+            self._track(doc)
+        self.vectors.add_many(docs)
+
+    def remove(self, question_id: str):
+        doc = self.by_id.pop(question_id, None)
+        if doc is None:
+            return
+        self.by_topic[doc.get("topic")].remove(question_id)
+        self._versions.pop(question_id, None)
+        self.search.remove(question_id)
+        self.vectors.remove(question_id)
+        self.revision += 1
+
+    def changes(self, stored: Iterable[dict]) -> Tuple[List[str], List[str]]:
+        """(new or changed ids, removed ids), given the id and content_hash of every stored question"""
+        changed = []
+        present = set()
+        for doc in stored:
+            present.add(doc["id"])
+            current = self.by_id.get(doc["id"])
+            # Questions without a content_hash are never edited in place
+            if current is None or current.get("content_hash") != doc.get("content_hash"):
+                changed.append(doc["id"])
+        return changed, [q_id for q_id in self.by_id if q_id not in present]
+
+    def catch_up_query(self) -> dict:
+        return {"created_at": {"$gte": self.watermark - WATERMARK_SKEW}}
+
+    def add_new(self, docs: List[dict], synced_at: datetime) -> int:
+        """Add catch-up results not yet in the bank; returns how many were new"""
+        new = [d for d in docs if d["id"] not in self.by_id]
+        self.add_many(new)
+        self.watermark = max(self.watermark, synced_at)
+        return len(new)
@@ -0,0 +1,221 @@
+"""
+Pre-assembled question batches for popular quiz configurations.
+
+start_quiz normally queries the questions matching a topic set (plus optional
+difficulty and companies) and samples from them. The same few combinations,
+typically users' selected_topics, are asked for over and over, so a
+background task keeps a buffer of ready batches for the hottest ones: each
+batch is a run of question ids from a shuffled permutation of the matching
+questions in the in-memory bank (see question_bank.py).
+
+At quiz start take() pops batches and drops ids the user has already seen
+until it has enough; the unused end of the last batch stays in the pool.
+When the pool for a combination is missing or cannot fill the quiz from a
+few batches, take() returns None without consuming any of them, start_quiz
+falls back to the normal query, and the builder is woken to refill. Hotness is a decaying request count, seeded at
+startup from the most common selected_topics sets. New questions join a pool
+at its next reshuffle.
+
+    QUIZ_POOLS=0              disable
+    QUIZ_POOL_KEYS            combinations kept (default 64)
+    QUIZ_POOL_DEPTH           batches buffered per combination (default 8)
+    QUIZ_POOL_BATCH           question ids per batch (default 50)
+    QUIZ_POOL_INTERVAL        seconds between refills (default 1)
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+QUIZ_POOLS_ENABLED = os.environ.get("QUIZ_POOLS", "1") != "0"
+QUIZ_POOL_KEYS = int(os.environ.get("QUIZ_POOL_KEYS", 64))
+QUIZ_POOL_DEPTH = int(os.environ.get("QUIZ_POOL_DEPTH", 8))
+QUIZ_POOL_BATCH = int(os.environ.get("QUIZ_POOL_BATCH", 50))
+QUIZ_POOL_INTERVAL = float(os.environ.get("QUIZ_POOL_INTERVAL", 1))
+
+# Demand halves every five minutes without requests
+DEMAND_HALF_LIFE = 300.0
+MIN_DEMAND = 0.5
+# Batches one request may consume; a user who has seen most of a pool falls back
+MAX_BATCHES_PER_TAKE = 3
+
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[Tuple[str, ...], Optional[str], Tuple[str, ...]]
+
+
+def pool_key(topics: Iterable[str], difficulty: Optional[str] = None, companies: Optional[Iterable[str]] = None) -> PoolKey:
+    return (tuple(sorted(set(topics))), difficulty or None, tuple(sorted(set(companies or ()))))
+
+
+def matches(question: dict, key: PoolKey) -> bool:
+    topics, difficulty, companies = key
+    return (
+        question.get("topic") in topics
+        and (difficulty is None or question.get("difficulty") == difficulty)
+        and (not companies or question.get("company") in companies)
+    )
+
+
+class _Pool:
+    __slots__ = ("generation", "candidates", "order", "position", "batches")
+
+    def __init__(self):
+        self.generation = None
+        self.candidates: List[str] = []
+        self.order: List[str] = []
+        self.position = 0
+        self.batches: Deque[List[str]] = deque()
+
+
+class QuizPools:
+    def __init__(
+        self,
+        bank: Callable[[], Any],
+        max_keys: int = QUIZ_POOL_KEYS,
+        depth: int = QUIZ_POOL_DEPTH,
+        batch_size: int = QUIZ_POOL_BATCH,
+        interval: float = QUIZ_POOL_INTERVAL,
+        enabled: bool = QUIZ_POOLS_ENABLED,
+    ):
+        # bank returns the loaded QuestionBank or None; never triggers a load
+        self.bank = bank
+        self.max_keys = max_keys
+        self.depth = depth
+        self.batch_size = batch_size
+        self.interval = interval
+        self.enabled = enabled
+        self.demand: Dict[PoolKey, float] = {}
+        self.pools: Dict[PoolKey, _Pool] = {}
+        self.hits = 0
+        self.fallbacks = 0
+        self.batches_built = 0
+        self._decayed_at = time.monotonic()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def take(self, key: PoolKey, count: int, seen: Set[str]) -> Optional[List[str]]:
+        """count unseen question ids for key, or None to use the normal path"""
+        if not self.enabled:
+            return None
+        self.demand[key] = self.demand.get(key, 0.0) + 1
+        pool = self.pools.get(key)
+        bank = self.bank()
+        picked: List[str] = []
+        used, rest = 0, []
+        if pool is not None and bank is not None:
+            # Batches are only removed once they are known to fill the quiz;
+            # on a fallback the pool keeps them for the next user
+            chosen = set()
+            while len(picked) < count and used < min(MAX_BATCHES_PER_TAKE, len(pool.batches)):
+                batch = pool.batches[used]
+                used += 1
+                for position, q_id in enumerate(batch):
+                    if q_id not in seen and q_id not in chosen and q_id in bank:
+                        chosen.add(q_id)
+                        picked.append(q_id)
+                        if len(picked) == count:
+                            rest = batch[position + 1:]
+                            break
+        if len(picked) == count:
+            for _ in range(used):
+                pool.batches.popleft()
+            if rest:
+                pool.batches.appendleft(rest)
+        if pool is None or len(pool.batches) < max(1, self.depth // 2):
+            self._signal()
+        if len(picked) < count:
+            self.fallbacks += 1
+            return None
+        self.hits += 1
+        return picked
+
+    def seed(self, combinations: Sequence[Tuple[Iterable[str], int]]):
+        """Initial demand, e.g. users per selected_topics set"""
+        for topics, users in combinations:
+            key = pool_key(topics)
+            if key[0]:
+                self.demand[key] = self.demand.get(key, 0.0) + users
+        self._signal()
+
+    def _signal(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    def _hot_keys(self) -> List[PoolKey]:
+        now = time.monotonic()
+        decay = 0.5 ** ((now - self._decayed_at) / DEMAND_HALF_LIFE)
+        self._decayed_at = now
+        self.demand = {k: v * decay for k, v in self.demand.items() if v * decay >= MIN_DEMAND}
+        return sorted(self.demand, key=self.demand.get, reverse=True)[: self.max_keys]
+
+    def _fill(self, key: PoolKey, pool: _Pool, bank):
+        while len(pool.batches) < self.depth:
+            if pool.position >= len(pool.order):
+                # Reshuffle; pick up questions added since the last pass
+                generation = (id(bank), bank.revision)
+                if pool.generation != generation:
+                    pool.candidates = [q["id"] for q in bank.values() if matches(q, key)]
+                    pool.generation = generation
+                if not pool.candidates:
+                    return
+                pool.order = random.sample(pool.candidates, len(pool.candidates))
+                pool.position = 0
+            pool.batches.append(pool.order[pool.position : pool.position + self.batch_size])
+            pool.position += self.batch_size
+            self.batches_built += 1
+
+    async def refill(self):
+        bank = self.bank()
+        if bank is None:
+            return
+        hot = self._hot_keys()
+        for key in [k for k in self.pools if k not in hot]:
+            del self.pools[key]
+        for key in hot:
+            self._fill(key, self.pools.setdefault(key, _Pool()), bank)
+            # Matching scans the bank; let requests run between combinations
+            await asyncio.sleep(0)
+
+    async def _run(self):
+        while True:
+            # asyncio.wait, not wait_for: wait_for can swallow stop()'s cancellation
+            # when the wake-up arrives at the same moment
+            waiter = asyncio.ensure_future(self._wake.wait())
+            try:
+                await asyncio.wait({waiter}, timeout=self.interval)
+            finally:
+                waiter.cancel()
+            self._wake.clear()
+            try:
+                await self.refill()
+            except Exception as e:
+                logger.error(f"Quiz pool refill error: {str(e)}")
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "combinations": len(self.pools),
+            "batches": sum(len(p.batches) for p in self.pools.values()),
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "batches_built": self.batches_built,
+        }
@@ -0,0 +1,124 @@
+"""
+Live quiz sessions over WebSocket.
+
+Instead of answering everything and posting it to /api/quiz/submit, a client
+can connect to /api/quiz/{quiz_id}/live after /api/quiz/start. The server
+then drives the quiz one question at a time:
+
+    server -> {"type": "question", "index": i, "total": n, "question": {...},
+               "time_limit": seconds, "deadline": unix time}
+    client -> {"type": "answer", "question_id": ..., "answer": "..."}
+    server -> {"type": "error", "detail": ...}          stray or non-JSON message
+    server -> {"type": "graded", "question_id": ..., "correct": bool}
+    server -> {"type": "timeout", "question_id": ...}   no answer in time
+    server -> {"type": "result", ...}                   as /api/quiz/submit
+
+The deadline is the question's time_estimate plus QUIZ_SESSION_GRACE_SECONDS
+for network latency. Each answer is graded in its own task as soon as it
+arrives (descriptive answers go to the LLM) while the next question is
+already being shown, so grading is spread over the quiz instead of landing
+in one burst at submit, and the result is ready right after the last
+answer. The attempt is claimed for the whole session (submissions.py), so
+a second session or a submit cannot grade it meanwhile. A session that ends
+early, by a disconnect or an error, cancels its pending grading and leaves
+the attempt open; it can still be submitted the usual way.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+QUIZ_SESSION_GRACE_SECONDS = float(os.environ.get("QUIZ_SESSION_GRACE_SECONDS", 2))
+
+
+class QuizSession:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        questions: List[dict],
+        grade: Callable[[dict, str], Awaitable[bool]],
+        grace: float = QUIZ_SESSION_GRACE_SECONDS,
+    ):
+        # questions: full documents in quiz order; grade(question, answer) -> correct
+        self.websocket = websocket
+        self.questions = questions
+        self.grade = grade
+        self.grace = grace
+        self.user_answers: Dict[str, str] = {}
+        self.scores: Dict[str, bool] = {}
+        self._send_lock = asyncio.Lock()
+        self._grading: List[asyncio.Task] = []
+
+    async def send(self, message: Dict[str, Any]):
+        async with self._send_lock:
+            await self.websocket.send_json(message)
+
+    async def _grade(self, question: dict, answer: str):
+        correct = await self.grade(question, answer)
+        self.scores[question["id"]] = correct
+        await self.send({"type": "graded", "question_id": question["id"], "correct": correct})
+
+    async def _answer(self, question: dict, deadline: float):
+        """Wait for this question's answer until the deadline; late or stray messages are dropped"""
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            try:
+                frame = await asyncio.wait_for(self.websocket.receive(), remaining)
+            except asyncio.TimeoutError:
+                return None
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            try:
+                message = json.loads(frame.get("text") or frame.get("bytes") or "")
+            except ValueError:
+                # Not JSON (or not UTF-8); the session goes on
+                await self.send({"type": "error", "detail": "Messages must be JSON"})
+                continue
+            if (
+                isinstance(message, dict)
+                and message.get("type") == "answer"
+                and message.get("question_id") == question["id"]
+                and isinstance(message.get("answer"), str)
+            ):
+                return message["answer"]
+            await self.send({"type": "error", "detail": "Expected an answer to the current question"})
+
+    def duration(self) -> float:
+        """Longest time the questions can take to answer, in seconds"""
+        return sum(int(q.get("time_estimate") or 60) + self.grace for q in self.questions)
+
+    async def run(self, public: Callable[[dict], dict]) -> int:
+        """Ask every question; returns the time taken in seconds once all answers are graded"""
+        started = time.time()
+        try:
+            for index, question in enumerate(self.questions):
+                time_limit = int(question.get("time_estimate") or 60)
+                deadline = time.time() + time_limit + self.grace
+                await self.send({
+                    "type": "question",
+                    "index": index,
+                    "total": len(self.questions),
+                    "question": public(question),
+                    "time_limit": time_limit,
+                    "deadline": deadline - self.grace,
+                })
+                answer = await self._answer(question, deadline)
+                if answer is None:
+                    await self.send({"type": "timeout", "question_id": question["id"]})
+                    continue
+                self.user_answers[question["id"]] = answer
+                self._grading.append(asyncio.create_task(self._grade(question, answer)))
+            finished = time.time()
+            await asyncio.gather(*self._grading)
+        finally:
+            # Only left unfinished when the session ends early
+            for task in self._grading:
+                task.cancel()
+            await asyncio.gather(*self._grading, return_exceptions=True)
+        return int(finished - started)
@@ -0,0 +1,226 @@
+"""
+In-process BM25 keyword index over the question bank.
+
+Indexes `text`, `explanation` and `ai_answer` (text weighted highest) and
+keeps topic/difficulty/company per document for facet filters and counts.
+Documents are added and removed one at a time, so the index follows the
+question bank incrementally instead of being rebuilt.
+
+Each document gets an integer slot; postings are per-term lists of slots and
+weighted term frequencies, materialised as NumPy arrays on first use, so
+scoring, facet counting and top-k selection are vectorised over the bank.
+Per-slot lengths, liveness and facet codes are NumPy columns updated in
+place, so a search right after an add does not rebuild them. Removed
+documents are tombstoned and compacted away once they pile up.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by do does for from how in is it its of on or "
+    "the this that to was what when which who why with you your".split()
+)
+
+FIELD_WEIGHTS = {"text": 3.0, "explanation": 1.0, "ai_answer": 1.0}
+FACETS = ("topic", "difficulty", "company")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class _Postings:
+    __slots__ = ("slots", "tfs", "arrays")
+
+    def __init__(self):
+        self.slots: List[int] = []
+        self.tfs: List[float] = []
+        self.arrays: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def append(self, slot: int, tf: float):
+        self.slots.append(slot)
+        self.tfs.append(tf)
+        self.arrays = None
+
+    def as_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self.arrays is None:
+            self.arrays = (np.array(self.slots, dtype=np.int64), np.array(self.tfs, dtype=np.float32))
+        return self.arrays
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, _Postings] = {}
+        self.slot_of: Dict[str, int] = {}
+        self.ids: List[Optional[str]] = []
+        # Per-slot columns, grown by doubling and updated in place by add()/remove()
+        self.lengths = np.zeros(0, dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.facet_codes = np.zeros((len(FACETS), 0), dtype=np.int32)
+        self.facet_values: List[List[Optional[str]]] = [[None] for _ in FACETS]  # code 0 = missing
+        self.facet_lookup: List[Dict[str, int]] = [{} for _ in FACETS]
+        self.total_length = 0.0
+        self.dead = 0
+        self._norms: Optional[np.ndarray] = None
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def _facet_code(self, i: int, value: Optional[str]) -> int:
+        if not value:
+            return 0
+        code = self.facet_lookup[i].get(value)
+        if code is None:
+            code = len(self.facet_values[i])
+            self.facet_lookup[i][value] = code
+            self.facet_values[i].append(value)
+        return code
+
+    def _reserve(self, size: int):
+        capacity = len(self.alive)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 1024)
+        n = len(self.ids)
+        lengths = np.zeros(capacity, dtype=np.float32)
+        lengths[:n] = self.lengths[:n]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:n] = self.alive[:n]
+        facet_codes = np.zeros((len(FACETS), capacity), dtype=np.int32)
+        facet_codes[:, :n] = self.facet_codes[:, :n]
+        self.lengths, self.alive, self.facet_codes = lengths, alive, facet_codes
+
+    def add(self, doc: dict):
+        doc_id = doc["id"]
+        if doc_id in self.slot_of:
+            self.remove(doc_id)
+
+        tf: Counter = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(doc.get(field)):
+                tf[token] += weight
+
+        slot = len(self.ids)
+        self._reserve(slot + 1)
+        for term, freq in tf.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = _Postings()
+            postings.append(slot, freq)
+        length = sum(tf.values())
+        self.slot_of[doc_id] = slot
+        self.ids.append(doc_id)
+        self.lengths[slot] = length
+        self.alive[slot] = True
+        for i, facet in enumerate(FACETS):
+            self.facet_codes[i, slot] = self._facet_code(i, doc.get(facet))
+        self.total_length += length
+        self._norms = None
+
+    def remove(self, doc_id: str):
+        slot = self.slot_of.pop(doc_id, None)
+        if slot is None:
+            return
+        self.ids[slot] = None
+        self.alive[slot] = False
+        self.total_length -= float(self.lengths[slot])
+        self.dead += 1
+        self._norms = None
+        if self.dead > 1000 and self.dead > len(self.ids) // 4:
+            self._compact()
+
+    def _compact(self):
+        """Rebuild slots without tombstoned documents"""
+        live = np.flatnonzero(self.alive[:len(self.ids)])
+        remap = np.full(len(self.ids), -1, dtype=np.int64)
+        remap[live] = np.arange(len(live))
+        for term in list(self.postings):
+            slots, tfs = self.postings[term].as_arrays()
+            new_slots = remap[slots]
+            keep = new_slots >= 0
+            if not keep.any():
+                del self.postings[term]
+                continue
+            new = _Postings()
+            new.slots = new_slots[keep].tolist()
+            new.tfs = tfs[keep].tolist()
+            self.postings[term] = new
+        n = len(live)
+        self.ids = [self.ids[s] for s in live]
+        self.lengths = self.lengths[live]
+        self.alive = np.ones(n, dtype=bool)
+        self.facet_codes = self.facet_codes[:, live]
+        self.slot_of = {doc_id: slot for slot, doc_id in enumerate(self.ids)}
+        self.dead = 0
+        self._norms = None
+
+    def _doc_norms(self) -> np.ndarray:
+        """BM25 length normalisation per slot; recomputed (vectorised) after changes"""
+        if self._norms is None:
+            avgdl = self.total_length / len(self.slot_of) if self.slot_of else 1.0
+            lengths = self.lengths[:len(self.ids)]
+            self._norms = self.k1 * (1 - self.b + self.b * lengths / avgdl)
+        return self._norms
+
+    def search(
+        self,
+        query: str,
+        topic: Optional[str] = None,
+        difficulty: Optional[str] = None,
+        company: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 20,
+    ) -> Tuple[int, List[Tuple[str, float]], Dict[str, Dict[str, int]]]:
+        """Return (total matches, [(doc_id, score)] for the page, facet counts)"""
+        terms = set(tokenize(query))
+        empty = {f: {} for f in FACETS}
+        if not terms or not self.slot_of:
+            return 0, [], empty
+
+        norms = self._doc_norms()
+        alive = self.alive[:len(self.ids)]
+        n_docs = len(self.slot_of)
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            slots, tfs = postings.as_arrays()
+            df = len(slots) if not self.dead else int(alive[slots].sum())
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            scores[slots] += idf * tfs * (self.k1 + 1) / (tfs + norms[slots])
+
+        matched = (scores > 0) & alive
+        if not matched.any():
+            return 0, [], empty
+
+        facets = {}
+        selected = matched
+        for i, (facet, wanted) in enumerate(zip(FACETS, (topic, difficulty, company))):
+            codes = self.facet_codes[i, :len(self.ids)]
+            counts = np.bincount(codes[matched], minlength=len(self.facet_values[i]))
+            facets[facet] = {}
+            for code in np.argsort(-counts, kind="stable"):
+                if code and counts[code]:
+                    facets[facet][self.facet_values[i][code]] = int(counts[code])
+            if wanted is not None:
+                selected = selected & (codes == self.facet_lookup[i].get(wanted, -1))
+
+        candidates = np.flatnonzero(selected)
+        total = len(candidates)
+        k = offset + limit
+        if total > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")][offset:k]
+        return total, [(self.ids[s], float(scores[s])) for s in ranked], facets
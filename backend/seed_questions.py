@@ -1,8 +1,31 @@
+"""
+Seed or refresh the question bank from question packs.
+
+    python seed_questions.py                      # built-in sample questions
+    python seed_questions.py packs/*.ndjson       # JSON arrays or NDJSON files
+
+Questions are streamed in chunks and upserted by id. Each question stores a
+`content_hash` of its content fields: unchanged questions are skipped,
+changed ones are updated in place (keeping created_at), new ones inserted,
+all with one unordered bulk_write per chunk. Nothing is deleted, so
+reseeding is idempotent and safe on a live database. Questions without an
+id get one derived from their text.
+"""
+
+import argparse
 import asyncio
+import hashlib
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from dedup import LSHIndex, load_candidates, signature_fields
+import ids
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -334,21 +357,121 @@ sample_questions = [
     }
 ]
 
-async def seed_database():
+# Fields managed by the seeder or the server rather than the pack
+DERIVED_FIELDS = ("id", "created_at", "content_hash", "minhash", "lsh_bands")
+PACK_ID_NAMESPACE = uuid.UUID("9b7e3c52-4f0a-4d8e-9a61-2f5d0c1e7a34")
+
+
+def content_hash(question: dict) -> str:
+    content = {k: v for k, v in question.items() if k not in DERIVED_FIELDS}
+    encoded = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def load_pack(path: Path) -> Iterator[dict]:
+    """Questions from a JSON array (or {"questions": [...]}) or an NDJSON file"""
+    with open(path, encoding="utf-8") as f:
+        if path.suffix in (".ndjson", ".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        data = json.load(f)
+    yield from data["questions"] if isinstance(data, dict) else data
+
+
+def chunked(questions: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    chunk = []
+    for question in questions:
+        chunk.append(question)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def seed_chunk(db, chunk: List[dict], index: LSHIndex, counts: dict, dry_run: bool = False):
+    for question in chunk:
+        question.setdefault("id", str(uuid.uuid5(PACK_ID_NAMESPACE, question["text"])))
+    existing = {
+        ids.decode(doc["id"]): doc.get("content_hash")
+        async for doc in db.questions.find(
+            {"id": {"$in": ids.forms(q["id"] for q in chunk)}}, {"_id": 0, "id": 1, "content_hash": 1}
+        )
+    }
+
+    changed = []
+    for question in chunk:
+        digest = content_hash(question)
+        if existing.get(question["id"]) == digest:
+            counts["unchanged"] += 1
+            continue
+        changed.append((question, digest, signature_fields(question["text"])))
+    # One query for the stored candidates of the whole chunk
+    stored = await load_candidates(db.questions, [fields for _, _, fields in changed])
+
+    ops = []
+    for question, digest, fields in changed:
+        # Drop near-duplicates of other questions, in this run or already stored
+        duplicate = index.duplicates(fields) or [
+            match for match in stored.duplicates(fields) if match[0] != question["id"]
+        ]
+        duplicate_id = duplicate[0][0] if duplicate else None
+        if duplicate_id and duplicate_id != question["id"]:
+            print(f"Skipping {question['id']}: near-duplicate of {duplicate_id}")
+            counts["skipped"] += 1
+            continue
+        index.add(question["id"], fields)
+
+        doc = {k: v for k, v in question.items() if k not in DERIVED_FIELDS}
+        doc.update(fields, content_hash=digest)
+        if question["id"] in existing:
+            ops.append(UpdateOne({"id": ids.match(question["id"])}, {"$set": doc}))
+            counts["updated"] += 1
+        else:
+            created_at = question.get("created_at") or datetime.now(timezone.utc)
+            ops.append(UpdateOne(
+                {"id": ids.encode(question["id"])},
+                {"$set": doc, "$setOnInsert": {"created_at": created_at}},
+                upsert=True,
+            ))
+            counts["inserted"] += 1
+
+    if ops and not dry_run:
+        await db.questions.bulk_write(ops, ordered=False)
+
+
+async def seed_database(paths: List[Path] = (), chunk_size: int = 500, dry_run: bool = False) -> dict:
     client = AsyncIOMotorClient(mongo_url)
     db = client[db_name]
-    
-    # Clear existing questions
-    await db.questions.delete_many({})
-    
-    # Insert sample questions
-    await db.questions.insert_many(sample_questions)
-    
-    print(f"✅ Successfully seeded {len(sample_questions)} questions!")
-    print(f"Topics: Python, JavaScript, Data Structures, Algorithms, Database, Operating Systems, Networking, OOP, React, System Design")
-    print(f"Companies: Google, Microsoft, Amazon, Facebook, Apple, Netflix, Uber, Oracle, IBM, Intel, AMD, Cisco, Adobe, Salesforce, Airbnb")
-    
+    await db.questions.create_index("id")
+    await db.questions.create_index("lsh_bands")
+
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+    index = LSHIndex()
+    for path in paths or [None]:
+        questions = load_pack(path) if path else (dict(q) for q in sample_questions)
+        for chunk in chunked(questions, chunk_size):
+            await seed_chunk(db, chunk, index, counts, dry_run)
+
+    if (counts["inserted"] or counts["updated"]) and not dry_run:
+        # Tell running API workers to reload their question and catalog caches
+        for cache_name in ("questions", "catalog"):
+            await db.cache_versions.update_one({"_id": cache_name}, {"$inc": {"version": 1}}, upsert=True)
+
+    prefix = "Dry run: " if dry_run else "✅ "
+    print(
+        f"{prefix}{counts['inserted']} inserted, {counts['updated']} updated, "
+        f"{counts['unchanged']} unchanged, {counts['skipped']} skipped as near-duplicates"
+    )
     client.close()
+    return counts
 
 if __name__ == "__main__":
-    asyncio.run(seed_database())
+    parser = argparse.ArgumentParser(description="Seed or refresh the question bank")
+    parser.add_argument("packs", nargs="*", type=Path, help="JSON or NDJSON question packs (default: built-in samples)")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="report counts without writing")
+    args = parser.parse_args()
+    asyncio.run(seed_database(args.packs, args.chunk_size, args.dry_run))
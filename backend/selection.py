@@ -0,0 +1,282 @@
+"""
+Adaptive quiz selection.
+
+Each user has a progress document in `user_progress`:
+
+    {"user_id": ..., "rev": n, "reviews": {question_id: [due, streak, attempts, correct]}}
+
+`due` is a unix timestamp for spaced repetition: a wrong answer is due again
+after LEARNING_STEP seconds, a right one after 1, 2.5, 6.25... days as the
+streak grows. Questions served but never answered are held back for
+SERVED_HOLD seconds. Submitting a quiz $sets only the answered entries.
+
+In memory (an LRU of Progress objects per worker) the reviews are indexed by
+a due-date heap per topic, and attempts/correct answers are summed per topic
+and per difficulty. A quiz is then assembled without reading the attempt
+history:
+
+    1. due reviews for the requested topics, up to REVIEW_SHARE of the quiz,
+       popped from the topic heaps (O(k log n))
+    2. new questions, drawn from unseen candidates (a quiz pool batch, else
+       the bank's topic index) with weights favouring the user's weakest
+       topics and difficulties, so mastered topics come up less often
+    3. if still short, more due reviews and then the reviews due soonest,
+       so a user who has seen everything still gets a quiz
+
+A cached Progress is reused while the stored `rev` matches; another worker's
+write bumps it and forces a reload. Users without a document get one built
+once from their quiz attempts, including those moved out by archive.py.
+
+    QUIZ_SELECTION            adaptive (default) | random (uniform, pre-045)
+    ADAPTIVE_REVIEW_SHARE     share of a quiz for due reviews (default 0.5)
+    PROGRESS_CACHE_SIZE       users kept per worker (default 10000)
+"""
+
+import heapq
+import math
+import os
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from cachetools import LRUCache
+from pymongo import ReturnDocument
+
+import ids
+from quiz_pools import PoolKey, matches
+
+ADAPTIVE_SELECTION = os.environ.get("QUIZ_SELECTION", "adaptive") == "adaptive"
+REVIEW_SHARE = float(os.environ.get("ADAPTIVE_REVIEW_SHARE", 0.5))
+PROGRESS_CACHE_SIZE = int(os.environ.get("PROGRESS_CACHE_SIZE", 10_000))
+
+DAY = 86400
+LEARNING_STEP = 600
+SERVED_HOLD = DAY
+EASE = 2.5
+# New-question candidates examined per question needed
+CANDIDATE_FACTOR = 3
+MIN_WEIGHT = 0.05
+# Heap entries skipped per topic (other difficulty/company) before giving up
+SCAN_LIMIT = 200
+
+# Review entry fields
+DUE, STREAK, ATTEMPTS, CORRECT = range(4)
+
+
+def _storable(question_id: str) -> bool:
+    # Used as a field name in the progress document
+    return bool(question_id) and "." not in question_id and not question_id.startswith("$")
+
+
+class Progress:
+    __slots__ = ("user_id", "rev", "reviews", "stats", "due")
+
+    def __init__(self, user_id: str, reviews: Optional[Dict[str, list]] = None, rev: int = 0):
+        self.user_id = user_id
+        self.rev = rev
+        self.reviews: Dict[str, list] = reviews or {}
+        # ("topic" | "difficulty", name) -> [attempts, correct]
+        self.stats: Dict[Tuple[str, str], List[int]] = {}
+        # topic -> heap of (due, question_id); stale entries are skipped on pop
+        self.due: Dict[str, List[Tuple[float, str]]] = {}
+
+    def index(self, bank):
+        for q_id, entry in self.reviews.items():
+            question = bank.get(q_id)
+            if question is not None:
+                self._count(question, entry[ATTEMPTS], entry[CORRECT])
+                self._push(question, entry[DUE], q_id)
+        for heap in self.due.values():
+            heapq.heapify(heap)
+
+    def _count(self, question: dict, attempts: int, correct: int):
+        for kind in ("topic", "difficulty"):
+            totals = self.stats.setdefault((kind, question.get(kind)), [0, 0])
+            totals[0] += attempts
+            totals[1] += correct
+
+    def _push(self, question: dict, due: float, q_id: str):
+        heapq.heappush(self.due.setdefault(question.get("topic"), []), (due, q_id))
+
+    def record(self, q_id: str, is_correct: bool, now: float, question: Optional[dict]):
+        entry = self.reviews.get(q_id) or [now, 0, 0, 0]
+        entry[STREAK] = entry[STREAK] + 1 if is_correct else 0
+        entry[ATTEMPTS] += 1
+        entry[CORRECT] += int(is_correct)
+        entry[DUE] = now + (DAY * EASE ** (entry[STREAK] - 1) if is_correct else LEARNING_STEP)
+        self.reviews[q_id] = entry
+        if question is not None:
+            self._count(question, 1, int(is_correct))
+            self._push(question, entry[DUE], q_id)
+
+    def serve(self, q_id: str, now: float, question: Optional[dict]):
+        entry = self.reviews.setdefault(q_id, [now, 0, 0, 0])
+        entry[DUE] = now + SERVED_HOLD
+        if question is not None:
+            self._push(question, entry[DUE], q_id)
+
+    def weight(self, question: dict) -> float:
+        """Higher for topics/difficulties the user gets wrong; 0.5 when unknown"""
+        weakness = []
+        for kind in ("topic", "difficulty"):
+            attempts, correct = self.stats.get((kind, question.get(kind)), (0, 0))
+            weakness.append(1 - (correct + 1) / (attempts + 2))
+        return max(MIN_WEIGHT, 0.7 * weakness[0] + 0.3 * weakness[1])
+
+    def pop_reviews(self, key: PoolKey, bank, limit: int, until: Optional[float]) -> List[str]:
+        """Up to limit reviews for key due by `until` (None: any), earliest first"""
+        picked: List[Tuple[float, str]] = []
+        skipped: List[Tuple[str, Tuple[float, str]]] = []
+        for topic in key[0]:
+            heap = self.due.get(topic)
+            taken = scanned = 0
+            while heap and taken < limit and scanned < SCAN_LIMIT and (until is None or heap[0][0] <= until):
+                due, q_id = heapq.heappop(heap)
+                entry = self.reviews.get(q_id)
+                if entry is None or entry[DUE] != due:
+                    continue  # superseded by a later push
+                question = bank.get(q_id)
+                if question is None or not matches(question, key):
+                    scanned += 1
+                    skipped.append((topic, (due, q_id)))
+                    continue
+                picked.append((due, q_id))
+                taken += 1
+        picked.sort()
+        for item in picked[limit:]:
+            skipped.append((bank.get(item[1]).get("topic"), item))
+        for topic, item in skipped:
+            heapq.heappush(self.due[topic], item)
+        return [q_id for _, q_id in picked[:limit]]
+
+
+def _weighted_sample(candidates: Iterable[str], weight: Callable[[str], float], count: int) -> List[str]:
+    # Efraimidis-Spirakis: the count largest u^(1/w) keys
+    keyed = ((random.random() ** (1 / weight(q_id)), q_id) for q_id in candidates)
+    return [q_id for _, q_id in heapq.nlargest(count, keyed)]
+
+
+def bank_candidates(bank, key: PoolKey, seen, limit: int) -> List[str]:
+    """Unseen questions for key straight from the bank's topic index"""
+    pool = [q_id for topic in key[0] for q_id in bank.topic_ids(topic) if q_id not in seen]
+    random.shuffle(pool)
+    found = []
+    for q_id in pool:
+        if matches(bank.get(q_id), key):
+            found.append(q_id)
+            if len(found) >= limit:
+                break
+    return found
+
+
+def select(
+    progress: Progress,
+    bank,
+    key: PoolKey,
+    count: int,
+    now: float,
+    new_candidates: Callable[[int], Optional[List[str]]],
+) -> List[str]:
+    """Question ids for the next quiz, marked as served in progress"""
+    selected = progress.pop_reviews(key, bank, math.floor(count * REVIEW_SHARE), now)
+
+    wanted = count - len(selected)
+    candidates = new_candidates(wanted * CANDIDATE_FACTOR)
+    if candidates is None:
+        candidates = bank_candidates(bank, key, progress.reviews, wanted * CANDIDATE_FACTOR)
+    chosen = set(selected)
+    candidates = [q_id for q_id in candidates if q_id not in chosen and q_id in bank]
+    selected += _weighted_sample(candidates, lambda q_id: progress.weight(bank.get(q_id)), wanted)
+
+    if len(selected) < count:
+        selected += progress.pop_reviews(key, bank, count - len(selected), now)
+    if len(selected) < count:
+        # Everything seen: review what is due soonest rather than stopping
+        selected += progress.pop_reviews(key, bank, count - len(selected), None)
+
+    for q_id in selected:
+        progress.serve(q_id, now, bank.get(q_id))
+    return selected
+
+
+def _timestamp(value) -> Optional[float]:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        return None
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+
+class ProgressStore:
+    def __init__(
+        self,
+        collection: Callable[[], Any],
+        bank: Callable[[], Awaitable[Any]],
+        maxsize: int = PROGRESS_CACHE_SIZE,
+    ):
+        self.collection = collection
+        self.bank = bank
+        self.cache: LRUCache = LRUCache(maxsize=maxsize)
+        self.loads = 0
+        self.rebuilds = 0
+
+    async def get(self, user_id: str, history: Callable[[], Awaitable[List[dict]]]) -> Progress:
+        """The user's progress; history returns decoded attempts for a first build"""
+        cached = self.cache.get(user_id)
+        if cached is not None:
+            doc = await self.collection().find_one({"user_id": ids.match(user_id)}, {"_id": 0, "rev": 1})
+            if doc is not None and doc.get("rev", 0) == cached.rev:
+                return cached
+        doc = await self.collection().find_one({"user_id": ids.match(user_id)}, {"_id": 0})
+        bank = await self.bank()
+        if doc is None:
+            progress = await self._rebuild(user_id, await history(), bank)
+        else:
+            self.loads += 1
+            progress = Progress(user_id, doc.get("reviews", {}), doc.get("rev", 0))
+            progress.index(bank)
+        self.cache[user_id] = progress
+        return progress
+
+    async def _rebuild(self, user_id: str, attempts: List[dict], bank) -> Progress:
+        self.rebuilds += 1
+        progress = Progress(user_id)
+        for attempt in sorted(attempts, key=lambda a: a.get("completed_at") or ""):
+            if attempt.get("completed_at"):
+                at = _timestamp(attempt["completed_at"])
+                for q_id, is_correct in attempt.get("scores", {}).items():
+                    progress.record(q_id, is_correct, at, bank.get(q_id))
+            else:
+                at = _timestamp(attempt.get("started_at")) or time.time()
+                for q_id in attempt.get("questions", []):
+                    if q_id not in progress.reviews:
+                        progress.serve(q_id, at, bank.get(q_id))
+        progress.reviews = {q: e for q, e in progress.reviews.items() if _storable(q)}
+        progress.rev = 1
+        await self.collection().update_one(
+            {"user_id": ids.match(user_id)},
+            {"$setOnInsert": {"user_id": ids.encode(user_id), "reviews": progress.reviews, "rev": 1}},
+            upsert=True,
+        )
+        return progress
+
+    async def save(self, progress: Progress, question_ids: Iterable[str]):
+        """Write the given review entries; keeps the cache valid unless another worker wrote too"""
+        changes = {f"reviews.{q_id}": progress.reviews[q_id] for q_id in question_ids if _storable(q_id)}
+        if not changes:
+            return
+        doc = await self.collection().find_one_and_update(
+            {"user_id": ids.match(progress.user_id)},
+            {"$set": changes, "$inc": {"rev": 1}, "$setOnInsert": {"user_id": ids.encode(progress.user_id)}},
+            projection={"_id": 0, "rev": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc and doc.get("rev") == progress.rev + 1:
+            progress.rev = doc["rev"]
+        else:
+            self.cache.pop(progress.user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": ADAPTIVE_SELECTION, "cached_users": len(self.cache), "loads": self.loads, "rebuilds": self.rebuilds}
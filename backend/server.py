@@ -1,82 +1,220 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+import startup  # first, so the imports phase covers everything below
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-import uuid
 from datetime import datetime, timezone, timedelta
-import google.generativeai as genai
 import asyncio
-print("File loaded")
+from llm import get_provider, DEFAULT_FAST_MODEL
+from cache import CacheRegistry
+from database import create_client, reporting_database, pool_metrics
+from write_buffer import WriteBehindBuffer
+from question_bank import RECONCILE_LIMIT, QuestionBank, content_version
+from vectors import EMBED_BATCH
+from dedup import signature_fields, find_duplicate
+from attempts import decode_attempt, encode_attempt, encode_submission
+import ids
+from http_cache import CATALOG, PRIVATE, QUESTION, conditional_response, make_etag
+from compression import COMPRESSION_ENABLED, CompressionMiddleware
+from singleflight import SingleFlight
+import passwords
+import sessions
+from pymongo import ReturnDocument
+from quiz_pools import QuizPools, pool_key
+from selection import ADAPTIVE_SELECTION, ProgressStore, select
+from notifications import NotificationScheduler
+from quiz_sessions import QuizSession
+from submissions import LIVE_KEY_PREFIX, Submissions, answers_key
+import archive
+startup.profile.record("imports")
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection (pool/timeout/compression settings in database.py)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = create_client(mongo_url)
 db = client[os.environ['DB_NAME']]
+# Offline scans (quiz pool seeding); may be served by secondaries. Caches and
+# per-user reads stay on the primary, so they see the writes before them.
+reporting_db = reporting_database(client, os.environ['DB_NAME'])
 
 # Create the main app without a prefix
 app = FastAPI()
 
-@app.on_event("startup")
-async def check_mongodb():
-    print("Startup function running")
+# Warmed up before GET /api/ready answers 200 (see startup.py)
+startup.profile.expect("mongo", "llm", "caches")
+
+async def ping_mongo():
     try:
         await db.command("ping")
         print("MongoDB connection: Successful")
+        startup.profile.warmed("mongo")
     except Exception as e:
         print("MongoDB connection: Failed")
         print(e)
+        startup.profile.failed("mongo", e)
+
+@app.on_event("startup")
+async def check_mongodb():
+    print("Startup function running")
+    with startup.profile.phase("mongo_ping"):
+        await ping_mongo()
 
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Gemini API key
-GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+# LLM provider (Gemini by default, LLM_PROVIDER=fake for offline runs)
+llm = get_provider()
+startup.profile.record("env")
+
+async def warm_llm():
+    try:
+        with startup.profile.phase("llm_models"):
+            model_name = await llm.warmup()
+        print("Selected model:", model_name)
+        print(f"LLM provider '{llm.name}' configured successfully")
+        startup.profile.warmed("llm")
+    except Exception as e:
+        if "quota exceeded" in str(e).lower() or "429" in str(e):
+            print("Warning: API quota exceeded. The chatbot will work again after the quota resets.")
+            print("Consider upgrading to a paid tier for higher quotas: https://ai.google.dev/pricing")
+            startup.profile.warmed("llm")
+        else:
+            print("Gemini API configuration failed")
+            print(f"Error: {str(e)}")
+            # The worker keeps serving; /api/ready stays 503
+            startup.profile.failed("llm", e)
+
+def start_llm_warmup():
+    # In the background: importing the SDK and listing models takes seconds
+    running = getattr(app.state, "llm_warmup", None)
+    if running is None or running.done():
+        app.state.llm_warmup = asyncio.create_task(warm_llm())
 
-# Configure Gemini API
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY environment variable is not set")
+@app.on_event("startup")
+async def warmup_llm():
+    start_llm_warmup()
 
-try:
-    genai.configure(api_key=GEMINI_API_KEY)
-    # List available models first
-    models = [m.name for m in genai.list_models()]
-    print("Available models:", models)
-    
-    # Use a suitable model from the available list
-    model_name = next((m for m in models if "gemini-2.5-pro" in m), None)
-    if not model_name:
-        model_name = next((m for m in models if "gemini" in m.lower()), None)
-    if not model_name:
-        raise Exception("No Gemini model available")
-    
-    print("Selected model:", model_name)
-    model = genai.GenerativeModel(model_name)
-    
-    # Don't test the connection at startup to avoid using up quota
-    print("Gemini API configured successfully with model:", model_name)
-except Exception as e:
-    if "quota exceeded" in str(e).lower() or "429" in str(e):
-        print("Warning: API quota exceeded. The chatbot will work again after the quota resets.")
-        print("Consider upgrading to a paid tier for higher quotas: https://ai.google.dev/pricing")
-    else:
-        print("Gemini API configuration failed")
-        print(f"Error: {str(e)}")
-        raise
+# Per-worker caches, invalidated across workers through db.cache_versions
+caches = CacheRegistry(lambda: db.cache_versions)
+question_cache = caches.register(
+    "questions",
+    lambda: load_question_bank(),
+    refresh=lambda bank: catch_up_questions(bank),
+    reconcile=lambda bank: reconcile_questions(bank),
+)
+catalog_cache = caches.register("catalog", lambda: load_catalog())
+
+# Identical concurrent reads share one computation (optional micro-cache: COALESCE_CACHE_MS)
+coalesce = SingleFlight()
+
+# Ready batches of question ids for popular quiz configurations
+quiz_pools = QuizPools(lambda: question_cache.peek())
+
+# Per-user review state for adaptive selection (QUIZ_SELECTION=random to disable)
+progress_store = ProgressStore(lambda: db.user_progress, lambda: question_cache.get())
+
+# Quiz goal reminders (NOTIFICATIONS=1 to enable), delivered to db.notification_outbox
+notifier = NotificationScheduler(lambda: db)
+
+# Full user profiles, per worker for PROFILE_CACHE_TTL seconds
+profiles = sessions.ProfileCache()
+
+# Optional write-behind batching of quiz attempt inserts and completions (WRITE_BEHIND=1)
+attempt_writes = WriteBehindBuffer(lambda: db.quiz_attempts, match=ids.match, key_of=ids.decode)
+
+# Each attempt is graded once; duplicate submissions wait for it or get the stored result
+submissions = Submissions(attempt_writes)
+
+@app.on_event("startup")
+async def ensure_indexes():
+    with startup.profile.phase("indexes"):
+        await create_indexes()
+
+async def create_indexes():
+    try:
+        # Duplicate candidates on insert, cross-worker question catch-up
+        await db.questions.create_index("lsh_bands")
+        await db.questions.create_index("created_at")
+        # Id lookups (16-byte keys with ID_FORMAT=binary)
+        await db.questions.create_index("id")
+        await db.users.create_index("id")
+        await db.users.create_index("email")
+        await db.quiz_attempts.create_index("id")
+        await db.quiz_attempts.create_index([("user_id", 1), ("completed_at", 1)])
+        # Attempts moved out by archive.py
+        await db.attempt_summaries.create_index("user_id", unique=True)
+        await db.attempt_archive.create_index("attempt_ids")
+        await db.user_progress.create_index("user_id", unique=True)
+        # Reminder counters expire two days after their day; new users reach the scheduler by created_at
+        await db.quiz_daily.create_index([("user_id", 1), ("day", 1)], unique=True)
+        await db.quiz_daily.create_index("expires_at", expireAfterSeconds=0)
+        await db.users.create_index("created_at")
+        await db.notification_outbox.create_index("created_at")
+        await db.notification_outbox.create_index("expires_at", expireAfterSeconds=0)
+    except Exception as e:
+        logging.error(f"Index creation failed: {str(e)}")
+
+@app.on_event("startup")
+async def start_write_buffer():
+    attempt_writes.start()
+
+async def warm_cache_entries():
+    try:
+        await caches.warm()
+        startup.profile.warmed("caches")
+    except Exception as e:
+        logging.error(f"Cache warm-up failed: {str(e)}")
+        startup.profile.failed("caches", e)
+
+@app.on_event("startup")
+async def warm_caches():
+    with startup.profile.phase("cache_warm"):
+        await warm_cache_entries()
+    caches.start()
+
+@app.on_event("startup")
+async def start_quiz_pools():
+    if not quiz_pools.enabled:
+        return
+    with startup.profile.phase("quiz_pools"):
+        await seed_quiz_pools()
+    quiz_pools.start()
+
+async def seed_quiz_pools():
+    try:
+        # Most common selected_topics sets are the first pools to build
+        combinations = await reporting_db.users.aggregate([
+            {"$group": {"_id": "$selected_topics", "users": {"$sum": 1}}},
+            {"$sort": {"users": -1}},
+            {"$limit": quiz_pools.max_keys},
+        ]).to_list(None)
+        quiz_pools.seed([(c["_id"] or [], c["users"]) for c in combinations])
+    except Exception as e:
+        logging.error(f"Quiz pool seeding failed: {str(e)}")
+
+@app.on_event("startup")
+async def start_notifications():
+    notifier.start()
+
+@app.on_event("startup")
+async def startup_complete():
+    # Registered last: every other startup hook has run
+    startup.profile.live()
 
 # ============= MODELS =============
 
 class User(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=ids.new_id)
     username: str
     email: str
     password: str
@@ -100,7 +238,7 @@ class UserLogin(BaseModel):
     password: str
 
 class Question(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=ids.new_id)
     text: str
     question_type: str  # "mcq" or "descriptive"
     options: Optional[List[str]] = None  # for MCQ
@@ -128,7 +266,7 @@ class QuestionCreate(BaseModel):
     company: Optional[str] = None
 
 class QuizAttempt(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=ids.new_id)
     user_id: str
     questions: List[str]  # question IDs
     user_answers: Dict[str, str]  # question_id -> answer
@@ -163,23 +301,20 @@ class CompanySelection(BaseModel):
 # ============= HELPER FUNCTIONS =============
 
 async def generate_ai_answer(question_text: str, correct_answer: str, explanation: str = None) -> str:
-    """Generate AI answer using Gemini native API"""
+    """Generate AI answer using the configured LLM provider"""
     try:
         prompt = f"Question: {question_text}\n"
         if explanation:
             prompt += f"Context: {explanation}\n"
         prompt += f"Correct Answer: {correct_answer}\n\nProvide a comprehensive explanation of this answer."
 
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        response = model.generate_content(prompt, stream=True)
-        # Gemini responses may be synchronous; if used within async, wrap with a thread executor if needed.
-        return response.text if hasattr(response, "text") else correct_answer
+        return await llm.generate(prompt, model=DEFAULT_FAST_MODEL) or correct_answer
     except Exception as e:
         logging.error(f"AI answer generation error: {str(e)}")
         return correct_answer
 
 async def validate_answer_with_ai(question_text: str, correct_answer: str, user_answer: str) -> bool:
-    """Validate non-MCQ answer using Gemini API directly"""
+    """Validate non-MCQ answer using the configured LLM provider"""
     try:
         prompt = (
             f"Question: {question_text}\n"
@@ -188,17 +323,79 @@ async def validate_answer_with_ai(question_text: str, correct_answer: str, user_
             "Evaluate if the user's answer is correct. Consider semantic similarity, not just exact match.\n"
             "Respond with only 'CORRECT' or 'INCORRECT'."
         )
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        response = model.generate_content(prompt, stream=True)
-        async for chunk in response:
-            result_text = chunk.text if hasattr(chunk, "text") else ""
-            if "CORRECT" in result_text.upper():
-                return True
-            elif "INCORRECT" in result_text.upper():
-                return False
+        verdict = (await llm.generate(prompt, model=DEFAULT_FAST_MODEL)).upper()
+        # Check INCORRECT first, it contains CORRECT as a substring
+        if "INCORRECT" in verdict:
+            return False
+        if "CORRECT" in verdict:
+            return True
     except Exception as e:
         logging.error(f"AI validation error: {str(e)}")
-        return user_answer.lower().strip() == correct_answer.lower().strip()
+    return user_answer.lower().strip() == correct_answer.lower().strip()
+
+# Dedup signatures are only needed by dedup.py queries
+QUESTION_PROJECTION = {"_id": 0, "minhash": 0, "lsh_bands": 0}
+
+async def load_question_bank() -> QuestionBank:
+    """Load the whole question bank and build its search index"""
+    questions = await db.questions.find({}, QUESTION_PROJECTION).to_list(None)
+    # Embedding and indexing take seconds on a large bank; build it off the event loop
+    return await asyncio.to_thread(build_question_bank, questions)
+
+def build_question_bank(questions: List[dict]) -> QuestionBank:
+    bank = QuestionBank()
+    bank.add_many(ids.decode_doc(q) for q in questions)
+    return bank
+
+async def reconcile_questions(bank: QuestionBank) -> bool:
+    """Apply a bulk change (seeder, dedup --apply) to the bank in place; False to rebuild it"""
+    stored = await db.questions.find({}, {"_id": 0, "id": 1, "content_hash": 1}).to_list(None)
+    changed, removed = bank.changes(ids.decode_doc(q) for q in stored)
+    if len(changed) + len(removed) > RECONCILE_LIMIT:
+        return False
+    for q_id in removed:
+        bank.remove(q_id)
+    for start in range(0, len(changed), EMBED_BATCH):
+        batch = ids.forms(changed[start:start + EMBED_BATCH])
+        found = await db.questions.find({"id": {"$in": batch}}, QUESTION_PROJECTION).to_list(None)
+        bank.add_many(ids.decode_doc(q) for q in found)
+    logging.info(f"Question bank reconciled: {len(changed)} added or changed, {len(removed)} removed")
+    return True
+
+async def catch_up_questions(bank: QuestionBank):
+    """Add questions created by other workers since the last sync"""
+    synced_at = datetime.now(timezone.utc)
+    questions = await db.questions.find(bank.catch_up_query(), QUESTION_PROJECTION).to_list(None)
+    bank.add_new([ids.decode_doc(q) for q in questions], synced_at)
+
+async def load_catalog() -> Dict[str, List[str]]:
+    """Load the distinct topics and companies offered by the question bank"""
+    topics = await db.questions.distinct("topic")
+    companies = await db.questions.distinct("company")
+    catalog = {
+        "topics": sorted(t for t in topics if t),
+        "companies": sorted(c for c in companies if c),
+    }
+    catalog["etags"] = {key: make_etag(key, values) for key, values in catalog.items()}
+    return catalog
+
+async def fetch_questions(question_ids: List[str]) -> List[dict]:
+    """Return question documents for the given ids, from the cache when possible"""
+    bank = await question_cache.get()
+    missing = [q_id for q_id in question_ids if q_id not in bank]
+    if missing:
+        # Created by another worker since our last sync
+        found = await db.questions.find({"id": {"$in": ids.forms(missing)}}, QUESTION_PROJECTION).to_list(None)
+        bank.add_many(ids.decode_doc(q) for q in found)
+        missing = [q_id for q_id in question_ids if q_id not in bank]
+    if missing:
+        # Removed as near-duplicates (dedup.py --apply); kept for quiz history
+        archived = await db.question_duplicates.find(
+            {"id": {"$in": ids.forms(missing)}}, QUESTION_PROJECTION
+        ).to_list(None)
+        archived = {q["id"]: q for q in (ids.decode_doc(q, "id", "duplicate_of") for q in archived)}
+        return [bank.get(q_id) or archived[q_id] for q_id in question_ids if q_id in bank or q_id in archived]
+    return [bank.get(q_id) for q_id in question_ids if q_id in bank]
 
 def calculate_time_estimate(text: str, answer: str) -> int:
     """Calculate time estimate based on text length"""
@@ -213,6 +410,48 @@ def calculate_time_estimate(text: str, answer: str) -> int:
 async def root():
     return {"message": "Interview Prep API"}
 
+@api_router.get("/health")
+async def health():
+    """Liveness: the worker serves requests"""
+    return {"status": "ok"}
+
+@api_router.get("/ready")
+async def ready():
+    """Readiness: 503 until MongoDB, the LLM provider and the caches have warmed up"""
+    # Retried here, so a worker that started while MongoDB was down recovers on its own
+    if "mongo" in startup.profile.errors:
+        await ping_mongo()
+    if "caches" in startup.profile.errors and "mongo" not in startup.profile.pending:
+        await warm_cache_entries()
+    if "llm" in startup.profile.errors:
+        # Not awaited: a later probe sees the outcome
+        start_llm_warmup()
+    return JSONResponse(jsonable_encoder(startup.profile.stats()), status_code=200 if startup.profile.ready else 503)
+
+@api_router.get("/metrics")
+async def get_metrics():
+    return {
+        "mongo_pool": pool_metrics.snapshot(),
+        "attempt_write_buffer": attempt_writes.stats(),
+        "coalesced_reads": coalesce.stats(),
+        "profile_cache": profiles.stats(),
+        "quiz_pools": quiz_pools.stats(),
+        "adaptive_selection": progress_store.stats(),
+        "notifications": notifier.stats(),
+        "submissions": submissions.stats(),
+        "startup": startup.profile.stats(),
+    }
+
+async def load_profile(user_id: str) -> Optional[dict]:
+    profile = profiles.get(user_id)
+    if profile is None:
+        user = ids.decode_doc(await db.users.find_one({"id": ids.match(user_id)}, {"_id": 0, "password": 0}))
+        if not user:
+            return None
+        profile = User(password="", **user).dict(exclude={"password"})
+        profiles.put(user_id, profile)
+    return profile
+
 # User Routes
 @api_router.post("/users/register")
 async def register_user(user: UserCreate):
@@ -221,14 +460,19 @@ async def register_user(user: UserCreate):
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    user_obj = User(**user.dict())
-    await db.users.insert_one(user_obj.dict())
-    return {"id": user_obj.id, "username": user_obj.username, "email": user_obj.email}
+    user_obj = User(**{**user.dict(), "password": await passwords.hash_password(user.password)})
+    await db.users.insert_one(ids.encode_doc(user_obj.dict()))
+    return {
+        "id": user_obj.id,
+        "username": user_obj.username,
+        "email": user_obj.email,
+        "token": sessions.issue_token(user_obj.dict()),
+    }
 
 @api_router.post("/users/login")
 async def login_user(login: UserLogin):
     # Find user by email
-    user = await db.users.find_one({"email": login.email})
+    user = ids.decode_doc(await db.users.find_one({"email": login.email}))
     
     if not user:
         raise HTTPException(
@@ -236,48 +480,75 @@ async def login_user(login: UserLogin):
             detail="No account found with this email"
         )
     
-    # Verify password
-    if user["password"] != login.password:  # TODO: Use proper password hashing
+    # Verify password (in the hashing pool, off the event loop)
+    valid, rehashed = await passwords.verify_password(login.password, user["password"])
+    if not valid:
         raise HTTPException(
             status_code=401,
             detail="Invalid password"
         )
+    if rehashed:
+        # Plaintext or outdated cost parameters; skipped if the password changed meanwhile
+        await db.users.update_one(
+            {"id": ids.match(user["id"]), "password": user["password"]},
+            {"$set": {"password": rehashed}}
+        )
     
-    return User(**user)
+    profile = User(**user).dict(exclude={"password"})
+    profiles.put(profile["id"], profile)
+    return {**profile, "token": sessions.issue_token(profile)}
 
 @api_router.get("/users/{user_id}")
-async def get_user(user_id: str):
-    user = await db.users.find_one({"id": user_id})
-    if not user:
+async def get_user(user_id: str, request: Request):
+    sessions.principal(request, user_id)
+    profile = await load_profile(user_id)
+    if not profile:
         raise HTTPException(status_code=404, detail="User not found")
-    return User(**user)
+    return profile
 
-@api_router.put("/users/{user_id}/topics")
-async def update_topics(user_id: str, topics: Dict[str, List[str]]):
-    result = await db.users.update_one(
-        {"id": user_id},
-        {"$set": {
-            "selected_topics": topics.get("selected_topics", []),
-            "custom_topics": topics.get("custom_topics", [])
-        }}
+async def update_profile(user_id: str, changes: Dict[str, Any]) -> dict:
+    """Apply changes and return the new session token"""
+    user = await db.users.find_one_and_update(
+        {"id": ids.match(user_id)},
+        {"$set": changes},
+        projection={"_id": 0, "password": 0},
+        return_document=ReturnDocument.AFTER,
     )
-    if result.modified_count == 0:
+    if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return {"message": "Topics updated"}
+    profiles.invalidate(user_id)
+    return sessions.issue_token(ids.decode_doc(user))
+
+@api_router.put("/users/{user_id}/topics")
+async def update_topics(user_id: str, topics: Dict[str, List[str]], request: Request):
+    sessions.principal(request, user_id)
+    token = await update_profile(user_id, {
+        "selected_topics": topics.get("selected_topics", []),
+        "custom_topics": topics.get("custom_topics", [])
+    })
+    coalesce.forget("checklist", user_id)
+    return {"message": "Topics updated", "token": token}
 
 @api_router.put("/users/{user_id}/companies")
-async def update_companies(user_id: str, company_data: CompanySelection):
-    result = await db.users.update_one(
-        {"id": user_id},
-        {"$set": {"target_companies": company_data.companies}}
-    )
-    if result.modified_count == 0:
-        raise HTTPException(status_code=404, detail="User not found")
-    return {"message": "Companies updated"}
+async def update_companies(user_id: str, company_data: CompanySelection, request: Request):
+    sessions.principal(request, user_id)
+    token = await update_profile(user_id, {"target_companies": company_data.companies})
+    return {"message": "Companies updated", "token": token}
 
 # Question Routes
 @api_router.post("/questions")
 async def create_question(question: QuestionCreate):
+    # Reject near-duplicates before spending an LLM call on them
+    signature = signature_fields(question.text)
+    duplicate = await find_duplicate(db.questions, signature)
+    if duplicate:
+        existing, similarity = duplicate
+        raise HTTPException(status_code=409, detail={
+            "message": "A near-duplicate question already exists",
+            "duplicate_of": ids.decode(existing["id"]),
+            "similarity": round(similarity, 3)
+        })
+
     # Calculate time estimate
     time_est = calculate_time_estimate(question.text, question.correct_answer)
     
@@ -293,7 +564,13 @@ async def create_question(question: QuestionCreate):
     question_dict['ai_answer'] = ai_answer
     
     question_obj = Question(**question_dict)
-    await db.questions.insert_one(question_obj.dict())
+    await db.questions.insert_one({**ids.encode_doc(question_obj.dict()), **signature})
+
+    bank = question_cache.peek()
+    if bank is not None:
+        bank.add(question_obj.dict())
+    await caches.invalidate("catalog")
+    coalesce.forget("questions")
     return question_obj
 
 @api_router.get("/questions")
@@ -302,6 +579,12 @@ async def get_questions(
     difficulty: Optional[str] = None,
     company: Optional[str] = None
 ):
+    return await coalesce.do(
+        ("questions", topic or None, difficulty or None, company or None),
+        lambda: list_questions(topic, difficulty, company)
+    )
+
+async def list_questions(topic: Optional[str], difficulty: Optional[str], company: Optional[str]):
     query = {}
     if topic:
         query["topic"] = topic
@@ -310,49 +593,141 @@ async def get_questions(
     if company:
         query["company"] = company
     
-    questions = await db.questions.find(query).to_list(1000)
-    return [Question(**q) for q in questions]
+    questions = await db.questions.find(query, QUESTION_PROJECTION).to_list(1000)
+    return [Question(**ids.decode_doc(q)) for q in questions]
+
+@api_router.get("/questions/search")
+async def search_questions(
+    q: str,
+    topic: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    company: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100)
+):
+    bank = await question_cache.get()
+    total, hits, facets = bank.search.search(
+        q,
+        topic=topic,
+        difficulty=difficulty,
+        company=company,
+        offset=(page - 1) * page_size,
+        limit=page_size
+    )
+    return {
+        "query": q,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "results": [
+            {"question": Question(**bank.get(q_id)), "score": round(score, 4)}
+            for q_id, score in hits
+        ],
+        "facets": facets
+    }
+
+@api_router.get("/questions/{question_id}/similar")
+async def get_similar_questions(question_id: str, k: int = Query(5, ge=1, le=50)):
+    bank = await question_cache.get()
+    if question_id not in bank:
+        raise HTTPException(status_code=404, detail="Question not found")
+    return {
+        "question_id": question_id,
+        "similar": [
+            {"question": Question(**bank.get(q_id)), "similarity": round(score, 4)}
+            for q_id, score in bank.vectors.similar(question_id, k)
+        ]
+    }
 
 @api_router.get("/questions/{question_id}")
-async def get_question(question_id: str):
-    question = await db.questions.find_one({"id": question_id})
+async def get_question(question_id: str, request: Request):
+    questions = await fetch_questions([question_id])
+    question = questions[0] if questions else None
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
-    return Question(**question)
+    bank = await question_cache.get()
+    version = bank.version(question_id) or content_version(question)
+    return await conditional_response(
+        request, make_etag(question_id, version), QUESTION, lambda: Question(**question)
+    )
 
 # Quiz Routes
+async def user_attempts(user_id: str, projection: Optional[dict] = None, summary: Optional[dict] = None) -> List[dict]:
+    """A user's attempts (decoded), including queued writes; without those in summary if given"""
+    query = {"user_id": ids.match(user_id)}
+    if summary:
+        query["completed_at"] = archive.hot_filter(summary)
+    # Bounded by archive.py, which keeps at most ARCHIVE_HOT_LIMIT completed attempts per user
+    attempts = await db.quiz_attempts.find(query, projection).to_list(None)
+    attempts = attempt_writes.merge_pending(attempts, lambda q: ids.decode(q["user_id"]) == user_id)
+    return [decode_attempt(q) for q in attempts]
+
+async def review_history(user_id: str) -> List[dict]:
+    """A user's attempts for a first build of their progress, archived ones included"""
+    summary = await archive.load_summary(db.attempt_summaries, user_id)
+    if summary is None:
+        return await user_attempts(user_id)
+    archived = await archive.archived_attempts(db.attempt_archive, user_id, summary)
+    return [decode_attempt(a) for a in archived] + await user_attempts(user_id, summary=summary)
+
 @api_router.post("/quiz/start")
 async def start_quiz(config: QuizConfig):
+    key = pool_key(config.topics, config.difficulty, config.companies)
+    if ADAPTIVE_SELECTION:
+        # Due reviews and weak topics first, from the user's progress; no history scan
+        bank = await question_cache.get()
+        progress = await progress_store.get(config.user_id, lambda: review_history(config.user_id))
+        picked = select(
+            progress, bank, key, config.num_questions, datetime.now(timezone.utc).timestamp(),
+            lambda n: quiz_pools.take(key, n, progress.reviews),
+        )
+        if not picked:
+            raise HTTPException(status_code=404, detail="No questions available")
+        await progress_store.save(progress, picked)
+        return await create_quiz(config, [bank.get(q_id) for q_id in picked])
+
     # Get user's completed questions to avoid duplicates
-    completed_quizzes = await db.quiz_attempts.find({"user_id": config.user_id}).to_list(1000)
-    completed_question_ids = set()
+    summary = await archive.load_summary(db.attempt_summaries, config.user_id)
+    completed_quizzes = await user_attempts(
+        config.user_id, {"_id": 0, "id": 1, "user_id": 1, "v": 1, "questions": 1}, summary
+    )
+    completed_question_ids = set(summary["question_ids"]) if summary else set()
     for quiz in completed_quizzes:
         completed_question_ids.update(quiz.get("questions", []))
     
-    # Build query
-    query = {"topic": {"$in": config.topics}}
-    if config.difficulty:
-        query["difficulty"] = config.difficulty
-    if config.companies:
-        query["company"] = {"$in": config.companies}
-    
-    # Exclude completed questions
-    if completed_question_ids:
-        query["id"] = {"$nin": list(completed_question_ids)}
-    
-    # Get available questions
-    available_questions = await db.questions.find(query).to_list(1000)
-    
-    if len(available_questions) == 0:
-        raise HTTPException(status_code=404, detail="No new questions available")
-    
-    # Select random questions
-    import random
-    selected_questions = random.sample(
-        available_questions, 
-        min(config.num_questions, len(available_questions))
-    )
-    
+    # Pre-shuffled batch for popular configurations, when enough of it is unseen
+    picked = quiz_pools.take(key, config.num_questions, completed_question_ids)
+    if picked:
+        bank = question_cache.peek()
+        selected_questions = [bank.get(q_id) for q_id in picked]
+    else:
+        # Build query
+        query = {"topic": {"$in": config.topics}}
+        if config.difficulty:
+            query["difficulty"] = config.difficulty
+        if config.companies:
+            query["company"] = {"$in": config.companies}
+        
+        # Exclude completed questions
+        if completed_question_ids:
+            query["id"] = {"$nin": ids.forms(completed_question_ids)}
+        
+        # Get available questions
+        available_questions = await db.questions.find(query, QUESTION_PROJECTION).to_list(1000)
+        available_questions = [ids.decode_doc(q) for q in available_questions]
+        
+        if len(available_questions) == 0:
+            raise HTTPException(status_code=404, detail="No new questions available")
+        
+        # Select random questions
+        import random
+        selected_questions = random.sample(
+            available_questions, 
+            min(config.num_questions, len(available_questions))
+        )
+    return await create_quiz(config, selected_questions)
+
+async def create_quiz(config: QuizConfig, selected_questions: List[dict]):
     # Create quiz attempt
     quiz = QuizAttempt(
         user_id=config.user_id,
@@ -362,16 +737,10 @@ async def start_quiz(config: QuizConfig):
         total_questions=len(selected_questions)
     )
     
-    await db.quiz_attempts.insert_one(quiz.dict())
+    await attempt_writes.insert(encode_attempt(quiz.dict()))
     
     # Return questions without answers
-    questions_response = []
-    for q in selected_questions:
-        q_obj = Question(**q)
-        q_dict = q_obj.dict()
-        # Remove correct answer from response
-        q_dict.pop("correct_answer", None)
-        questions_response.append(q_dict)
+    questions_response = [public_question(q) for q in selected_questions]
     
     return {
         "quiz_id": quiz.id,
@@ -380,92 +749,218 @@ async def start_quiz(config: QuizConfig):
     }
 
 @api_router.post("/quiz/submit")
-async def submit_quiz(submission: QuizSubmission):
-    # Get quiz
-    quiz = await db.quiz_attempts.find_one({"id": submission.quiz_id})
-    if not quiz:
-        raise HTTPException(status_code=404, detail="Quiz not found")
-    
-    # Get questions
-    questions = await db.questions.find({"id": {"$in": quiz["questions"]}}).to_list(1000)
-    question_map = {q["id"]: Question(**q) for q in questions}
-    
-    # Score answers
-    scores = {}
-    correct_count = 0
-    
-    for q_id, user_answer in submission.user_answers.items():
-        question = question_map.get(q_id)
-        if not question:
-            continue
+async def submit_quiz(submission: QuizSubmission, request: Request):
+    # Retries (same Idempotency-Key, or the same answers) never grade twice
+    key = request.headers.get("idempotency-key") or answers_key(submission.user_answers)
+
+    async def grade(stored: dict, token: str):
+        quiz = decode_attempt(stored)
         
-        if question.question_type == "mcq":
-            # Exact match for MCQ
-            is_correct = user_answer.strip() == question.correct_answer.strip()
-        else:
-            # AI validation for descriptive
-            is_correct = await validate_answer_with_ai(
-                question.text,
-                question.correct_answer,
-                user_answer
-            )
+        # Get questions
+        questions = await fetch_questions(quiz["questions"])
+        question_map = {q["id"]: q for q in questions}
         
-        scores[q_id] = is_correct
-        if is_correct:
-            correct_count += 1
-    
-    # Update quiz
-    await db.quiz_attempts.update_one(
-        {"id": submission.quiz_id},
-        {"$set": {
-            "user_answers": submission.user_answers,
-            "scores": scores,
-            "correct_answers": correct_count,
-            "time_taken": submission.time_taken,
-            "completed_at": datetime.now(timezone.utc).isoformat()
-        }}
+        # Score answers
+        scores = {}
+        for q_id, user_answer in submission.user_answers.items():
+            question = question_map.get(q_id)
+            if not question:
+                continue
+            scores[q_id] = await grade_answer(question, user_answer)
+        
+        return await finish_quiz(quiz, questions, submission.user_answers, scores, submission.time_taken, token)
+
+    return await submissions.submit(submission.quiz_id, key, grade, submission_result)
+
+def submission_result(stored: dict) -> dict:
+    quiz = decode_attempt(stored)
+    return {
+        "quiz_id": quiz["id"],
+        "total_questions": quiz["total_questions"],
+        "correct_answers": quiz["correct_answers"],
+        "scores": quiz["scores"]
+    }
+
+async def grade_answer(question: dict, user_answer: str) -> bool:
+    question = Question(**question)
+    if question.question_type == "mcq":
+        # Exact match for MCQ
+        return user_answer.strip() == question.correct_answer.strip()
+    # AI validation for descriptive
+    return await validate_answer_with_ai(
+        question.text,
+        question.correct_answer,
+        user_answer
     )
+
+async def finish_quiz(
+    quiz: dict,
+    questions: List[dict],
+    user_answers: Dict[str, str],
+    scores: Dict[str, bool],
+    time_taken: int,
+    token: str,
+    key: Optional[str] = None,
+):
+    """Store a graded attempt claimed with token and update everything derived from it"""
+    # Loaded before the attempt is updated, so a first build from history does not count it twice
+    progress = None
+    if ADAPTIVE_SELECTION:
+        progress = await progress_store.get(quiz["user_id"], lambda: review_history(quiz["user_id"]))
+    
+    # Update quiz, unless the claim expired and another request graded it
+    completed = await submissions.complete(quiz["id"], token, encode_submission(
+        quiz,
+        user_answers,
+        scores,
+        time_taken,
+        datetime.now(timezone.utc)
+    ), key)
+    if not completed:
+        return None
+    if progress is not None:
+        now = datetime.now(timezone.utc).timestamp()
+        question_docs = {q["id"]: q for q in questions}
+        for q_id, is_correct in scores.items():
+            progress.record(q_id, is_correct, now, question_docs.get(q_id))
+        await progress_store.save(progress, scores)
+    await notifier.record_quiz(quiz["user_id"])
+    coalesce.forget("analytics", quiz["user_id"])
+    coalesce.forget("checklist", quiz["user_id"])
     
     return {
-        "quiz_id": submission.quiz_id,
+        "quiz_id": quiz["id"],
         "total_questions": quiz["total_questions"],
-        "correct_answers": correct_count,
+        "correct_answers": sum(1 for v in scores.values() if v),
         "scores": scores
     }
 
+def public_question(question: dict) -> dict:
+    """Question as shown while answering: without the correct answer"""
+    q_dict = Question(**question).dict()
+    q_dict.pop("correct_answer", None)
+    return jsonable_encoder(q_dict)
+
+@api_router.websocket("/quiz/{quiz_id}/live")
+async def live_quiz(websocket: WebSocket, quiz_id: str):
+    """Timed quiz session: questions pushed one by one, answers graded as they arrive (quiz_sessions.py)"""
+    await websocket.accept()
+    stored = await attempt_writes.find_one(quiz_id)
+    quiz = decode_attempt(stored)
+    if not quiz:
+        await websocket.send_json({"type": "error", "detail": "Quiz not found"})
+        await websocket.close(code=4404)
+        return
+    if quiz.get("completed_at"):
+        await websocket.send_json({"type": "error", "detail": "Quiz already submitted"})
+        await websocket.close(code=4409)
+        return
+    try:
+        sessions.principal(websocket, quiz["user_id"])
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "detail": e.detail})
+        await websocket.close(code=4403)
+        return
+    
+    questions = await fetch_questions(quiz["questions"])
+    session = QuizSession(websocket, questions, grade_answer)
+    # Claimed until the last answer can arrive and be graded, so it is graded by this session only
+    claimed = await submissions.claim(
+        quiz_id, LIVE_KEY_PREFIX + ids.new_id(), session.duration() + submissions.lease
+    )
+    if claimed is None:
+        await websocket.send_json({"type": "error", "detail": "Quiz already submitted or in progress"})
+        await websocket.close(code=4409)
+        return
+    token = claimed["grading_token"]
+
+    result = None
+    try:
+        time_taken = await session.run(public_question)
+        # Already graded answer by answer; only stored here
+        result = await finish_quiz(
+            quiz, questions, session.user_answers, session.scores, time_taken, token,
+            key=answers_key(session.user_answers),
+        )
+    except WebSocketDisconnect:
+        return
+    except Exception as e:
+        logging.error(f"Live quiz failed: {str(e)}")
+        await websocket.close(code=1011)
+        return
+    finally:
+        if result is None:
+            # Ended early: the attempt is left open to be answered again or submitted
+            await submissions.release(claimed, token)
+    if result is None:
+        await websocket.send_json({"type": "error", "detail": "Quiz already submitted"})
+        await websocket.close(code=4409)
+        return
+    await websocket.send_json({"type": "result", **result})
+    await websocket.close()
+
 @api_router.get("/quiz/{quiz_id}/results")
-async def get_quiz_results(quiz_id: str):
-    quiz = await db.quiz_attempts.find_one({"id": quiz_id})
+async def get_quiz_results(quiz_id: str, request: Request):
+    stored = await attempt_writes.find_one(quiz_id)
+    if stored is None:
+        stored = await archive.find_attempt(db.attempt_archive, quiz_id)
+    quiz = decode_attempt(stored)
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    # Get questions with answers
-    questions = await db.questions.find({"id": {"$in": quiz["questions"]}}).to_list(1000)
-    
-    results = []
-    for q in questions:
-        q_obj = Question(**q)
-        results.append({
-            "question": q_obj,
-            "user_answer": quiz["user_answers"].get(q_obj.id, ""),
-            "is_correct": quiz["scores"].get(q_obj.id, False)
-        })
-    
-    return {
-        "quiz": QuizAttempt(**quiz),
-        "results": results
+    bank = await question_cache.get()
+    # Practice suggestions for missed questions
+    similar = {
+        q_id: [] if quiz["scores"].get(q_id, False) else [s_id for s_id, _ in bank.vectors.similar(q_id, 3)]
+        for q_id in quiz["questions"]
     }
 
+    async def build():
+        # Get questions with answers
+        questions = await fetch_questions(quiz["questions"])
+        results = []
+        for q in questions:
+            q_obj = Question(**q)
+            results.append({
+                "question": q_obj,
+                "user_answer": quiz["user_answers"].get(q_obj.id, ""),
+                "is_correct": quiz["scores"].get(q_obj.id, False),
+                "similar_question_ids": similar.get(q_obj.id, [])
+            })
+        return {
+            "quiz": QuizAttempt(**quiz),
+            "results": results
+        }
+
+    if not quiz.get("completed_at"):
+        return await build()
+    # A completed attempt only changes if its questions or suggestions do
+    etag = make_etag(
+        quiz_id, quiz["completed_at"], [bank.version(q_id) for q_id in quiz["questions"]], similar
+    )
+    return await conditional_response(request, etag, PRIVATE, build)
+
 # Analytics Routes
 @api_router.get("/analytics/{user_id}")
-async def get_analytics(user_id: str):
+async def get_analytics(user_id: str, request: Request):
+    sessions.principal(request, user_id)
+    return await coalesce.do(("analytics", user_id), lambda: build_analytics(user_id))
+
+async def build_analytics(user_id: str):
+    # Attempts moved out by archive.py are counted in the summary
+    summary = await archive.load_summary(db.attempt_summaries, user_id)
+    
     # Get all completed quizzes
     quizzes = await db.quiz_attempts.find({
-        "user_id": user_id,
-        "completed_at": {"$ne": None}
-    }).to_list(1000)
+        "user_id": ids.match(user_id),
+        "completed_at": {"$ne": None, **archive.hot_filter(summary)}
+    }).to_list(None)
+    quizzes = attempt_writes.merge_pending(
+        quizzes, lambda q: ids.decode(q["user_id"]) == user_id and q.get("completed_at") is not None
+    )
+    quizzes = [decode_attempt(q) for q in quizzes]
     
-    if not quizzes:
+    if not quizzes and not summary:
         return {
             "total_quizzes": 0,
             "total_questions": 0,
@@ -476,18 +971,19 @@ async def get_analytics(user_id: str):
             "recent_activity": []
         }
     
-    total_quizzes = len(quizzes)
-    total_questions = sum(q.get("total_questions", 0) for q in quizzes)
-    correct_answers = sum(q.get("correct_answers", 0) for q in quizzes)
+    archived = summary or {}
+    total_quizzes = len(quizzes) + archived.get("quizzes", 0)
+    total_questions = sum(q.get("total_questions", 0) for q in quizzes) + archived.get("questions", 0)
+    correct_answers = sum(q.get("correct_answers", 0) for q in quizzes) + archived.get("correct", 0)
     accuracy = (correct_answers / total_questions * 100) if total_questions > 0 else 0
     
     # Topic performance
-    topic_stats = {}
-    difficulty_stats = {}
+    topic_stats = archive.stats_of(summary, "topics")
+    difficulty_stats = archive.stats_of(summary, "difficulties")
     
     for quiz in quizzes:
         question_ids = quiz.get("questions", [])
-        questions = await db.questions.find({"id": {"$in": question_ids}}).to_list(1000)
+        questions = await fetch_questions(question_ids)
         
         for q in questions:
             topic = q.get("topic", "Unknown")
@@ -530,6 +1026,8 @@ async def get_analytics(user_id: str):
         }
         for q in recent
     ]
+    if len(recent_activity) < 10:
+        recent_activity += archived.get("recent", [])[:10 - len(recent_activity)]
     
     return {
         "total_quizzes": total_quizzes,
@@ -543,26 +1041,41 @@ async def get_analytics(user_id: str):
 
 # Checklist Routes
 @api_router.get("/checklist/{user_id}")
-async def get_checklist(user_id: str):
+async def get_checklist(user_id: str, request: Request):
+    # Topics come from the session token when there is one, else the profile
+    claims = sessions.principal(request, user_id)
+    # The result depends on the token's topics, which change with every topics update
+    topics = claims and (tuple(claims["selected_topics"]), tuple(claims["custom_topics"]))
+    return await coalesce.do(("checklist", user_id, topics), lambda: build_checklist(user_id, claims))
+
+async def build_checklist(user_id: str, claims: Optional[dict] = None):
     # Get user's selected topics
-    user = await db.users.find_one({"id": user_id})
+    user = claims or await load_profile(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     all_topics = user.get("selected_topics", []) + user.get("custom_topics", [])
     
-    # Get completed quizzes
+    # Get completed quizzes; archived ones are in the summary
+    summary = await archive.load_summary(db.attempt_summaries, user_id)
     completed_quizzes = await db.quiz_attempts.find({
-        "user_id": user_id,
-        "completed_at": {"$ne": None}
-    }).to_list(1000)
+        "user_id": ids.match(user_id),
+        "completed_at": {"$ne": None, **archive.hot_filter(summary)}
+    }).to_list(None)
+    completed_quizzes = attempt_writes.merge_pending(
+        completed_quizzes, lambda q: ids.decode(q["user_id"]) == user_id and q.get("completed_at") is not None
+    )
+    completed_quizzes = [decode_attempt(q) for q in completed_quizzes]
     
-    completed_question_ids = set()
+    completed_question_ids = set(summary["question_ids"]) if summary else set()
     for quiz in completed_quizzes:
         completed_question_ids.update(quiz.get("questions", []))
     
     # Get all questions for user's topics
-    all_questions = await db.questions.find({"topic": {"$in": all_topics}}).to_list(1000)
+    all_questions = await db.questions.find(
+        {"topic": {"$in": all_topics}}, {"_id": 0, "id": 1, "topic": 1}
+    ).to_list(1000)
+    all_questions = [ids.decode_doc(q) for q in all_questions]
     
     # Organize by topic
     checklist = {}
@@ -580,7 +1093,7 @@ async def get_checklist(user_id: str):
     
     return {
         "checklist": checklist,
-        "completed_quizzes": len(completed_quizzes),
+        "completed_quizzes": len(completed_quizzes) + (summary["quizzes"] if summary else 0),
         "total_questions_answered": len(completed_question_ids)
     }
 
@@ -589,18 +1102,14 @@ from fastapi.responses import StreamingResponse
 import json
 import asyncio
 
-def generate_stream_response(prompt, model, generation_config, safety_settings):
+async def generate_stream_response(prompt, generation_config, safety_settings):
     try:
-        response = model.generate_content(
+        async for chunk in llm.stream(
             prompt,
             generation_config=generation_config,
-            safety_settings=safety_settings,
-            stream=True
-        )
-        
-        for chunk in response:
-            if hasattr(chunk, 'text'):
-                yield f"data: {json.dumps({'chunk': chunk.text})}\n\n"
+            safety_settings=safety_settings
+        ):
+            yield f"data: {json.dumps({'chunk': chunk})}\n\n"
         # CRUCIAL: End the SSE stream so the client UI knows it's done!
         yield "data: [DONE]\n\n"
     except Exception as e:
@@ -624,23 +1133,6 @@ async def ai_chat(chat_data: AIChat):
             f"User: {chat_data.message}"
         )
         
-        # Use gemini-2.5-pro model
-        model_name = "models/gemini-2.5-pro"
-        try:
-            models = [m.name for m in genai.list_models()]
-            if model_name not in models:
-                model_name = next((m for m in models if "gemini-2.5-pro" in m.lower()), None)
-                if not model_name:
-                    model_name = next((m for m in models if "gemini" in m.lower()), None)
-                if not model_name:
-                    raise Exception("No Gemini model available")
-        except Exception as e:
-            logging.error(f"Error listing models: {str(e)}")
-            # Fallback to default model name
-            pass
-            
-        model = genai.GenerativeModel(model_name)
-        
         # Add safety settings
         safety_settings = [
             {
@@ -662,7 +1154,7 @@ async def ai_chat(chat_data: AIChat):
         
         # Return streaming response
         return StreamingResponse(
-            generate_stream_response(prompt, model, generation_config, safety_settings),
+            generate_stream_response(prompt, generation_config, safety_settings),
             media_type="text/event-stream"
         )
         
@@ -713,20 +1205,26 @@ async def ai_chat(chat_data: AIChat):
 
 # Get available topics and companies
 @api_router.get("/metadata/topics")
-async def get_available_topics():
-    questions = await db.questions.find().to_list(10000)
-    topics = list(set(q.get("topic") for q in questions if q.get("topic")))
-    return {"topics": sorted(topics)}
+async def get_available_topics(request: Request):
+    catalog = await catalog_cache.get()
+    return await conditional_response(
+        request, catalog["etags"]["topics"], CATALOG, lambda: {"topics": catalog["topics"]}
+    )
 
 @api_router.get("/metadata/companies")
-async def get_available_companies():
-    questions = await db.questions.find().to_list(10000)
-    companies = list(set(q.get("company") for q in questions if q.get("company")))
-    return {"companies": sorted([c for c in companies if c])}
+async def get_available_companies(request: Request):
+    catalog = await catalog_cache.get()
+    return await conditional_response(
+        request, catalog["etags"]["companies"], CATALOG, lambda: {"companies": catalog["companies"]}
+    )
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# gzip/brotli for JSON bodies; SSE (/api/ai/chat) is passed through
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -744,4 +1242,15 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    llm_warmup = getattr(app.state, "llm_warmup", None)
+    if llm_warmup is not None:
+        llm_warmup.cancel()
+    await caches.stop()
+    await quiz_pools.stop()
+    await notifier.stop()
+    # Flush queued attempt writes before the client goes away
+    await attempt_writes.stop()
+    passwords.shutdown()
+    client.close()
+
+startup.profile.record("app")
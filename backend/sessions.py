@@ -0,0 +1,130 @@
+"""
+Signed session tokens and a short-lived profile cache.
+
+Login and registration return a token (HS256 JWT, PyJWT) carrying the user
+id and the fields most requests need: selected/custom topics and target
+companies. Clients send it as `Authorization: Bearer <token>`; verifying it
+is a signature check, not a database read. update_topics/update_companies
+return a fresh token, since the old one still carries the previous values
+until it expires.
+
+Routes still take the user id in the path, so clients without a token keep
+working. A valid token for another user is rejected (403); an expired or
+invalid one is ignored and the request falls back to the profile lookup,
+as long as tokens are optional.
+
+Full profiles (GET /users/{id}) are kept in a per-worker TTL cache
+(cachetools). Updates drop the entry in the worker that handled them; other
+workers serve the old profile for at most PROFILE_CACHE_TTL seconds.
+
+    SESSION_SECRET           signing key; set it in production. Without it
+                             a random key is made per process, so tokens do
+                             not survive restarts or cross workers; an error
+                             is logged when WEB_CONCURRENCY > 1
+    SESSION_TTL_SECONDS      token lifetime (default 7 days)
+    PROFILE_CACHE_TTL        seconds (default 30, 0 = off)
+    PROFILE_CACHE_SIZE       entries (default 10000)
+"""
+
+import logging
+import os
+import secrets
+import time
+from typing import Any, Dict, Optional
+
+import jwt
+from cachetools import TTLCache
+from fastapi import HTTPException
+from starlette.requests import HTTPConnection
+
+SESSION_SECRET = os.environ.get("SESSION_SECRET") or secrets.token_urlsafe(32)
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", 7 * 24 * 3600))
+PROFILE_CACHE_TTL = float(os.environ.get("PROFILE_CACHE_TTL", 30))
+PROFILE_CACHE_SIZE = int(os.environ.get("PROFILE_CACHE_SIZE", 10_000))
+
+ALGORITHM = "HS256"
+
+logger = logging.getLogger(__name__)
+
+if "SESSION_SECRET" not in os.environ:
+    if int(os.environ.get("WEB_CONCURRENCY", 1)) > 1:
+        # Invalid tokens are ignored, so this would fail silently as anonymous requests
+        logger.error(
+            "SESSION_SECRET is not set with several workers: tokens issued by one worker "
+            "are rejected by the others and after every restart"
+        )
+    else:
+        logger.warning("SESSION_SECRET is not set; session tokens are only valid in this process")
+
+
+def issue_token(user: dict) -> str:
+    now = int(time.time())
+    return jwt.encode(
+        {
+            "sub": user["id"],
+            "selected_topics": user.get("selected_topics", []),
+            "custom_topics": user.get("custom_topics", []),
+            "target_companies": user.get("target_companies", []),
+            "iat": now,
+            "exp": now + SESSION_TTL_SECONDS,
+        },
+        SESSION_SECRET,
+        algorithm=ALGORITHM,
+    )
+
+
+def decode_token(token: str) -> Optional[Dict[str, Any]]:
+    try:
+        return jwt.decode(token, SESSION_SECRET, algorithms=[ALGORITHM], options={"require": ["sub", "exp"]})
+    except jwt.InvalidTokenError:
+        return None
+
+
+def principal(request: HTTPConnection, user_id: str) -> Optional[Dict[str, Any]]:
+    """Claims of the request's token for user_id; None without a usable token"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" and request.scope["type"] == "websocket":
+        # Browsers cannot set headers on WebSockets
+        scheme, token = "bearer", request.query_params.get("token", "")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    claims = decode_token(token.strip())
+    if claims is None:
+        return None
+    if claims["sub"] != user_id:
+        raise HTTPException(status_code=403, detail="Session belongs to another user")
+    return claims
+
+
+class ProfileCache:
+    def __init__(self, ttl: float = PROFILE_CACHE_TTL, maxsize: int = PROFILE_CACHE_SIZE):
+        self.enabled = ttl > 0
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl) if self.enabled else None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        profile = self.entries.get(user_id)
+        if profile is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return profile
+
+    def put(self, user_id: str, profile: dict):
+        if self.enabled:
+            self.entries[user_id] = profile
+
+    def invalidate(self, user_id: str):
+        if self.enabled:
+            self.entries.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ttl": self.entries.ttl if self.enabled else 0,
+            "size": len(self.entries) if self.enabled else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
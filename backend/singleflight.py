@@ -0,0 +1,86 @@
+"""
+Request coalescing for identical concurrent reads.
+
+SingleFlight.do(key, fn) runs fn() once per key at a time: callers that
+arrive while a call for the same key is in flight await that call's result
+instead of starting their own, so a burst of identical requests costs one
+database round instead of one per request. The call runs as its own task,
+so a caller that disconnects does not cancel it for the others; an error is
+raised to every waiter.
+
+With a TTL (COALESCE_CACHE_MS, default 0 = off) the result is also kept for
+that long, which absorbs bursts that arrive just after a call completes at
+the price of serving data up to TTL old. Results are shared between
+callers and must not be mutated. forget() after a write makes the next
+read start over rather than join a call that began before the write.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+COALESCE_CACHE_MS = float(os.environ.get("COALESCE_CACHE_MS", 0))
+
+
+class SingleFlight:
+    def __init__(self, ttl_ms: float = COALESCE_CACHE_MS, max_entries: int = 10_000):
+        self.ttl = ttl_ms / 1000
+        self.max_entries = max_entries
+        self.inflight: Dict[Hashable, asyncio.Task] = {}
+        self.results: Dict[Hashable, Tuple[float, Any]] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if self.ttl:
+            cached = self.results.get(key)
+            if cached and cached[0] > time.monotonic():
+                self.cache_hits += 1
+                return cached[1]
+
+        task = self.inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self.inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self.inflight.get(key) is not task:
+            # Detached by forget(): its result may predate the write
+            return
+        del self.inflight[key]
+        if task.cancelled() or task.exception() is not None or not self.ttl:
+            return
+        now = time.monotonic()
+        if len(self.results) >= self.max_entries:
+            self.results = {k: v for k, v in self.results.items() if v[0] > now}
+            if len(self.results) >= self.max_entries:
+                self.results.clear()
+        self.results[key] = (now + self.ttl, task.result())
+
+    def forget(self, *prefix: Hashable):
+        """Drop cached results whose tuple key starts with prefix, after a write
+
+        Calls in flight for those keys are detached: their current waiters
+        still get their result, but later callers start a new call.
+        """
+        n = len(prefix)
+        for key in [k for k in self.results if k[:n] == prefix]:
+            del self.results[key]
+        for key in [k for k in self.inflight if k[:n] == prefix]:
+            del self.inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cache_ms": self.ttl * 1000,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "cache_hits": self.cache_hits,
+            "inflight": len(self.inflight),
+        }
@@ -0,0 +1,114 @@
+"""
+Startup timing and readiness of an API worker.
+
+server.py times each phase of its start:
+
+    imports       loading server.py's modules (the LLM SDK comes later, see llm.py)
+    env           .env, Mongo client and LLM provider set-up
+    app           models, routes and middleware
+    mongo_ping    first round trip to MongoDB
+    indexes       index creation
+    cache_warm    question bank and catalog caches
+    quiz_pools    pool seeding from users' topics
+    llm_models    SDK import and model resolution, in the background
+
+Times are measured from the import of server.py. A worker is live once its
+startup hooks have run, and ready once every dependency registered with
+expect() has warmed up. GET /api/health answers as soon as the worker
+serves requests; GET /api/ready answers 503 until the worker is ready, so
+load balancers and rolling deploys can wait for warm workers. The phase
+report is logged when the worker becomes live and again when it becomes
+ready. A warning is logged when the time to ready is over the budget.
+
+    STARTUP_BUDGET_SECONDS   time to ready before a warning (default 10)
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Set
+
+STARTUP_BUDGET_SECONDS = float(os.environ.get("STARTUP_BUDGET_SECONDS", 10))
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfile:
+    def __init__(self, budget: float = STARTUP_BUDGET_SECONDS):
+        self.started = time.perf_counter()
+        self.budget = budget
+        self.phases: Dict[str, float] = {}
+        self.pending: Set[str] = set()
+        self.errors: Dict[str, str] = {}
+        self.live_after: Optional[float] = None
+        self.ready_after: Optional[float] = None
+        self._mark = self.started
+
+    def _elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def record(self, name: str):
+        """Close a phase that ran since the previous record() (module-level set-up)"""
+        now = time.perf_counter()
+        self.phases[name] = now - self._mark
+        self._mark = now
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def expect(self, *dependencies: str):
+        """Dependencies that must warm up before the worker is ready"""
+        self.pending.update(dependencies)
+
+    def warmed(self, dependency: str):
+        self.pending.discard(dependency)
+        self.errors.pop(dependency, None)
+        self._check_ready()
+
+    def failed(self, dependency: str, error: Exception):
+        self.errors[dependency] = str(error)
+
+    def live(self):
+        self.live_after = self._elapsed()
+        logger.info(f"Startup: live after {self.live_after:.2f}s ({self.report()})")
+        self._check_ready()
+
+    @property
+    def ready(self) -> bool:
+        return self.live_after is not None and not self.pending
+
+    def _check_ready(self):
+        if not self.ready or self.ready_after is not None:
+            return
+        self.ready_after = self._elapsed()
+        if self.ready_after > self.budget:
+            logger.warning(
+                f"Startup: ready after {self.ready_after:.2f}s, over the {self.budget:g}s budget ({self.report()})"
+            )
+        else:
+            logger.info(f"Startup: ready after {self.ready_after:.2f}s ({self.report()})")
+
+    def report(self) -> str:
+        return ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "live": self.live_after is not None,
+            "ready": self.ready,
+            "live_after": round(self.live_after, 3) if self.live_after is not None else None,
+            "ready_after": round(self.ready_after, 3) if self.ready_after is not None else None,
+            "budget": self.budget,
+            "phases": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+            "waiting_for": sorted(self.pending),
+            "errors": self.errors,
+        }
+
+
+# Created on import: server.py imports this module first
+profile = StartupProfile()
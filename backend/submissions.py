@@ -0,0 +1,222 @@
+"""
+Idempotent quiz submission.
+
+An attempt's `status` moves started -> grading -> completed. Attempts from
+before this field existed count as started until completed_at is set. A
+submission grades an attempt only after its conditional update_one has
+moved it from started to grading. That claim holds a random token and a
+lease of GRADING_LEASE_SECONDS. The results are then written by a second
+update conditional on the token, so one grade is stored per attempt even if
+a stalled grader loses its lease to a retry. That update goes through the
+write-behind buffer, which batches it with others under WRITE_BEHIND=1.
+
+Every submission has an idempotency key: the Idempotency-Key header, else a
+digest of the answers, so clients that retry the same body need no changes.
+Duplicates are handled as follows:
+
+    grading, same key     wait for that grading; in the same worker its
+                          task is awaited directly, elsewhere the attempt
+                          is polled
+    completed, same key   the stored result, without grading again
+    different key         409 once grading has started
+    live session          409: the attempt is being answered over WebSocket
+
+A grader that fails puts the attempt back to started, so a retry can grade
+it right away. A live quiz session (quiz_sessions.py) grades as the answers
+arrive, so it claims the attempt with claim() when it starts, for as long as
+it may run, and stores the results with complete() at the end. Its claim
+key starts with LIVE_KEY_PREFIX.
+
+    GRADING_LEASE_SECONDS    seconds a grader owns an attempt (default 120)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+from write_buffer import WriteBehindBuffer
+
+GRADING_LEASE_SECONDS = float(os.environ.get("GRADING_LEASE_SECONDS", 120))
+POLL_INTERVAL = 0.25
+
+STARTED, GRADING, COMPLETED = "started", "grading", "completed"
+# Submission keys of live sessions' claims
+LIVE_KEY_PREFIX = "live:"
+
+logger = logging.getLogger(__name__)
+
+
+def answers_key(user_answers: Dict[str, str]) -> str:
+    """Default idempotency key: the same answers are the same submission"""
+    payload = json.dumps(user_answers, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def status_of(attempt: dict) -> str:
+    if attempt.get("completed_at"):
+        return COMPLETED
+    return attempt.get("status") or STARTED
+
+
+class Submissions:
+    def __init__(self, writes: WriteBehindBuffer, lease: float = GRADING_LEASE_SECONDS, poll: float = POLL_INTERVAL):
+        # Attempts are read and completions written through the buffer; claims write through
+        self.writes = writes
+        self.lease = lease
+        self.poll = poll
+        self.inflight: Dict[str, Tuple[str, asyncio.Task]] = {}
+        self.graded = 0
+        self.attached = 0
+        self.replayed = 0
+        self.conflicts = 0
+
+    def _conflict(self, detail: str = "Quiz already submitted with different answers"):
+        self.conflicts += 1
+        raise HTTPException(status_code=409, detail=detail)
+
+    async def submit(
+        self,
+        quiz_id: str,
+        key: str,
+        grade: Callable[[dict, str], Awaitable[Optional[Any]]],
+        result: Callable[[dict], Any],
+    ) -> Any:
+        """
+        Grade a submission at most once per attempt.
+
+        grade(stored, token) grades the claimed attempt and stores the results
+        with complete(); it returns None if the claim was lost. result(stored)
+        is the response for an attempt that is already completed.
+        """
+        while True:
+            running = self.inflight.get(quiz_id)
+            if running is not None:
+                if running[0] != key:
+                    self._conflict()
+                self.attached += 1
+                outcome = await asyncio.shield(running[1])
+                if outcome is not None:
+                    return outcome
+                continue
+
+            # A claim must see the attempt in MongoDB, not only in the write-behind buffer
+            await self.writes.settle(quiz_id)
+            stored = await self._claim(quiz_id, key)
+            if stored is not None:
+                outcome = await self._start(quiz_id, key, stored, grade)
+                if outcome is not None:
+                    return outcome
+                continue
+
+            stored = await self.writes.find_one(quiz_id)
+            if stored is None:
+                raise HTTPException(status_code=404, detail="Quiz not found")
+            state = status_of(stored)
+            if state == COMPLETED:
+                if stored.get("submission_key") not in (None, key):
+                    self._conflict()
+                self.replayed += 1
+                return result(stored)
+            if state == GRADING:
+                if str(stored.get("submission_key")).startswith(LIVE_KEY_PREFIX):
+                    self._conflict("Quiz is running as a live session")
+                if stored.get("submission_key") != key:
+                    self._conflict()
+                # Graded by another worker: wait for it, or for its lease to run out
+                await asyncio.sleep(self.poll)
+
+    async def claim(self, quiz_id: str, key: str, lease: float) -> Optional[dict]:
+        """Claim an attempt for a grader outside submit(); None if it is graded or being graded"""
+        await self.writes.settle(quiz_id)
+        return await self._claim(quiz_id, key, lease)
+
+    async def _claim(self, quiz_id: str, key: str, lease: Optional[float] = None) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        return await self.writes.collection().find_one_and_update(
+            {
+                self.writes.key: self.writes.match(quiz_id),
+                "completed_at": None,
+                "$or": [
+                    {"status": {"$in": [None, STARTED]}},
+                    {"status": GRADING, "grading_until": {"$lte": now}},
+                ],
+            },
+            {"$set": {
+                "status": GRADING,
+                "submission_key": key,
+                "grading_token": uuid.uuid4().hex,
+                "grading_until": now + timedelta(seconds=lease or self.lease),
+            }},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _start(self, quiz_id: str, key: str, stored: dict, grade) -> Optional[Any]:
+        # Its own task, so a caller that disconnects does not abandon the grading for its duplicates
+        task = asyncio.ensure_future(self._grade(stored, grade))
+        self.inflight[quiz_id] = (key, task)
+
+        def done(t):
+            if self.inflight.get(quiz_id, (None, None))[1] is t:
+                del self.inflight[quiz_id]
+
+        task.add_done_callback(done)
+        return await asyncio.shield(task)
+
+    async def _grade(self, stored: dict, grade) -> Optional[Any]:
+        token = stored["grading_token"]
+        try:
+            outcome = await grade(stored, token)
+        except BaseException:
+            await self.release(stored, token)
+            raise
+        if outcome is not None:
+            self.graded += 1
+        return outcome
+
+    async def release(self, stored: dict, token: str):
+        """Put a claimed attempt back to started; a no-op once the claim is lost or completed"""
+        claim = {self.writes.key: stored[self.writes.key], "status": GRADING, "grading_token": token}
+        try:
+            await self.writes.collection().update_one(
+                claim,
+                {"$set": {"status": STARTED}, "$unset": {"grading_token": "", "grading_until": ""}},
+            )
+        except Exception as e:
+            logger.error(f"Releasing grading claim failed: {str(e)}")
+
+    async def complete(
+        self, quiz_id: str, token: str, fields: Dict[str, Any], key: Optional[str] = None
+    ) -> bool:
+        """Store the results of a claimed attempt; False if the claim was lost
+
+        key replaces the submission key of the claim, so duplicates of the
+        final answers get the stored result.
+        """
+        if key is not None:
+            fields = {**fields, "submission_key": key}
+        # grading_token stays, as the record of which grader stored the results
+        return await self.writes.update(
+            quiz_id,
+            {"status": GRADING, "grading_token": token},
+            {"$set": {**fields, "status": COMPLETED}, "$unset": {"grading_until": ""}},
+            applied=lambda doc: (
+                doc.get("status") == COMPLETED and doc.get("grading_token") == token
+            ),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "grading": len(self.inflight),
+            "graded": self.graded,
+            "attached": self.attached,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+        }
@@ -0,0 +1,46 @@
+import importlib
+import os
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Modules that read these at import; nothing connects to them
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test")
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("NOTIFICATIONS", "0")
+
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["test"]
+
+
+@pytest.fixture
+def api(db, monkeypatch):
+    """A freshly imported server.py on the mock database; `async with api.serve() as client`"""
+    import startup
+
+    monkeypatch.setattr(startup, "profile", startup.StartupProfile())
+    server = importlib.reload(importlib.import_module("server"))
+    monkeypatch.setattr(server, "client", db.client)
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "reporting_db", db)
+
+    @asynccontextmanager
+    async def serve():
+        await server.app.router.startup()
+        transport = httpx.ASGITransport(app=server.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                yield client
+        finally:
+            await server.app.router.shutdown()
+
+    return SimpleNamespace(server=server, db=db, serve=serve)
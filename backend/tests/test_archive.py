@@ -0,0 +1,137 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import archive
+from attempts import encode_attempt
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def attempt(days_ago, answers, scores, completed=True):
+    when = NOW - timedelta(days=days_ago)
+    return encode_attempt({
+        "id": str(uuid.uuid4()),
+        "user_id": "u1",
+        "questions": list(answers),
+        "user_answers": answers if completed else {},
+        "scores": scores if completed else {},
+        "time_taken": 30,
+        "started_at": when,
+        "completed_at": when if completed else None,
+    }, schema=2)
+
+
+def test_old_attempts_are_folded_into_the_summary(db):
+    old = [
+        attempt(400, {"q1": "A", "q2": "B"}, {"q1": True, "q2": False}),
+        attempt(300, {"q1": "A"}, {"q1": True}),
+    ]
+    abandoned = attempt(350, {"q2": "B"}, {}, completed=False)
+    recent = attempt(1, {"q2": "B"}, {"q2": True})
+
+    async def run():
+        await db.questions.insert_many([
+            {"id": "q1", "topic": "os", "difficulty": "easy"},
+            {"id": "q2", "topic": "dbms", "difficulty": "hard"},
+        ])
+        await db.quiz_attempts.insert_many([*old, abandoned, recent])
+        stats = await archive.Archiver(db, after_days=180, after_export=False).run()
+        summary = await archive.load_summary(db.attempt_summaries, "u1")
+        hot = await db.quiz_attempts.find(
+            {"user_id": "u1", "completed_at": archive.hot_filter(summary)}, {"_id": 0}
+        ).to_list(None)
+        found = await archive.find_attempt(db.attempt_archive, old[0]["id"])
+        return stats, summary, hot, found
+
+    stats, summary, hot, found = asyncio.run(run())
+    assert (stats["users"], stats["archived"], stats["abandoned"]) == (1, 2, 1)
+    assert (summary["quizzes"], summary["questions"], summary["correct"]) == (2, 3, 2)
+    assert summary["question_ids"] == {"q1", "q2"}
+    assert archive.stats_of(summary, "topics") == {
+        "os": {"attempted": 2, "correct": 2},
+        "dbms": {"attempted": 1, "correct": 0},
+    }
+    assert summary["archived_through"] == old[1]["completed_at"]
+    assert [a["id"] for a in hot] == [recent["id"]]
+    assert found["id"] == old[0]["id"] and found["answers"] == ["A", "B"]
+
+
+def test_hot_limit_keeps_the_newest_attempts(db):
+    attempts = [attempt(days, {"q1": "A"}, {"q1": True}) for days in (5, 4, 3, 2, 1)]
+
+    async def run():
+        await db.quiz_attempts.insert_many(attempts)
+        await archive.Archiver(db, hot_limit=2, after_export=False).run()
+        summary = await archive.load_summary(db.attempt_summaries, "u1")
+        kept = db.quiz_attempts.find({}, {"_id": 0, "id": 1}).sort("completed_at", 1)
+        kept = await kept.to_list(None)
+        return summary, [a["id"] for a in kept]
+
+    summary, kept = asyncio.run(run())
+    assert summary["quizzes"] == 3
+    assert kept == [a["id"] for a in attempts[3:]]
+
+
+def test_dry_run_changes_nothing(db):
+    async def run():
+        await db.quiz_attempts.insert_one(attempt(400, {"q1": "A"}, {"q1": True}))
+        stats = await archive.Archiver(db, dry_run=True, after_export=False).run()
+        attempts_left = await db.quiz_attempts.count_documents({})
+        return stats, attempts_left, await db.attempt_summaries.count_documents({})
+
+    stats, attempts_left, summaries = asyncio.run(run())
+    assert stats["archived"] == 1
+    assert (attempts_left, summaries) == (1, 0)
+
+
+def test_completed_attempts_wait_for_the_export(db):
+    old = [attempt(days, {"q1": "A"}, {"q1": True}) for days in (400, 300)]
+    abandoned = attempt(350, {"q1": "A"}, {}, completed=False)
+
+    async def run():
+        await db.quiz_attempts.insert_many([*old, abandoned])
+        before_export = await archive.Archiver(db).run()
+        # The exporter has passed old[0] and stopped at old[1]
+        checkpoint = {"completed_at": old[1]["completed_at"], "id": old[1]["id"]}
+        await db.export_checkpoints.insert_one({"_id": archive.EXPORT_CHECKPOINT, **checkpoint})
+        after_export = await archive.Archiver(db).run()
+        hot = [a["id"] async for a in db.quiz_attempts.find({}, {"id": 1})]
+        return before_export, after_export, hot
+
+    before_export, after_export, hot = asyncio.run(run())
+    assert (before_export["archived"], before_export["abandoned"]) == (0, 1)
+    assert (after_export["archived"], after_export["abandoned"]) == (1, 0)
+    assert hot == [old[1]["id"]]
+
+
+def test_archived_attempts_are_read_back_for_the_summary(db):
+    old = [attempt(days, {"q1": "A"}, {"q1": days > 350}) for days in (400, 300)]
+
+    async def run():
+        await db.quiz_attempts.insert_many(old)
+        await archive.Archiver(db, after_export=False).run()
+        summary = await archive.load_summary(db.attempt_summaries, "u1")
+        return await archive.archived_attempts(db.attempt_archive, "u1", summary)
+
+    archived = asyncio.run(run())
+    assert [a["id"] for a in archived] == [a["id"] for a in old]
+
+
+def test_progress_rebuild_includes_archived_attempts(api):
+    old = attempt(400, {"q1": "A"}, {"q1": False})
+    recent = attempt(1, {"q2": "B"}, {"q2": True})
+
+    async def run():
+        await api.db.questions.insert_many([
+            {"id": q_id, "text": f"Question {q_id}", "topic": "os", "difficulty": "easy"}
+            for q_id in ("q1", "q2")
+        ])
+        await api.db.quiz_attempts.insert_many([old, recent])
+        await archive.Archiver(api.db, after_export=False).run()
+        server = api.server
+        return await server.progress_store.get("u1", lambda: server.review_history("u1"))
+
+    progress = asyncio.run(run())
+    assert set(progress.reviews) == {"q1", "q2"}
+    assert progress.stats[("topic", "os")] == [2, 1]
@@ -0,0 +1,84 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+import bson
+
+import attempts
+from attempts import decode_attempt, encode_attempt, encode_submission
+
+Q1, Q2 = str(uuid.uuid4()), str(uuid.uuid4())
+COMPLETED_AT = datetime(2025, 1, 1, 12, tzinfo=timezone.utc)
+
+
+def legacy_attempt(**fields):
+    attempt = {
+        "id": str(uuid.uuid4()),
+        "user_id": "u1",
+        "questions": [Q1, Q2, "q3"],
+        "user_answers": {Q1: "A", "q3": "C"},
+        "scores": {Q1: True, "q3": False},
+        "total_questions": 3,
+        "correct_answers": 1,
+        "time_taken": 42,
+        "completed_at": COMPLETED_AT.isoformat(),
+    }
+    attempt.update(fields)
+    return attempt
+
+
+def test_schema_2_round_trip_is_smaller():
+    attempt = legacy_attempt()
+    stored = encode_attempt(attempt, schema=2)
+    assert stored["v"] == 2
+    assert stored["answers"] == ["A", None, "C"]
+    assert stored["completed_at"] == COMPLETED_AT
+    assert not set(attempts.LEGACY_FIELDS) & set(stored)
+    assert decode_attempt(stored) == attempt
+    assert len(bson.encode(stored)) < len(bson.encode(attempt))
+
+
+def test_started_attempt_has_no_results():
+    attempt = legacy_attempt(user_answers={}, scores={}, correct_answers=0, completed_at=None)
+    stored = encode_attempt(attempt, schema=2)
+    assert "answers" not in stored and stored["completed_at"] is None
+    assert decode_attempt(stored) == attempt
+
+
+def test_submission_upgrades_a_legacy_attempt():
+    started = legacy_attempt(user_answers={}, scores={}, correct_answers=0, completed_at=None)
+    submitted = encode_submission(started, {Q2: "B"}, {Q2: True}, 10, COMPLETED_AT, schema=2)
+    stored = {**started, **submitted}
+    # The leftover schema 1 fields are dropped by the migration; reads ignore them
+    decoded = decode_attempt(stored)
+    assert decoded["user_answers"] == {Q2: "B"}
+    assert decoded["correct_answers"] == 1
+    assert decoded["completed_at"] == COMPLETED_AT.isoformat()
+
+
+def test_migrate_leaves_concurrently_claimed_attempts_alone(db):
+    claimed = legacy_attempt(completed_at=None, user_answers={}, scores={})
+    done = legacy_attempt()
+
+    async def run():
+        collection = db.quiz_attempts
+        await collection.insert_many([dict(claimed), dict(done)])
+        bulk_write = collection.bulk_write
+
+        async def racing(ops, **kwargs):
+            # A submission claims the attempt between the read and the write
+            await collection.update_one(
+                {"id": claimed["id"]}, {"$set": {"status": "grading", "grading_token": "t"}}
+            )
+            return await bulk_write(ops, **kwargs)
+
+        collection.bulk_write = racing
+        stats = await attempts.migrate(type("Db", (), {"quiz_attempts": collection}))
+        left = await collection.find_one({"id": claimed["id"]}, {"_id": 0})
+        return stats, left, await collection.find_one({"id": done["id"]}, {"_id": 0})
+
+    stats, left, migrated = asyncio.run(run())
+    assert stats["migrated"] == 1
+    assert "v" not in left and left["grading_token"] == "t"
+    assert migrated["v"] == 2
+    assert decode_attempt(migrated) == done
@@ -0,0 +1,76 @@
+import asyncio
+import gzip
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from compression import CompressionMiddleware, choose_encoding
+
+ITEMS = [{"id": i, "text": "a reasonably repetitive question body"} for i in range(100)]
+
+
+async def big(request):
+    return JSONResponse(ITEMS, headers={"ETag": '"v1"'})
+
+
+async def small(request):
+    return JSONResponse({"ok": True})
+
+
+async def events(request):
+    async def stream():
+        for i in range(50):
+            yield f"data: {'x' * 100} {i}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+app = CompressionMiddleware(
+    Starlette(routes=[Route("/big", big), Route("/small", small), Route("/events", events)])
+)
+
+
+def fetch(path, accept_encoding):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            request = client.build_request("GET", path, headers={"Accept-Encoding": accept_encoding})
+            response = await client.send(request, stream=True)
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+            await response.aclose()
+            return response, raw
+
+    return asyncio.run(run())
+
+
+def test_choose_encoding_honours_q_values():
+    assert choose_encoding("gzip") == "gzip"
+    assert choose_encoding("br;q=0, gzip;q=0.5") == "gzip"
+    assert choose_encoding("gzip;q=0, identity") is None
+    assert choose_encoding("identity") is None
+
+
+def test_large_json_is_gzipped_with_weak_etag():
+    response, raw = fetch("/big", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert int(response.headers["content-length"]) == len(raw)
+    assert gzip.decompress(raw).startswith(b'[{"id":0,')
+
+
+def test_small_bodies_and_identity_clients_pass_through():
+    response, raw = fetch("/small", "gzip")
+    assert "content-encoding" not in response.headers
+    assert raw == b'{"ok":true}'
+    response, raw = fetch("/big", "identity")
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"v1"'
+
+
+def test_event_streams_are_not_compressed():
+    response, raw = fetch("/events", "gzip")
+    assert "content-encoding" not in response.headers
+    assert raw.startswith(b"data: xxx")
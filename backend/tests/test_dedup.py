@@ -0,0 +1,40 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from dedup import run_cluster, signature_fields
+
+TEXT = "Explain the difference between a process and a thread in an operating system"
+
+
+def question(question_id, text, age):
+    created_at = datetime.now(timezone.utc) - timedelta(days=age)
+    return {"id": question_id, "text": text, "created_at": created_at, **signature_fields(text)}
+
+
+def test_run_cluster_keeps_the_oldest_of_a_duplicate_pair(db):
+    async def run():
+        await db.questions.insert_many([
+            question("q1", TEXT, age=2),
+            question("q2", TEXT + " with examples", age=1),
+            question("q3", "What is a binary search tree and how is it kept balanced", age=1),
+        ])
+        clusters = await run_cluster(db, apply=True)
+        remaining = sorted([doc["id"] async for doc in db.questions.find()])
+        moved = await db.question_duplicates.find_one({"id": "q2"})
+        version = await db.cache_versions.find_one({"_id": "questions"})
+        return clusters, remaining, moved, version
+
+    clusters, remaining, moved, version = asyncio.run(run())
+    assert clusters == [["q1", "q2"]]
+    assert remaining == ["q1", "q3"]
+    assert moved["duplicate_of"] == "q1"
+    assert version["version"] == 1
+
+
+def test_run_cluster_dry_run_changes_nothing(db):
+    async def run():
+        await db.questions.insert_many([question("q1", TEXT, age=2), question("q2", TEXT, age=1)])
+        clusters = await run_cluster(db, apply=False)
+        return clusters, await db.questions.count_documents({})
+
+    assert asyncio.run(run()) == ([["q1", "q2"]], 2)
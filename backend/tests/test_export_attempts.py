@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pyarrow.parquet as pq
+
+from archive import EXPORT_CHECKPOINT
+from export_attempts import export
+
+
+def attempt(attempt_id, day, answers, scores):
+    return {
+        "id": attempt_id,
+        "user_id": "u1",
+        "questions": list(answers),
+        "user_answers": answers,
+        "scores": scores,
+        "total_questions": len(answers),
+        "correct_answers": sum(scores.values()),
+        "time_taken": 60,
+        "completed_at": datetime(2025, 1, day, 12, tzinfo=timezone.utc),
+    }
+
+
+def test_export_writes_one_row_per_answer_and_resumes(db, tmp_path):
+    async def run():
+        await db.questions.insert_one(
+            {"id": "q1", "topic": "os", "difficulty": "easy", "question_type": "mcq"}
+        )
+        # Moved out by the dedup job, still needed for history
+        await db.question_duplicates.insert_one({"id": "q2", "topic": "dbms", "duplicate_of": "q1"})
+        await db.quiz_attempts.insert_many([
+            attempt("a1", 1, {"q1": "A", "q2": "B"}, {"q1": True, "q2": False}),
+            attempt("a2", 2, {"q1": "C"}, {"q1": False}),
+            {"id": "a3", "user_id": "u1", "questions": ["q1"], "completed_at": None},
+        ])
+        first = await export(db, tmp_path, batch_size=1)
+        again = await export(db, tmp_path)
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert (first, again) == (2, 0)
+    rows = pq.read_table(tmp_path).to_pylist()
+    by_answer = {(row["attempt_id"], row["question_id"]): row for row in rows}
+    assert len(rows) == 3
+    assert by_answer[("a1", "q1")]["topic"] == "os" and by_answer[("a1", "q1")]["correct"]
+    assert by_answer[("a1", "q2")]["topic"] == "dbms"
+    assert not by_answer[("a2", "q1")]["correct"]
+
+
+def test_export_saves_its_checkpoint_for_archival(db, tmp_path):
+    async def run():
+        await db.quiz_attempts.insert_many([
+            attempt("a1", 1, {"q1": "A"}, {"q1": True}),
+            attempt("a2", 2, {"q1": "C"}, {"q1": False}),
+        ])
+        await export(db, tmp_path, batch_size=1)
+        return await db.export_checkpoints.find_one({"_id": EXPORT_CHECKPOINT})
+
+    saved = asyncio.run(run())
+    assert saved["id"] == "a2"
+    assert saved["completed_at"] == datetime(2025, 1, 2, 12)
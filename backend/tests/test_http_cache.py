@@ -0,0 +1,55 @@
+import asyncio
+
+from http_cache import etag_matches, make_etag
+
+QUESTION = {
+    "id": "q1",
+    "text": "What is a closure?",
+    "question_type": "descriptive",
+    "correct_answer": "A function with its enclosing scope",
+    "topic": "Python",
+    "difficulty": "Easy",
+}
+
+
+def test_etag_matches_ignores_weak_prefix_and_lists():
+    etag = make_etag("q1", "v1")
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(make_etag("q1", "v2"), etag)
+
+
+def test_question_read_revalidates_with_if_none_match(api):
+    async def run():
+        await api.db.questions.insert_one(dict(QUESTION))
+        async with api.serve() as client:
+            first = await client.get("/api/questions/q1")
+            etag = first.headers["etag"]
+            cached = await client.get("/api/questions/q1", headers={"If-None-Match": etag})
+            await api.db.questions.update_one({"id": "q1"}, {"$set": {"text": "Define a closure"}})
+            api.server.question_cache.clear()
+            changed = await client.get("/api/questions/q1", headers={"If-None-Match": etag})
+            return first, cached, changed
+
+    first, cached, changed = asyncio.run(run())
+    assert first.status_code == 200 and first.headers["cache-control"] == "public, no-cache"
+    assert cached.status_code == 304 and cached.content == b""
+    assert cached.headers["etag"] == first.headers["etag"]
+    assert changed.status_code == 200 and changed.json()["text"] == "Define a closure"
+    assert changed.headers["etag"] != first.headers["etag"]
+
+
+def test_catalog_returns_304_for_current_etag(api):
+    async def run():
+        await api.db.questions.insert_one(dict(QUESTION))
+        async with api.serve() as client:
+            first = await client.get("/api/metadata/topics")
+            again = await client.get(
+                "/api/metadata/topics", headers={"If-None-Match": first.headers["etag"]}
+            )
+            return first, again
+
+    first, again = asyncio.run(run())
+    assert first.json() == {"topics": ["Python"]}
+    assert again.status_code == 304
@@ -0,0 +1,65 @@
+import asyncio
+import uuid
+
+import pytest
+from bson.binary import Binary
+
+import ids
+
+USER = str(uuid.uuid4())
+
+
+@pytest.fixture
+def binary_ids(monkeypatch):
+    monkeypatch.setattr(ids, "BINARY_IDS", True)
+
+
+def test_string_ids_are_stored_as_is():
+    assert ids.encode(USER) == USER
+    assert ids.forms([USER]) == [USER]
+    assert ids.match(USER) == USER
+
+
+def test_binary_ids_round_trip(binary_ids):
+    stored = ids.encode(USER)
+    assert isinstance(stored, Binary) and len(stored) == 16
+    assert ids.decode(stored) == USER
+    # Seeded ids that are not canonical UUIDs stay strings
+    assert ids.encode("q1") == "q1"
+    assert ids.encode(USER.upper()) == USER.upper()
+
+
+def test_match_covers_both_formats_until_migrated(binary_ids):
+    assert ids.match(USER) == {"$in": [USER, ids.to_binary(USER)]}
+    assert ids.match("q1") == "q1"
+    assert ids.forms([ids.to_binary(USER), "q1"]) == [USER, ids.to_binary(USER), "q1"]
+
+
+def test_migrate_converts_id_fields_and_back(db):
+    async def run():
+        await db.users.insert_one({"id": USER, "email": "a@example.com"})
+        await db.quiz_attempts.insert_one({"id": "attempt-1", "user_id": USER})
+        to_binary = await ids.migrate(db)
+        binary = await db.quiz_attempts.find_one({}, {"_id": 0})
+        to_string = await ids.migrate(db, to_binary_ids=False)
+        string = await db.quiz_attempts.find_one({}, {"_id": 0})
+        return to_binary, binary, to_string, string
+
+    to_binary, binary, to_string, string = asyncio.run(run())
+    assert to_binary["users"] == 1 and to_binary["quiz_attempts"] == 1
+    assert binary == {"id": "attempt-1", "user_id": ids.to_binary(USER)}
+    assert to_string["quiz_attempts"] == 1
+    assert string == {"id": "attempt-1", "user_id": USER}
+
+
+def test_migrate_covers_per_user_collections(db):
+    async def run():
+        for name in ("user_progress", "quiz_daily", "notification_outbox"):
+            await db[name].insert_one({"user_id": USER})
+        counts = await ids.migrate(db)
+        stored = [(await db[name].find_one())["user_id"] for name in ("user_progress", "quiz_daily")]
+        return counts, stored
+
+    counts, stored = asyncio.run(run())
+    assert counts["user_progress"] == counts["quiz_daily"] == counts["notification_outbox"] == 1
+    assert stored == [ids.to_binary(USER)] * 2
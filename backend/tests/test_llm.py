@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import types
+
+import pytest
+
+import llm
+from llm import FakeLLMProvider, GeminiProvider, LLMProvider, LLMQuotaError
+
+
+def test_providers_must_implement_generate_and_stream():
+    class Partial(LLMProvider):
+        async def generate(self, prompt, model=None, **kwargs):
+            return ""
+
+    with pytest.raises(TypeError):
+        LLMProvider()
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_fake_provider_streams_the_reply_and_raises_quota_errors():
+    async def run():
+        fake = FakeLLMProvider(chunk_words=2, reply="one two three")
+        chunks = [chunk async for chunk in fake.stream("hello")]
+        with pytest.raises(LLMQuotaError):
+            await FakeLLMProvider(error_rate=1.0).generate("hello")
+        return chunks
+
+    assert asyncio.run(run()) == ["one two ", "three"]
+
+
+def test_gemini_sdk_is_loaded_off_the_event_loop(monkeypatch):
+    loaded_in = []
+
+    class Model:
+        def __init__(self, name):
+            self.name = name
+
+        async def generate_content_async(self, prompt, **kwargs):
+            return types.SimpleNamespace(text=f"{self.name}: {prompt}")
+
+    def import_module(name):
+        loaded_in.append(threading.current_thread())
+        return types.SimpleNamespace(configure=lambda api_key: None, GenerativeModel=Model)
+
+    monkeypatch.setattr(llm.importlib, "import_module", import_module)
+
+    async def run():
+        # A request before warmup() has run
+        return await GeminiProvider("key").generate("hi")
+
+    assert asyncio.run(run()) == "models/gemini-2.5-pro: hi"
+    assert loaded_in and loaded_in[0] is not threading.main_thread()
@@ -0,0 +1,74 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import ids
+from notifications import NotificationScheduler, shard_filter
+
+NOW = datetime(2025, 1, 6, 9, 30, tzinfo=timezone.utc)
+# Shard 0: ids starting with 0
+BEHIND = "0" + str(uuid.uuid4())[1:]
+DONE = "0" + str(uuid.uuid4())[1:]
+BINARY = "0" + str(uuid.uuid4())[1:]
+OTHER_SHARD = "f" + str(uuid.uuid4())[1:]
+
+
+def user(user_id, **fields):
+    return {"id": user_id, "notification_frequency": 1440, "quiz_goal": 1, **fields}
+
+
+async def seed(db):
+    await db.users.insert_many([
+        user(BEHIND),
+        user(DONE),
+        user(ids.to_binary(BINARY)),
+        user(OTHER_SHARD),
+    ])
+    await db.quiz_daily.insert_one({"user_id": DONE, "day": "2025-01-06", "quizzes": 1})
+
+
+def scheduler(db, max_shards=1):
+    return NotificationScheduler(lambda: db, lease=60, max_shards=max_shards, enabled=True)
+
+
+def test_shard_filter_matches_string_and_binary_ids(db):
+    async def run():
+        await seed(db)
+        return sorted([ids.decode(u["id"]) async for u in db.users.find(shard_filter(0))])
+
+    assert asyncio.run(run()) == sorted([BEHIND, DONE, BINARY])
+
+
+def test_wheel_fires_users_behind_their_goal(db):
+    async def run():
+        await seed(db)
+        worker = scheduler(db)
+        await worker.run_once(NOW)
+        await worker.run_once(NOW + timedelta(minutes=1))
+        return worker, await db.notification_outbox.find({}, {"_id": 0}).to_list(None)
+
+    worker, outbox = asyncio.run(run())
+    assert worker.stats()["shards"] == [0] and worker.stats()["users"] == 3
+    # Every minute (frequency 1440) for the two users without a quiz today
+    assert sorted(n["user_id"] for n in outbox) == sorted([BEHIND, BINARY] * 2)
+    assert outbox[0]["message"] == "Quiz goal not met today: 0/1 quizzes completed"
+    assert worker.stats()["checked"] == 6
+
+
+def test_expired_lease_is_taken_over(db):
+    async def run():
+        await seed(db)
+        first, second = scheduler(db), scheduler(db, max_shards=16)
+        await first.run_once(NOW)
+        await second.run_once(NOW + timedelta(seconds=30))
+        owned_while_leased = second.stats()["shards"]
+        # first stops renewing; its lease runs out after 60s
+        await second.run_once(NOW + timedelta(seconds=90))
+        await first.run_once(NOW + timedelta(seconds=100))
+        return owned_while_leased, first.stats()["shards"], second.stats()["shards"]
+
+    owned_while_leased, first, second = asyncio.run(run())
+    assert owned_while_leased == [1]
+    assert second == [0, 1]
+    # first drops the shard it lost and claims a free one
+    assert first == [2]
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+import passwords
+
+
+@pytest.fixture(autouse=True)
+def cheap_scrypt(monkeypatch):
+    monkeypatch.setattr(passwords, "SCRYPT_LOG_N", 10)
+
+
+def test_hash_verifies_and_rejects_wrong_password():
+    async def run():
+        stored = await passwords.hash_password("hunter2")
+        good = await passwords.verify_password("hunter2", stored)
+        bad = await passwords.verify_password("hunter3", stored)
+        return stored, good, bad
+
+    stored, good, bad = asyncio.run(run())
+    assert stored.startswith("scrypt$10$8$1$") and "hunter2" not in stored
+    assert good == (True, None)
+    assert bad == (False, None)
+
+
+def test_outdated_and_plaintext_passwords_are_rehashed():
+    async def run():
+        old = passwords._hash("hunter2", 9, 8, 1)
+        outdated = await passwords.verify_password("hunter2", old)
+        plaintext = await passwords.verify_password("hunter2", "hunter2")
+        wrong = await passwords.verify_password("nope", "hunter2")
+        return outdated, plaintext, wrong
+
+    outdated, plaintext, wrong = asyncio.run(run())
+    assert outdated[0] and outdated[1].startswith("scrypt$10$")
+    assert plaintext[0] and passwords.is_hashed(plaintext[1])
+    assert wrong == (False, None)
+
+
+def test_login_replaces_a_legacy_password(api):
+    async def run():
+        await api.db.users.insert_one(
+            {"id": "u1", "username": "a", "email": "a@example.com", "password": "hunter2"}
+        )
+        async with api.serve() as client:
+            bad = await client.post(
+                "/api/users/login", json={"email": "a@example.com", "password": "nope"}
+            )
+            good = await client.post(
+                "/api/users/login", json={"email": "a@example.com", "password": "hunter2"}
+            )
+        return bad, good, await api.db.users.find_one({"id": "u1"})
+
+    bad, good, user = asyncio.run(run())
+    assert bad.status_code == 401
+    assert good.status_code == 200 and "password" not in good.json()
+    assert user["password"].startswith("scrypt$10$")
+    assert asyncio.run(passwords.verify_password("hunter2", user["password"])) == (True, None)
@@ -0,0 +1,52 @@
+import asyncio
+
+from quiz_pools import QuizPools, pool_key
+
+
+class Bank(dict):
+    """The parts of QuestionBank the pools use: membership, values() and revision"""
+
+    revision = 0
+
+
+BANK = Bank({
+    f"q{i}": {"id": f"q{i}", "topic": "Python" if i < 20 else "React"} for i in range(30)
+})
+KEY = pool_key(["Python"])
+
+
+def filled_pools(**options):
+    pools = QuizPools(lambda: BANK, depth=4, batch_size=5, **options)
+    pools.seed([(["Python"], 3)])
+    asyncio.run(pools.refill())
+    return pools
+
+
+def test_take_returns_unseen_ids_of_the_combination():
+    pools = filled_pools(enabled=True)
+    seen = {f"q{i}" for i in range(10)}
+    picked = pools.take(KEY, 4, seen)
+    assert len(picked) == 4 and len(set(picked)) == 4
+    assert all(BANK[q_id]["topic"] == "Python" and q_id not in seen for q_id in picked)
+    assert pools.stats()["hits"] == 1
+
+
+def test_fallback_leaves_the_pool_untouched():
+    pools = filled_pools(enabled=True)
+    before = [list(batch) for batch in pools.pools[KEY].batches]
+    seen = {f"q{i}" for i in range(20)}
+    assert pools.take(KEY, 3, seen) is None
+    assert [list(batch) for batch in pools.pools[KEY].batches] == before
+    assert pools.stats()["fallbacks"] == 1
+
+
+def test_unused_end_of_a_batch_stays_in_the_pool():
+    pools = filled_pools(enabled=True)
+    first = list(pools.pools[KEY].batches[0])
+    assert pools.take(KEY, 2, set()) == first[:2]
+    assert list(pools.pools[KEY].batches[0]) == first[2:]
+
+
+def test_missing_pool_or_disabled_pools_fall_back():
+    assert filled_pools(enabled=True).take(pool_key(["Go"]), 1, set()) is None
+    assert filled_pools(enabled=False).take(KEY, 1, set()) is None
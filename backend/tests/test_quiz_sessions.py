@@ -0,0 +1,70 @@
+import time
+from functools import partial
+
+from starlette.testclient import TestClient
+
+from quiz_sessions import QuizSession
+
+QUESTIONS = [
+    {
+        "id": f"q{i}",
+        "text": f"Python question {i}",
+        "question_type": "mcq",
+        "options": ["right", "wrong"],
+        "correct_answer": "right",
+        "topic": "Python",
+        "difficulty": "Easy",
+        "time_estimate": 1,
+    }
+    for i in range(3)
+]
+
+
+def test_live_session_grades_answers_and_times_out(api, monkeypatch):
+    # No grace period, so the unanswered question times out after its 1s estimate
+    monkeypatch.setattr(api.server, "QuizSession", partial(QuizSession, grace=0))
+    with TestClient(api.server.app) as client:
+        client.portal.call(api.db.questions.insert_many, [dict(q) for q in QUESTIONS])
+        api.server.question_cache.clear()
+        account = {"username": "a", "email": "a@example.com", "password": "pw"}
+        user = client.post("/api/users/register", json=account).json()
+        config = {"user_id": user["id"], "topics": ["Python"], "num_questions": 3}
+        quiz = client.post("/api/quiz/start", json=config).json()
+        quiz_id, order = quiz["quiz_id"], [q["id"] for q in quiz["questions"]]
+
+        messages, submit = [], None
+        with client.websocket_connect(f"/api/quiz/{quiz_id}/live?token={user['token']}") as ws:
+            while True:
+                message = ws.receive_json()
+                messages.append(message)
+                if message["type"] == "result":
+                    break
+                if message["type"] != "question":
+                    continue
+                q_id = message["question"]["id"]
+                assert "correct_answer" not in message["question"]
+                if message["index"] == 0:
+                    ws.send_text("not json")
+                    ws.send_json({"type": "answer", "question_id": q_id, "answer": "right"})
+                elif message["index"] == 1:
+                    # Claimed by the session: a plain submit is turned away meanwhile
+                    answers = {"quiz_id": quiz_id, "user_answers": {q_id: "right"}, "time_taken": 5}
+                    submit = client.post("/api/quiz/submit", json=answers)
+                    started = time.monotonic()
+                else:
+                    waited = time.monotonic() - started
+                    ws.send_json({"type": "answer", "question_id": q_id, "answer": "wrong"})
+        stored = client.get(f"/api/quiz/{quiz_id}/results").json()["quiz"]
+
+    kinds = [m["type"] for m in messages]
+    assert kinds.count("question") == 3
+    assert {"type": "error", "detail": "Messages must be JSON"} in messages
+    assert {"type": "timeout", "question_id": order[1]} in messages
+    assert waited > 0.5
+    graded = {m["question_id"]: m["correct"] for m in messages if m["type"] == "graded"}
+    assert graded == {order[0]: True, order[2]: False}
+    assert submit.status_code == 409
+    assert submit.json()["detail"] == "Quiz is running as a live session"
+    assert messages[-1]["correct_answers"] == 1
+    assert stored["correct_answers"] == 1 and stored["completed_at"]
+    assert stored["user_answers"] == {order[0]: "right", order[2]: "wrong"}
@@ -0,0 +1,62 @@
+from search import BM25Index, tokenize
+
+
+def question(doc_id, text, topic="Python", difficulty="Easy", **fields):
+    return {"id": doc_id, "text": text, "topic": topic, "difficulty": difficulty, **fields}
+
+
+def index_of(*docs):
+    index = BM25Index()
+    for doc in docs:
+        index.add(doc)
+    return index
+
+
+def test_tokenize_drops_stopwords_and_keeps_symbols():
+    assert tokenize("What is the GIL in C++ and C#?") == ["gil", "c++", "c#"]
+
+
+def test_text_matches_rank_above_explanation_matches():
+    index = index_of(
+        question("q1", "How do Python generators work", explanation="They are lazy iterators"),
+        question("q2", "Explain list comprehensions", explanation="Unlike generators they are eager"),
+        question("q3", "What is a mutex", topic="OS"),
+    )
+    total, page, _ = index.search("generators")
+    assert total == 2
+    assert [doc_id for doc_id, _ in page] == ["q1", "q2"]
+
+
+def test_facets_count_all_matches_and_filters_apply_to_the_page():
+    index = index_of(
+        question("q1", "sorting algorithms", topic="DSA", difficulty="Easy"),
+        question("q2", "sorting in databases", topic="DBMS", difficulty="Hard"),
+        question("q3", "stable sorting", topic="DSA", difficulty="Hard"),
+    )
+    total, page, facets = index.search("sorting", topic="DSA", limit=1)
+    assert total == 2 and len(page) == 1
+    assert facets["topic"] == {"DSA": 2, "DBMS": 1}
+    assert facets["difficulty"] == {"Hard": 2, "Easy": 1}
+
+
+def test_removed_and_replaced_documents_drop_out():
+    index = index_of(question("q1", "binary trees"), question("q2", "binary search"))
+    index.remove("q1")
+    index.add(question("q2", "hash maps"))
+    assert index.search("binary") == (0, [], {"topic": {}, "difficulty": {}, "company": {}})
+    assert [doc_id for doc_id, _ in index.search("hash")[1]] == ["q2"]
+
+
+def test_tombstones_are_compacted_without_changing_results():
+    docs = [question(f"q{i}", f"topic{i % 7} shared words", topic=f"T{i % 3}") for i in range(3000)]
+    index = index_of(*docs)
+    before = index.search("topic3", limit=5000)
+    for doc in docs[1500:]:
+        index.remove(doc["id"])
+    # Compaction ran: slots are dense again
+    assert index.dead < 1000 and len(index.ids) < 3000
+    total, page, facets = index.search("topic3", limit=5000)
+    expected = [doc_id for doc_id, _ in before[1] if int(doc_id[1:]) < 1500]
+    assert total == len(expected)
+    assert sorted(doc_id for doc_id, _ in page) == sorted(expected)
+    assert sum(facets["topic"].values()) == total
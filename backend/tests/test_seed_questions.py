@@ -0,0 +1,46 @@
+import asyncio
+
+from dedup import LSHIndex
+from seed_questions import seed_chunk
+
+PACK = [
+    {"id": "p1", "text": "Explain the difference between a process and a thread", "topic": "OS"},
+    {"id": "p2", "text": "What is the time complexity of binary search on a sorted array", "topic": "DSA"},
+]
+
+
+def counts():
+    return {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+
+
+def seed(db, questions):
+    async def run():
+        seeded = counts()
+        await seed_chunk(db, [dict(q) for q in questions], LSHIndex(), seeded)
+        return seeded
+
+    return asyncio.run(run())
+
+
+def test_reseeding_the_same_pack_changes_nothing(db):
+    assert seed(db, PACK) == {**counts(), "inserted": 2}
+    first = asyncio.run(db.questions.find_one({"id": "p1"}))
+    assert seed(db, PACK) == {**counts(), "unchanged": 2}
+    again = asyncio.run(db.questions.find_one({"id": "p1"}))
+    assert again == first
+
+
+def test_changed_questions_are_updated_in_place(db):
+    seed(db, PACK)
+    created_at = asyncio.run(db.questions.find_one({"id": "p2"}))["created_at"]
+    edited = [PACK[0], {**PACK[1], "explanation": "Halving the range each step: O(log n)"}]
+    assert seed(db, edited) == {**counts(), "updated": 1, "unchanged": 1}
+    stored = asyncio.run(db.questions.find_one({"id": "p2"}))
+    assert stored["explanation"].startswith("Halving") and stored["created_at"] == created_at
+
+
+def test_near_duplicates_of_stored_questions_are_skipped(db):
+    seed(db, PACK)
+    duplicate = {"id": "p3", "text": PACK[0]["text"] + " briefly", "topic": "OS"}
+    assert seed(db, [duplicate]) == {**counts(), "skipped": 1}
+    assert asyncio.run(db.questions.count_documents({})) == 2
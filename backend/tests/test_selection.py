@@ -0,0 +1,41 @@
+from question_bank import QuestionBank
+from quiz_pools import pool_key
+from selection import DUE, SERVED_HOLD, Progress, select
+
+NOW = 1_700_000_000.0
+KEY = pool_key(["Python"])
+
+
+def bank():
+    questions = QuestionBank()
+    questions.add_many(
+        {"id": f"q{i}", "text": f"Python question number {i}", "topic": "Python", "difficulty": "Easy"}
+        for i in range(20)
+    )
+    return questions
+
+
+def test_due_reviews_come_first_and_are_marked_served():
+    questions = bank()
+    progress = Progress("u1")
+    progress.record("q3", False, NOW - 3600, questions.get("q3"))  # due again after 10 minutes
+    progress.record("q7", True, NOW - 3600, questions.get("q7"))  # due in about a day
+
+    selected = select(progress, questions, KEY, 4, NOW, lambda n: None)
+
+    assert selected[0] == "q3"
+    assert "q7" not in selected
+    assert len(set(selected)) == 4
+    assert progress.reviews["q3"][DUE] == NOW + SERVED_HOLD
+
+
+def test_reviews_fill_the_quiz_once_everything_is_seen():
+    questions = bank()
+    progress = Progress("u1")
+    for i in range(20):
+        progress.record(f"q{i}", True, NOW - i, questions.get(f"q{i}"))
+
+    selected = select(progress, questions, KEY, 3, NOW, lambda n: [])
+
+    # Nothing is due yet: the reviews due soonest are served
+    assert selected == ["q19", "q18", "q17"]
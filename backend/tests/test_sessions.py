@@ -0,0 +1,48 @@
+import asyncio
+import importlib
+import logging
+import time
+
+import jwt
+
+import sessions
+
+USER = {"id": "u1", "selected_topics": ["Python"], "custom_topics": [], "target_companies": []}
+
+
+def test_token_round_trip_and_invalid_tokens_are_rejected():
+    claims = sessions.decode_token(sessions.issue_token(USER))
+    assert claims["sub"] == "u1" and claims["selected_topics"] == ["Python"]
+
+    secret = sessions.SESSION_SECRET
+    forged = jwt.encode({"sub": "u1", "exp": time.time() + 60}, "other-secret", algorithm="HS256")
+    expired = jwt.encode({"sub": "u1", "exp": time.time() - 60}, secret, algorithm="HS256")
+    assert sessions.decode_token(forged) is None
+    assert sessions.decode_token(expired) is None
+    assert sessions.decode_token("not-a-token") is None
+
+
+def test_routes_reject_other_users_tokens_and_ignore_invalid_ones(api):
+    async def run():
+        await api.db.users.insert_one({**USER, "username": "a", "email": "a@example.com"})
+        other = {"Authorization": "Bearer " + sessions.issue_token({**USER, "id": "u2"})}
+        async with api.serve() as client:
+            foreign = await client.get("/api/users/u1", headers=other)
+            invalid = await client.get("/api/users/u1", headers={"Authorization": "Bearer garbage"})
+            return foreign, invalid
+
+    foreign, invalid = asyncio.run(run())
+    assert foreign.status_code == 403
+    assert invalid.status_code == 200 and invalid.json()["id"] == "u1"
+
+
+def test_missing_secret_is_an_error_with_several_workers(monkeypatch, caplog):
+    monkeypatch.delenv("SESSION_SECRET", raising=False)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    try:
+        with caplog.at_level(logging.WARNING, logger="sessions"):
+            importlib.reload(sessions)
+        assert [r.levelno for r in caplog.records if r.name == "sessions"] == [logging.ERROR]
+    finally:
+        monkeypatch.undo()
+        importlib.reload(sessions)
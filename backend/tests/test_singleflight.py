@@ -0,0 +1,47 @@
+import asyncio
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_identical_reads_share_one_call():
+    calls = []
+
+    async def read(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def run():
+        flight = SingleFlight()
+        same = await asyncio.gather(*(flight.do(("k", 1), lambda: read("a")) for _ in range(5)))
+        other = await flight.do(("k", 2), lambda: read("b"))
+        return flight, same, other
+
+    flight, same, other = asyncio.run(run())
+    assert same == ["a"] * 5 and other == "b"
+    assert calls == ["a", "b"]
+    assert flight.stats()["coalesced"] == 4
+
+
+def test_forget_detaches_a_read_started_before_the_write():
+    stored = {"value": "old"}
+    started = []
+
+    async def read():
+        value = stored["value"]
+        started.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def run():
+        flight = SingleFlight(ttl_ms=60_000)
+        before = asyncio.ensure_future(flight.do(("checklist", "u1"), read))
+        while not started:
+            await asyncio.sleep(0)
+        stored["value"] = "new"
+        flight.forget("checklist", "u1")
+        after = await flight.do(("checklist", "u1"), read)
+        cached = await flight.do(("checklist", "u1"), read)
+        return await before, after, cached
+
+    assert asyncio.run(run()) == ("old", "new", "new")
@@ -0,0 +1,50 @@
+import asyncio
+
+import startup
+
+
+def test_profile_is_ready_once_live_and_warmed():
+    profile = startup.StartupProfile(budget=10)
+    profile.expect("mongo", "llm")
+    profile.warmed("mongo")
+    profile.live()
+    assert not profile.ready and profile.stats()["waiting_for"] == ["llm"]
+    profile.failed("llm", RuntimeError("no network"))
+    assert profile.stats()["errors"] == {"llm": "no network"}
+    profile.warmed("llm")
+    assert profile.ready and profile.stats()["errors"] == {}
+
+
+def test_ready_retries_failed_dependencies(api, monkeypatch):
+    failures = {"mongo": 1, "llm": 1}
+
+    def flaky(name, result):
+        async def call(*args, **kwargs):
+            if failures[name]:
+                failures[name] -= 1
+                raise RuntimeError(f"{name} unavailable")
+            return result
+
+        return call
+
+    monkeypatch.setattr(api.db, "command", flaky("mongo", {"ok": 1}))
+    monkeypatch.setattr(api.server.llm, "warmup", flaky("llm", "models/fake"))
+
+    async def run():
+        async with api.serve() as client:
+            await api.server.app.state.llm_warmup
+            failed = set(startup.profile.errors)
+            health = await client.get("/api/health")
+            # Retries the ping now and restarts the LLM warm-up in the background
+            first = await client.get("/api/ready")
+            await api.server.app.state.llm_warmup
+            second = await client.get("/api/ready")
+            return failed, health, first, second
+
+    failed, health, first, second = asyncio.run(run())
+    assert failed == {"mongo", "llm"}
+    assert health.status_code == 200
+    assert first.status_code == 503
+    assert set(first.json()["errors"]) == {"llm"}
+    assert first.json()["waiting_for"] == ["llm"]
+    assert second.status_code == 200 and second.json()["ready"]
@@ -0,0 +1,128 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from submissions import COMPLETED, STARTED, Submissions, answers_key, status_of
+from write_buffer import WriteBehindBuffer
+
+
+@pytest.fixture
+def submissions(db):
+    return Submissions(WriteBehindBuffer(lambda: db.quiz_attempts, enabled=False), poll=0.01)
+
+
+def grader(submissions, calls, delay=0.0):
+    async def grade(stored, token):
+        calls.append(token)
+        await asyncio.sleep(delay)
+        if not await submissions.complete(stored["id"], token, {"correct_answers": 1}):
+            return None
+        return {"graded_by": token}
+
+    return grade
+
+
+def result(stored):
+    return {"stored": stored["correct_answers"]}
+
+
+def test_duplicates_attach_to_one_grading(db, submissions):
+    calls = []
+
+    async def run():
+        await db.quiz_attempts.insert_one({"id": "a1"})
+        grade = grader(submissions, calls, delay=0.05)
+        first, second = await asyncio.gather(
+            submissions.submit("a1", "k", grade, result),
+            submissions.submit("a1", "k", grade, result),
+        )
+        replay = await submissions.submit("a1", "k", grade, result)
+        return first, second, replay, await db.quiz_attempts.find_one({"id": "a1"})
+
+    first, second, replay, stored = asyncio.run(run())
+    assert len(calls) == 1
+    assert first == second == {"graded_by": calls[0]}
+    assert replay == {"stored": 1}
+    assert status_of(stored) == COMPLETED and "grading_until" not in stored
+    assert stored["grading_token"] == calls[0]
+    assert submissions.stats()["attached"] == 1 and submissions.stats()["replayed"] == 1
+
+
+def test_different_answers_conflict(db, submissions):
+    calls = []
+
+    async def run():
+        await db.quiz_attempts.insert_one({"id": "a1"})
+        await submissions.submit("a1", answers_key({"q1": "A"}), grader(submissions, calls), result)
+        await submissions.submit("a1", answers_key({"q1": "B"}), grader(submissions, calls), result)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(run())
+    assert error.value.status_code == 409
+    assert len(calls) == 1
+
+
+def test_failed_grading_releases_the_claim(db, submissions):
+    async def failing(stored, token):
+        raise RuntimeError("LLM unavailable")
+
+    async def run():
+        await db.quiz_attempts.insert_one({"id": "a1"})
+        with pytest.raises(RuntimeError):
+            await submissions.submit("a1", "k", failing, result)
+        released = await db.quiz_attempts.find_one({"id": "a1"})
+        outcome = await submissions.submit("a1", "k", grader(submissions, []), result)
+        return released, outcome
+
+    released, outcome = asyncio.run(run())
+    assert released["status"] == STARTED and "grading_token" not in released
+    assert "graded_by" in outcome
+
+
+def test_expired_lease_is_taken_over_and_the_stale_grader_loses(db, submissions):
+    async def run():
+        await db.quiz_attempts.insert_one({"id": "a1"})
+        stale = await submissions.claim("a1", "k", lease=60)
+        blocked = await submissions.claim("a1", "other", lease=60)
+        expired = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await db.quiz_attempts.update_one({"id": "a1"}, {"$set": {"grading_until": expired}})
+        outcome = await submissions.submit("a1", "k", grader(submissions, []), result)
+        late = await submissions.complete("a1", stale["grading_token"], {"correct_answers": 0})
+        return blocked, outcome, late, await db.quiz_attempts.find_one({"id": "a1"})
+
+    blocked, outcome, late, stored = asyncio.run(run())
+    assert blocked is None
+    assert "graded_by" in outcome
+    assert late is False
+    assert stored["correct_answers"] == 1
+
+
+def test_complete_can_replace_the_submission_key(db, submissions):
+    async def run():
+        await db.quiz_attempts.insert_one({"id": "a1"})
+        claimed = await submissions.claim("a1", "live:session", lease=60)
+        token = claimed["grading_token"]
+        await submissions.complete("a1", token, {"correct_answers": 1}, key="answers")
+        return await submissions.submit("a1", "answers", grader(submissions, []), result)
+
+    assert asyncio.run(run()) == {"stored": 1}
+
+
+def test_write_behind_batches_completions(db):
+    async def run():
+        writes = WriteBehindBuffer(lambda: db.quiz_attempts, enabled=True, interval_ms=10)
+        batched = Submissions(writes, poll=0.01)
+        writes.start()
+        await writes.insert({"id": "a1"})
+        await writes.insert({"id": "a2"})
+        outcomes = await asyncio.gather(*(
+            batched.submit(quiz_id, "k", grader(batched, []), result) for quiz_id in ("a1", "a2")
+        ))
+        await writes.stop()
+        return outcomes, await db.quiz_attempts.count_documents({"status": COMPLETED})
+
+    outcomes, completed = asyncio.run(run())
+    assert all("graded_by" in outcome for outcome in outcomes)
+    assert completed == 2
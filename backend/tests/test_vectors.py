@@ -0,0 +1,68 @@
+import numpy as np
+
+from vectors import HASH_BUCKETS, VectorIndex, _features
+
+
+def question(doc_id, text, topic="Python"):
+    return {"id": doc_id, "text": text, "topic": topic}
+
+
+BANK = [
+    question("gen1", "How do Python generators yield values lazily"),
+    question("gen2", "Explain generators and the yield keyword in Python"),
+    question("gen3", "Python generators yield values instead of building a list"),
+    question("sql1", "What is a SQL join", topic="DBMS"),
+    question("sql2", "Explain inner and outer joins in SQL", topic="DBMS"),
+    question("os1", "What is a mutex", topic="OS"),
+]
+
+
+def test_similar_returns_the_top_k_nearest_first():
+    index = VectorIndex()
+    index.add_many(BANK)
+    similar = index.similar("gen1", k=2)
+    assert sorted(doc_id for doc_id, _ in similar) == ["gen2", "gen3"]
+    assert similar[0][1] >= similar[1][1] > 0
+    assert index.similar("sql1", k=1)[0][0] == "sql2"
+
+
+def test_removed_questions_leave_the_top_k_and_the_idf():
+    index = VectorIndex()
+    index.add_many(BANK)
+    df, n_docs = index.df.copy(), index.n_docs
+    index.add(question("gen4", "Python generators and yield"))
+    index.remove("gen4")
+    assert index.n_docs == n_docs
+    assert np.array_equal(index.df, df)
+
+    # The two nearest neighbours go; the cut still finds k live ones
+    index.remove("gen2")
+    index.remove("gen3")
+    index.add_many([
+        question("gen5", "Lazy Python generators yield values"),
+        question("gen6", "Python generators yield values one at a time"),
+    ])
+    assert sorted(doc_id for doc_id, _ in index.similar("gen1", k=2)) == ["gen5", "gen6"]
+
+
+def test_replacing_a_question_recounts_its_buckets():
+    index = VectorIndex()
+    index.add_many(BANK)
+    index.add(question("os1", "What is a semaphore", topic="OS"))
+    assert index.n_docs == len(BANK)
+    fresh = VectorIndex()
+    fresh.add_many(BANK[:-1] + [question("os1", "What is a semaphore", topic="OS")])
+    assert np.array_equal(index.df, fresh.df)
+
+
+def test_sparse_embedding_matches_the_dense_product():
+    index = VectorIndex()
+    index.add_many(BANK)
+    batch = [_features(doc) for doc in BANK]
+    tf = np.zeros((len(batch), HASH_BUCKETS), dtype=np.float32)
+    for row, (keys, weights) in enumerate(batch):
+        np.add.at(tf[row], keys, weights)
+    idf = np.log((1 + index.n_docs) / (1 + index.df)) + 1
+    dense = (np.log1p(tf) * idf) @ index.projection[:HASH_BUCKETS]
+    dense /= np.linalg.norm(dense, axis=1, keepdims=True)
+    assert np.allclose(index._embed_batch(batch), dense, atol=1e-5)
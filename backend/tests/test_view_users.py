@@ -0,0 +1,32 @@
+import io
+import json
+
+import mongomock
+
+from view_users import Writer, export_parallel, export_range
+
+
+def users_db(count):
+    db = mongomock.MongoClient()["test"]
+    db.users.insert_many([
+        {"id": f"u{i:03d}", "email": f"u{i}@example.com", "password": "secret"}
+        for i in range(count)
+    ])
+    return db
+
+
+def test_export_range_projects_fields_and_skips_password():
+    out = io.StringIO()
+    fields = ["id", "email"]
+    count = export_range(users_db(5), {}, fields, Writer(out, "ndjson", fields), batch_size=2)
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert count == 5
+    assert rows[0] == {"id": "u000", "email": "u0@example.com"}
+    assert all("password" not in row for row in rows)
+
+
+def test_export_parallel_keeps_id_order():
+    out = io.StringIO()
+    count = export_parallel(users_db(20), {}, ["id"], out, "csv", batch_size=3, parts=4)
+    assert count == 20
+    assert out.getvalue().split() == [f"u{i:03d}" for i in range(20)]
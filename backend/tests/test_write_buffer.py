@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from write_buffer import WriteBehindBuffer
+
+
+def buffer(db, **kwargs):
+    return WriteBehindBuffer(lambda: db.quiz_attempts, enabled=True, **kwargs)
+
+
+def test_inserts_are_queued_until_flushed(db):
+    async def run():
+        writes = buffer(db)
+        await writes.insert({"id": "a1", "user_id": "u1"})
+        queued = await db.quiz_attempts.count_documents({})
+        seen = await writes.find_one("a1")
+        merged = writes.merge_pending([], lambda doc: doc["user_id"] == "u1")
+        await writes.flush()
+        return queued, seen, merged, await db.quiz_attempts.find_one({}, {"_id": 0}), writes.stats()
+
+    queued, seen, merged, stored, stats = asyncio.run(run())
+    assert queued == 0
+    assert seen == {"id": "a1", "user_id": "u1"}
+    assert merged == [seen]
+    assert stored == seen
+    assert stats == {"enabled": True, "pending": 0, "batches": 1, "operations": 1}
+
+
+def test_full_batch_flushes_and_settle_writes_one_attempt(db):
+    async def run():
+        writes = buffer(db, max_batch=2)
+        await writes.insert({"id": "a1"})
+        await writes.insert({"id": "a2"})
+        after_batch = await db.quiz_attempts.count_documents({})
+        await writes.insert({"id": "a3"})
+        await writes.settle("a2")  # already written: nothing to do
+        unsettled = await db.quiz_attempts.count_documents({})
+        await writes.settle("a3")
+        return after_batch, unsettled, await db.quiz_attempts.count_documents({})
+
+    assert asyncio.run(run()) == (2, 2, 3)
+
+
+def test_failed_flush_is_requeued_and_retried(db):
+    async def run():
+        writes = buffer(db)
+        collection = db.quiz_attempts
+        writes.collection = lambda: collection
+        bulk_write = collection.bulk_write
+        failures = [RuntimeError("primary stepped down")]
+
+        async def flaky(ops, **kwargs):
+            if failures:
+                raise failures.pop()
+            return await bulk_write(ops, **kwargs)
+
+        collection.bulk_write = flaky
+        await writes.insert({"id": "a1"})
+        with pytest.raises(RuntimeError):
+            await writes.flush()
+        pending = len(writes.pending)
+        await writes.stop()
+        return pending, await collection.count_documents({})
+
+    assert asyncio.run(run()) == (1, 1)
+
+
+def test_disabled_buffer_writes_through(db):
+    async def run():
+        writes = WriteBehindBuffer(lambda: db.quiz_attempts, enabled=False)
+        await writes.insert({"id": "a1"})
+        return await db.quiz_attempts.count_documents({})
+
+    assert asyncio.run(run()) == 1
+
+
+def test_conditional_updates_are_batched_and_read_back(db):
+    async def run():
+        # The second update fills the batch
+        writes = buffer(db, max_batch=2, interval_ms=60_000)
+        collection = db.quiz_attempts
+        writes.collection = lambda: collection
+        writes.start()
+        await collection.insert_many([{"id": "a1", "token": "t1"}, {"id": "a2", "token": "other"}])
+        bulk_write, batches = collection.bulk_write, []
+
+        async def counting(ops, **kwargs):
+            batches.append(len(ops))
+            return await bulk_write(ops, **kwargs)
+
+        collection.bulk_write = counting
+
+        def complete(doc_id, token):
+            return writes.update(
+                doc_id,
+                {"token": token},
+                {"$set": {"done": token}},
+                applied=lambda doc: doc.get("done") == token,
+            )
+
+        outcomes = await asyncio.gather(complete("a1", "t1"), complete("a2", "t2"))
+        await writes.stop()
+        return outcomes, batches, await collection.find_one({"id": "a2"}, {"_id": 0})
+
+    outcomes, batches, unchanged = asyncio.run(run())
+    assert outcomes == [True, False]
+    assert batches == [2]
+    assert unchanged == {"id": "a2", "token": "other"}
@@ -0,0 +1,178 @@
+"""
+Local vector index for "similar questions" lookups.
+
+Each question is embedded once: unigrams and bigrams of its text, answer and
+topic are feature-hashed into a TF-IDF vector, which a fixed Gaussian random
+projection reduces to SIMILAR_DIM dense dimensions (cosine similarity is
+approximately preserved). A document only uses a few dozen of the hash
+buckets, so its embedding is computed from just those rows of the
+projection (a sparse gather) rather than a product over every bucket. Embeddings are
+L2-normalised rows of a NumPy matrix, so a k-nearest-neighbour lookup is a
+single BLAS matrix-vector product followed by argpartition. New questions
+are appended in place; removed ones leave a dead slot and their document
+frequencies are taken back out of the IDF.
+"""
+
+import math
+import os
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from search import tokenize
+
+SIMILAR_DIM = int(os.environ.get("SIMILAR_DIM", 128))
+HASH_BUCKETS = 1 << 14
+PROJECTION_SEED = 20240601
+EMBED_BATCH = 256
+
+FIELD_WEIGHTS = {"text": 2.0, "explanation": 0.5, "ai_answer": 1.0}
+TOPIC_WEIGHT = 2.0
+
+_token_hashes: Dict[str, int] = {}
+
+
+def _hash(token: str) -> int:
+    value = _token_hashes.get(token)
+    if value is None:
+        if len(_token_hashes) > 500_000:
+            _token_hashes.clear()
+        value = _token_hashes[token] = zlib.crc32(token.encode())
+    return value
+
+
+def _features(doc: dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashed unigram/bigram/topic features as (bucket, weight) arrays, with repeats"""
+    keys: List[int] = []
+    weights: List[float] = []
+    for field, weight in FIELD_WEIGHTS.items():
+        hashes = [_hash(t) for t in tokenize(doc.get(field))]
+        keys.extend(hashes)
+        keys.extend((a * 1000003) ^ b for a, b in zip(hashes, hashes[1:]))
+        weights.extend([weight] * max(0, 2 * len(hashes) - 1))
+    if doc.get("topic"):
+        keys.append(_hash(f"topic:{doc['topic'].lower()}"))
+        weights.append(TOPIC_WEIGHT)
+    return (
+        np.array(keys, dtype=np.int64) & (HASH_BUCKETS - 1),
+        np.array(weights, dtype=np.float32),
+    )
+
+
+class VectorIndex:
+    def __init__(self, dim: int = SIMILAR_DIM):
+        self.dim = dim
+        rng = np.random.default_rng(PROJECTION_SEED)
+        projection = rng.standard_normal((HASH_BUCKETS, dim), dtype=np.float32) / math.sqrt(dim)
+        # Plus one zero row, the padding of _embed_batch
+        self.projection = np.vstack([projection, np.zeros((1, dim), dtype=np.float32)])
+        self.df = np.zeros(HASH_BUCKETS, dtype=np.int32)
+        self.n_docs = 0
+        self.matrix = np.zeros((1024, dim), dtype=np.float32)
+        self.alive = np.zeros(1024, dtype=bool)
+        self.ids: List[Optional[str]] = []
+        # Distinct buckets of each stored document, to take them out of df again
+        self.buckets: Dict[str, np.ndarray] = {}
+        self.slot_of = {}
+        # Neighbour lists are stable until the bank changes
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def _count(self, doc_id: str, keys: np.ndarray):
+        self._uncount(doc_id)
+        buckets = self.buckets[doc_id] = np.unique(keys).astype(np.uint16)
+        self.df[buckets] += 1
+        self.n_docs += 1
+
+    def _uncount(self, doc_id: str):
+        buckets = self.buckets.pop(doc_id, None)
+        if buckets is not None:
+            self.df[buckets] -= 1
+            self.n_docs -= 1
+
+    def _embed_batch(self, batch: List[Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+        """TF-IDF rows for a chunk of documents, projected from the buckets each one uses"""
+        counts = [len(keys) for keys, _ in batch]
+        if not sum(counts):
+            return np.zeros((len(batch), self.dim), dtype=np.float32)
+        rows = np.repeat(np.arange(len(batch)), counts)
+        # One entry per (document, bucket), with the repeats' weights summed
+        cells, inverse = np.unique(
+            rows * HASH_BUCKETS + np.concatenate([k for k, _ in batch]), return_inverse=True
+        )
+        tf = np.bincount(inverse, weights=np.concatenate([w for _, w in batch])).astype(np.float32)
+        rows, buckets = np.divmod(cells, HASH_BUCKETS)
+        idf = (np.log((1 + self.n_docs) / (1 + self.df[buckets])) + 1).astype(np.float32)
+        # Each document's buckets side by side, padded with the all-zero projection row
+        per_doc = np.bincount(rows, minlength=len(batch))
+        position = np.arange(len(cells)) - (np.cumsum(per_doc) - per_doc)[rows]
+        index = np.full((len(batch), per_doc.max()), HASH_BUCKETS)
+        index[rows, position] = buckets
+        weights = np.zeros(index.shape, dtype=np.float32)
+        weights[rows, position] = np.log1p(tf) * idf
+        vectors = np.matmul(weights[:, None, :], self.projection[index])[:, 0]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+    def _store(self, doc_id: str, vector: np.ndarray):
+        slot = self.slot_of.get(doc_id)
+        if slot is None:
+            slot = len(self.ids)
+            if slot == len(self.matrix):
+                grown = np.zeros((len(self.matrix) * 2, self.dim), dtype=np.float32)
+                grown[:slot] = self.matrix
+                self.matrix = grown
+                self.alive = np.concatenate([self.alive, np.zeros(slot, dtype=bool)])
+            self.ids.append(doc_id)
+            self.slot_of[doc_id] = slot
+        self.matrix[slot] = vector
+        self.alive[slot] = True
+        self._memo.clear()
+
+    def add(self, doc: dict):
+        self.add_many([doc])
+
+    def add_many(self, docs: Iterable[dict]):
+        """Add or replace a batch; document frequencies are counted before embedding"""
+        batch = [(doc["id"], _features(doc)) for doc in docs]
+        for doc_id, (keys, _) in batch:
+            self._count(doc_id, keys)
+        for i in range(0, len(batch), EMBED_BATCH):
+            chunk = batch[i:i + EMBED_BATCH]
+            vectors = self._embed_batch([features for _, features in chunk])
+            for (doc_id, _), vector in zip(chunk, vectors):
+                self._store(doc_id, vector)
+
+    def remove(self, doc_id: str):
+        slot = self.slot_of.pop(doc_id, None)
+        if slot is not None:
+            self._uncount(doc_id)
+            self.ids[slot] = None
+            self.matrix[slot] = 0
+            self.alive[slot] = False
+            self._memo.clear()
+
+    def similar(self, doc_id: str, k: int = 5) -> List[Tuple[str, float]]:
+        """k nearest neighbours of a stored question by cosine similarity"""
+        slot = self.slot_of.get(doc_id)
+        if slot is None:
+            return []
+        memo = self._memo.get(doc_id)
+        if memo is not None and memo[0] >= k:
+            return memo[1][:k]
+        n = len(self.ids)
+        scores = self.matrix[:n] @ self.matrix[slot]
+        # Removed slots are left out before the cut, so they cannot take places in the top k
+        scores[~self.alive[:n]] = -np.inf
+        scores[slot] = -np.inf
+        k = min(k, len(self.slot_of) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        result = [(self.ids[s], float(scores[s])) for s in top if self.ids[s] is not None and scores[s] > 0]
+        self._memo[doc_id] = (k, result)
+        return result
@@ -1,9 +1,35 @@
-from pymongo import MongoClient
+"""
+Export users as NDJSON or CSV.
+
+    python view_users.py                                  # NDJSON to stdout
+    python view_users.py --format csv -o users.csv --since 2024-01-01
+    python view_users.py --fields id,email,created_at --parallel 4 -o users.ndjson
+
+Users are streamed from a server-side cursor (--batch-size documents per
+round trip) with only the requested fields projected, so memory use does not
+grow with the collection. Passwords are never exported unless listed in
+--fields. With --parallel N the _id range is split into N parts along the
+_id index; each part is exported by its own thread into a temporary file and
+the parts are concatenated in _id order.
+"""
+
+import argparse
+import csv
+import json
 import os
-from dotenv import load_dotenv
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
-import json
-from datetime import datetime
+from typing import IO, List, Optional
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+import ids
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
@@ -13,36 +39,156 @@ load_dotenv(ROOT_DIR / '.env')
 mongo_url = os.environ['MONGO_URL']
 db_name = os.environ['DB_NAME']
 
-def view_users():
+DEFAULT_FIELDS = [
+    "id", "username", "email", "selected_topics", "custom_topics", "target_companies",
+    "notification_frequency", "quiz_goal", "created_at",
+]
+
+
+def parse_date(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def to_plain(value):
+    """Convert MongoDB specific types to serializable format"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return ids.decode(value)
+
+
+class Writer:
+    def __init__(self, out: IO[str], fmt: str, fields: List[str]):
+        self.fmt = fmt
+        self.fields = fields
+        self.out = out
+        self.csv = csv.writer(out) if fmt == "csv" else None
+
+    def header(self):
+        if self.csv:
+            self.csv.writerow(self.fields)
+
+    def write(self, doc: dict):
+        if self.csv:
+            row = []
+            for field in self.fields:
+                value = to_plain(doc.get(field))
+                if isinstance(value, (list, dict)):
+                    value = json.dumps(value, default=str)
+                row.append("" if value is None else value)
+            self.csv.writerow(row)
+        else:
+            self.out.write(json.dumps({f: to_plain(doc.get(f)) for f in self.fields if f in doc}, default=str))
+            self.out.write("\n")
+
+
+def export_range(db, query: dict, fields: List[str], writer: Writer, batch_size: int) -> int:
+    projection = {f: 1 for f in fields}
+    if "_id" not in fields:
+        projection["_id"] = 0
+    count = 0
+    for doc in db.users.find(query, projection, batch_size=batch_size).sort("_id", 1):
+        writer.write(doc)
+        count += 1
+    return count
+
+
+def split_points(db, query: dict, parts: int) -> List[ObjectId]:
+    """_id boundaries that split the matching users into roughly equal ranges"""
+    total = db.users.count_documents(query)
+    points = []
+    for i in range(1, parts):
+        doc = next(
+            db.users.find(query, {"_id": 1}).sort("_id", 1).skip(total * i // parts).limit(1), None
+        )
+        if doc and (not points or doc["_id"] > points[-1]):
+            points.append(doc["_id"])
+    return points
+
+
+def export_parallel(db, query: dict, fields: List[str], out: IO[str], fmt: str, batch_size: int, parts: int) -> int:
+    points = split_points(db, query, parts)
+    bounds = list(zip([None] + points, points + [None]))
+
+    def run(bound, path):
+        low, high = bound
+        part_query = dict(query)
+        id_range = {}
+        if low is not None:
+            id_range["$gte"] = low
+        if high is not None:
+            id_range["$lt"] = high
+        if id_range:
+            part_query["_id"] = id_range
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            return export_range(db, part_query, fields, Writer(f, fmt, fields), batch_size)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [Path(tmp) / f"part{i}" for i in range(len(bounds))]
+        with ThreadPoolExecutor(max_workers=len(bounds)) as pool:
+            counts = list(pool.map(run, bounds, paths))
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                shutil.copyfileobj(f, out)
+    return sum(counts)
+
+
+def view_users(
+    output: Optional[str] = None,
+    fmt: str = "ndjson",
+    fields: Optional[List[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = 1000,
+    parallel: int = 1,
+) -> int:
     # Connect to MongoDB
     client = MongoClient(mongo_url)
     db = client[db_name]
-    
-    print("\n=== Users in Database ===\n")
-    
-    # Get all users
-    users = list(db.users.find({}))
-    
-    if not users:
-        print("No users found in database.")
-        return
-        
-    for user in users:
-        # Convert MongoDB specific types to serializable format
-        user_dict = {}
-        for key, value in user.items():
-            if key == '_id':
-                user_dict[key] = str(value)
-            elif isinstance(value, datetime):
-                user_dict[key] = value.isoformat()
-            else:
-                user_dict[key] = value
-        
-        user_str = json.dumps(user_dict, indent=2)
-        print(user_str)
-        print("-" * 50)
-    
-    client.close()
+    fields = fields or DEFAULT_FIELDS
+
+    query = {}
+    if since or until:
+        query["created_at"] = {}
+        if since:
+            query["created_at"]["$gte"] = since
+        if until:
+            query["created_at"]["$lt"] = until
+
+    out = open(output, "w", newline="", encoding="utf-8") if output else sys.stdout
+    try:
+        Writer(out, fmt, fields).header()
+        if parallel > 1:
+            count = export_parallel(db, query, fields, out, fmt, batch_size, parallel)
+        else:
+            count = export_range(db, query, fields, Writer(out, fmt, fields), batch_size)
+    finally:
+        if output:
+            out.close()
+        client.close()
+
+    print(f"Exported {count} user(s)", file=sys.stderr)
+    return count
+
 
 if __name__ == "__main__":
-    view_users()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Export users as NDJSON or CSV")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--fields", help=f"comma-separated fields (default: {','.join(DEFAULT_FIELDS)})")
+    parser.add_argument("--since", type=parse_date, help="only users created at or after this ISO date")
+    parser.add_argument("--until", type=parse_date, help="only users created before this ISO date")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--parallel", type=int, default=1, help="export N _id ranges concurrently")
+    args = parser.parse_args()
+    view_users(
+        output=args.output,
+        fmt=args.format,
+        fields=args.fields.split(",") if args.fields else None,
+        since=args.since,
+        until=args.until,
+        batch_size=args.batch_size,
+        parallel=args.parallel,
+    )
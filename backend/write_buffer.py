@@ -0,0 +1,222 @@
+"""
+Write-behind buffer for quiz attempt documents.
+
+With WRITE_BEHIND=1, attempt inserts (start_quiz) and submission updates are
+queued in memory and written with one unordered bulk_write per batch. A
+batch is flushed when WRITE_BEHIND_MAX_BATCH writes are pending or every
+WRITE_BEHIND_INTERVAL_MS. Inserts are written as upserts, so a retried
+batch is idempotent.
+
+Reads go through find_one() / merge_pending(), which overlay queued inserts
+on what MongoDB returns, so a worker always sees its own writes. Another
+worker may see a new attempt up to one flush interval late.
+
+Submission updates are conditional (submissions.py only stores a grade
+while its claim holds), so update() is not fire-and-forget: the caller
+waits for its batch, and the outcome of every update in the batch is read
+back with one query through the caller's applied(doc) check. A burst of
+submissions then costs two round trips per batch instead of one each.
+
+The buffer is flushed on shutdown; with WRITE_BEHIND unset every write goes
+straight to MongoDB.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from pymongo import UpdateOne
+
+WRITE_BEHIND_ENABLED = os.environ.get("WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_MAX_BATCH = int(os.environ.get("WRITE_BEHIND_MAX_BATCH", 500))
+WRITE_BEHIND_INTERVAL_MS = float(os.environ.get("WRITE_BEHIND_INTERVAL_MS", 50))
+
+logger = logging.getLogger(__name__)
+
+
+class _Update(NamedTuple):
+    doc_id: str
+    op: UpdateOne
+    applied: Callable[[dict], bool]
+    done: asyncio.Future
+
+
+class WriteBehindBuffer:
+    def __init__(
+        self,
+        collection: Callable[[], Any],
+        key: str = "id",
+        enabled: bool = WRITE_BEHIND_ENABLED,
+        max_batch: int = WRITE_BEHIND_MAX_BATCH,
+        interval_ms: float = WRITE_BEHIND_INTERVAL_MS,
+        match: Callable[[Any], Any] = lambda doc_id: doc_id,
+        key_of: Callable[[Any], Any] = lambda value: value,
+    ):
+        self.collection = collection
+        self.key = key
+        # Documents are queued under key_of(stored key) and looked up with a
+        # {key: match(key)} filter, so callers can use ids in their API form
+        self.match = match
+        self.key_of = key_of
+        self.enabled = enabled
+        self.max_batch = max_batch
+        self.interval = interval_ms / 1000
+        self.pending: Dict[str, dict] = {}
+        self.inflight: Dict[str, dict] = {}
+        self.updates: List[_Update] = []
+        self.batches = 0
+        self.written = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # ----- writes -----
+
+    async def insert(self, doc: dict):
+        if not self.enabled:
+            await self.collection().insert_one(doc)
+            return
+        self.pending[self.key_of(doc[self.key])] = dict(doc)
+        await self._maybe_flush()
+
+    async def update(
+        self,
+        doc_id: str,
+        condition: Dict[str, Any],
+        update: Dict[str, Any],
+        applied: Callable[[dict], bool],
+    ) -> bool:
+        """Apply update if the document matches condition; True if it was applied
+
+        applied(doc) tells from the stored document whether this update was
+        applied, e.g. by a token that the update sets.
+        """
+        query = {self.key: self.match(doc_id), **condition}
+        if not self.enabled:
+            return (await self.collection().update_one(query, update)).modified_count == 1
+        done = asyncio.get_running_loop().create_future()
+        self.updates.append(_Update(doc_id, UpdateOne(query, update), applied, done))
+        if self._task is None:
+            # Not started (or stopped): nothing else would flush it
+            await self.flush()
+        else:
+            await self._maybe_flush()
+        return await done
+
+    # ----- reads -----
+
+    async def find_one(self, doc_id: str) -> Optional[dict]:
+        queued = self.pending.get(doc_id) or self.inflight.get(doc_id)
+        if queued is not None:
+            return dict(queued)
+        return await self.collection().find_one({self.key: self.match(doc_id)})
+
+    def merge_pending(self, docs: List[dict], match: Callable[[dict], bool]) -> List[dict]:
+        """Overlay queued writes on a query result; match filters queued documents"""
+        if not self.enabled or not (self.pending or self.inflight):
+            return docs
+        merged = {self.key_of(d[self.key]): d for d in docs}
+        for source in (self.inflight, self.pending):
+            for doc_id, doc in source.items():
+                if match(doc):
+                    merged[doc_id] = dict(doc)
+                else:
+                    merged.pop(doc_id, None)
+        return list(merged.values())
+
+    # ----- flushing -----
+
+    async def settle(self, doc_id: str):
+        """Write doc_id if it is queued, before a claim or an update() that must find it"""
+        if self.enabled and (doc_id in self.pending or doc_id in self.inflight):
+            await self.flush()
+
+    async def _maybe_flush(self):
+        if len(self.pending) + len(self.updates) >= self.max_batch:
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self.pending and not self.updates:
+                return
+            self.inflight, self.pending = self.pending, {}
+            updates, self.updates = self.updates, []
+            ops = [
+                UpdateOne({self.key: doc[self.key]}, {"$setOnInsert": doc}, upsert=True)
+                for doc in self.inflight.values()
+            ]
+            # Updates only target attempts already in MongoDB (see settle())
+            ops.extend(u.op for u in updates)
+            try:
+                await self.collection().bulk_write(ops, ordered=False)
+                self.batches += 1
+                self.written += len(ops)
+            except Exception as e:
+                logger.error(f"Write-behind flush of {len(ops)} operations failed: {str(e)}")
+                # Requeue the inserts, which are idempotent; the waiting updaters get the error
+                for doc_id, doc in self.inflight.items():
+                    self.pending.setdefault(doc_id, doc)
+                self._resolve(updates, error=e)
+                raise
+            finally:
+                self.inflight = {}
+            if updates:
+                await self._confirm(updates)
+
+    async def _confirm(self, updates: List[_Update]):
+        """Tell each waiting updater whether its conditional update was applied"""
+        try:
+            docs = await self.collection().find(
+                {"$or": [{self.key: self.match(u.doc_id)} for u in updates]}
+            ).to_list(None)
+        except Exception as e:
+            logger.error(f"Reading back {len(updates)} write-behind updates failed: {str(e)}")
+            self._resolve(updates, error=e)
+            return
+        by_id = {self.key_of(doc[self.key]): doc for doc in docs}
+        self._resolve(updates, by_id=by_id)
+
+    @staticmethod
+    def _resolve(
+        updates: List[_Update],
+        by_id: Optional[Dict[str, dict]] = None,
+        error: Optional[Exception] = None,
+    ):
+        for u in updates:
+            if u.done.done():
+                continue  # the updater was cancelled
+            if error is not None:
+                u.done.set_exception(error)
+            else:
+                doc = by_id.get(u.doc_id)
+                u.done.set_result(doc is not None and u.applied(doc))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                pass  # already logged; retried on the next tick
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self.pending) + len(self.updates),
+            "batches": self.batches,
+            "operations": self.written,
+        }
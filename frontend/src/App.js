@@ -81,11 +81,21 @@ function App() {
     });
   }, [location, currentUser]);
 
+  // -------- Session token on every API request --------
+  useEffect(() => {
+    if (currentUser?.token) {
+      axios.defaults.headers.common["Authorization"] = `Bearer ${currentUser.token}`;
+    } else {
+      delete axios.defaults.headers.common["Authorization"];
+    }
+  }, [currentUser]);
+
   // -------- User identification tracking --------
   useEffect(() => {
     if (currentUser) {
+      const { token, ...profile } = currentUser;
       posthog.identify(currentUser.id || currentUser.email, {
-        ...currentUser,
+        ...profile,
         env: ENV_TAG,
       });
     }
@@ -187,7 +197,17 @@ function App() {
   const login = async (userData) => {
     setCurrentUser(userData);
     localStorage.setItem("currentUser", JSON.stringify(userData));
-    posthog.capture("user_login", { env: ENV_TAG, ...userData });
+    const { token, ...profile } = userData;
+    posthog.capture("user_login", { env: ENV_TAG, ...profile });
+  };
+
+  // Profile changes (e.g. settings) that return a refreshed session token
+  const updateCurrentUser = (changes) => {
+    setCurrentUser((prev) => {
+      const updated = { ...prev, ...changes };
+      localStorage.setItem("currentUser", JSON.stringify(updated));
+      return updated;
+    });
   };
 
   const logout = () => {
@@ -200,6 +220,7 @@ function App() {
   const contextValue = {
     currentUser,
     setCurrentUser: login,
+    updateCurrentUser,
     logout,
     availableTopics,
     availableCompanies,
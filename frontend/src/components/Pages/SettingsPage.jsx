@@ -37,7 +37,7 @@ import { Badge } from "../ui/badge";
 import { useAppContext } from "../../App";
 
 const SettingsPage = () => {
-  const { currentUser, availableTopics, availableCompanies, API } =
+  const { currentUser, updateCurrentUser, availableTopics, availableCompanies, API } =
     useAppContext();
 
   const [settings, setSettings] = useState({
@@ -129,10 +129,16 @@ const SettingsPage = () => {
   const saveTopics = async () => {
     setLoading(true);
     try {
-      await axios.put(`${API}/users/${currentUser.id}/topics`, {
+      const response = await axios.put(`${API}/users/${currentUser.id}/topics`, {
         selected_topics: settings.selectedTopics,
         custom_topics: [],
       });
+      // The session token carries the topics, so keep the refreshed one
+      updateCurrentUser({
+        selected_topics: settings.selectedTopics,
+        custom_topics: [],
+        token: response.data.token,
+      });
       toast.success("Topics updated successfully!");
       setEditing((prev) => ({ ...prev, topics: false }));
     } catch (error) {
@@ -145,9 +151,13 @@ const SettingsPage = () => {
   const saveCompanies = async () => {
     setLoading(true);
     try {
-      await axios.put(`${API}/users/${currentUser.id}/companies`, {
+      const response = await axios.put(`${API}/users/${currentUser.id}/companies`, {
         companies: settings.selectedCompanies,
       });
+      updateCurrentUser({
+        target_companies: settings.selectedCompanies,
+        token: response.data.token,
+      });
       toast.success("Companies updated successfully!");
       setEditing((prev) => ({ ...prev, companies: false }));
     } catch (error) {